@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Atomic Writer - Безопасная запись файлов базы данных сервера
+
+Данные пишутся во временный файл рядом с целевым, сбрасываются на диск
+(fsync) и атомарно подменяют целевой файл через os.replace. Сбой во время
+записи оставляет на месте прежнюю версию файла.
+
+Резервная копия предыдущей версии создается жесткой ссылкой на старый файл
+(без копирования байтов); если файловая система не поддерживает ссылки,
+файл копируется на диске без чтения в память.
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import orjson as json
+from pathlib import Path
+from typing import Any, Optional
+
+def _fsync_directory(directory: Path):
+    """Сброс записи каталога на диск (на Windows не поддерживается)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def make_backup(path: Path, backup_path: Path):
+    """Резервная копия текущей версии файла: жесткая ссылка или копия на диске"""
+    if not path.exists():
+        return
+    try:
+        backup_path.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(path, backup_path)
+    except OSError:
+        shutil.copy2(path, backup_path)
+
+def atomic_write_bytes(path: Path, data: bytes, backup_path: Optional[Path] = None):
+    """Атомарная запись байтов в файл с необязательной резервной копией"""
+    path = Path(path)
+    fd, temp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # mkstemp создает файл с правами 0600 - сохраняем права исходного файла
+        if path.exists():
+            os.chmod(temp_name, stat.S_IMODE(path.stat().st_mode))
+
+        if backup_path is not None:
+            make_backup(path, Path(backup_path))
+
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+    _fsync_directory(path.parent)
+
+def atomic_write_json(path: Path, data: Any, backup_path: Optional[Path] = None,
+                      indent: bool = True):
+    """Атомарная запись JSON (orjson, по умолчанию с отступом 2)"""
+    option = json.OPT_INDENT_2 if indent else 0
+    atomic_write_bytes(path, json.dumps(data, option=option), backup_path)
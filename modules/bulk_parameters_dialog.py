@@ -120,6 +120,8 @@ class BulkParametersDialog:
             self.parameter_value = ""
             self.is_processing = False
             self.processing_thread = None
+            # Диалог закрывается после завершения потока обработки
+            self.close_requested = False
             
             # Создание интерфейса
             info("Создание интерфейса диалога", LogCategory.UI)
@@ -241,7 +243,9 @@ class BulkParametersDialog:
         ttk.Button(list_buttons_frame, text="Очистить", command=self.clear_item_ids).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(list_buttons_frame, text="Загрузить из файла", command=self.load_from_file).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(list_buttons_frame, text="Сохранить в файл", command=self.save_to_file).pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Button(list_buttons_frame, text="Проверить ID", command=self.validate_item_ids).pack(side=tk.LEFT)
+        ttk.Button(list_buttons_frame, text="Проверить ID", command=self.validate_item_ids).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(list_buttons_frame, text="Добавить по разделу", command=self.add_items_by_category).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(list_buttons_frame, text="Добавить по параметрам", command=self.add_items_by_parameters).pack(side=tk.LEFT)
         
         # Фрейм для выбора параметра
         parameter_frame = ttk.LabelFrame(settings_frame, text="Параметр для изменения", padding="10")
@@ -411,6 +415,8 @@ class BulkParametersDialog:
             info_text = f"Тип: {param_info['type']} | "
             info_text += f"Использований: {param_info['usage_count']} | "
             info_text += f"Часто используемый: {'Да' if param_info['is_common'] else 'Нет'}"
+            if param_info.get('summary_text'):
+                info_text += f"\n{param_info['summary_text']}"
             
             self.parameter_info_label.config(text=info_text)
             
@@ -434,7 +440,12 @@ class BulkParametersDialog:
             is_valid, message = self.analyzer.validate_parameter_value(parameter, value)
             
             if is_valid:
-                self.validation_label.config(text=f"✓ {message}", foreground="green")
+                # Допустимое, но необычное для базы значение (вне диапазона, выброс)
+                warning_text = self.analyzer.check_parameter_value(parameter, value)
+                if warning_text:
+                    self.validation_label.config(text=f"⚠ {warning_text}", foreground="dark orange")
+                else:
+                    self.validation_label.config(text=f"✓ {message}", foreground="green")
             else:
                 self.validation_label.config(text=f"✗ {message}", foreground="red")
             
@@ -452,7 +463,10 @@ class BulkParametersDialog:
             return
         
         try:
-            suggestions = self.analyzer.get_parameter_values(parameter, 20)
+            # Для числовых параметров - подсказки с учетом диапазона значений
+            suggestions = self.analyzer.suggest_parameter_value(parameter, self.value_var.get().strip())
+            if not suggestions:
+                suggestions = self.analyzer.get_parameter_values(parameter, 20)
             
             if not suggestions:
                 messagebox.showinfo("Информация", "Нет доступных значений для этого параметра")
@@ -467,6 +481,10 @@ class BulkParametersDialog:
             
             center_window(suggestion_dialog, 400, 300)
             
+            sketch = self.analyzer.get_numeric_sketch(parameter)
+            if sketch is not None:
+                ttk.Label(suggestion_dialog, text=sketch.describe(), wraplength=380).pack(anchor=tk.W, padx=10, pady=(10, 0))
+            
             # Список предложений
             listbox = tk.Listbox(suggestion_dialog)
             listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -557,6 +575,114 @@ class BulkParametersDialog:
         
         self.log_message(f"Проверка ID: {len(valid_ids)} действительных, {len(invalid_ids)} недействительных")
     
+    def add_items_by_category(self):
+        """Добавление в список всех предметов раздела дерева шаблонов"""
+        nodes = self.items_db.get_category_nodes()
+        if not nodes:
+            messagebox.showinfo("Информация", "В базе нет узлов дерева шаблонов")
+            return
+        
+        category_dialog = tk.Toplevel(self.dialog)
+        category_dialog.title("Добавить по разделу")
+        category_dialog.geometry("400x400")
+        category_dialog.transient(self.dialog)
+        category_dialog.grab_set()
+        
+        center_window(category_dialog, 400, 400)
+        
+        # Список разделов
+        listbox = tk.Listbox(category_dialog)
+        listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        for node_id, name in nodes:
+            listbox.insert(tk.END, f"{name} ({node_id})")
+        
+        include_nodes_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(category_dialog, text="Включать вложенные узлы", 
+                       variable=include_nodes_var).pack(anchor=tk.W, padx=10)
+        
+        # Обработка выбора
+        def on_select(event=None):
+            selection = listbox.curselection()
+            if not selection:
+                return
+            node_id, name = nodes[selection[0]]
+            descendants = self.items_db.get_descendants(node_id, items_only=not include_nodes_var.get())
+            
+            existing = set(self.get_item_ids_list())
+            new_ids = [item_id for item_id in descendants if item_id not in existing]
+            if new_ids:
+                content = self.item_ids_text_widget.get(1.0, tk.END).strip()
+                if content:
+                    self.item_ids_text_widget.insert(tk.END, "\n")
+                self.item_ids_text_widget.insert(tk.END, "\n".join(new_ids))
+            
+            self.log_message(f"Раздел {name}: добавлено {len(new_ids)} из {len(descendants)} предметов")
+            category_dialog.destroy()
+            self.update_preview()
+        
+        listbox.bind('<Double-1>', on_select)
+        
+        buttons_frame = ttk.Frame(category_dialog)
+        buttons_frame.pack(pady=10)
+        ttk.Button(buttons_frame, text="Добавить", command=on_select).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons_frame, text="Отмена", command=category_dialog.destroy).pack(side=tk.LEFT)
+    
+    def add_items_by_parameters(self):
+        """Добавление в список предметов, у которых есть одни параметры и нет других"""
+        parameters = self.analyzer.get_available_parameters()
+        if not parameters:
+            messagebox.showinfo("Информация", "Нет данных анализа параметров")
+            return
+        
+        parameters_dialog = tk.Toplevel(self.dialog)
+        parameters_dialog.title("Добавить по параметрам")
+        parameters_dialog.geometry("640x450")
+        parameters_dialog.transient(self.dialog)
+        parameters_dialog.grab_set()
+        
+        center_window(parameters_dialog, 640, 450)
+        
+        # Два списка параметров: обязательные и исключающие
+        lists_frame = ttk.Frame(parameters_dialog)
+        lists_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        listboxes = []
+        for column, title in enumerate(("Есть все параметры:", "Нет ни одного из параметров:")):
+            ttk.Label(lists_frame, text=title).grid(row=0, column=column, sticky=tk.W)
+            listbox = tk.Listbox(lists_frame, selectmode=tk.MULTIPLE, exportselection=False)
+            listbox.grid(row=1, column=column, sticky="nsew", padx=(0, 10) if column == 0 else 0)
+            for parameter in parameters:
+                listbox.insert(tk.END, parameter)
+            listboxes.append(listbox)
+        lists_frame.columnconfigure(0, weight=1)
+        lists_frame.columnconfigure(1, weight=1)
+        lists_frame.rowconfigure(1, weight=1)
+        
+        def on_add():
+            with_parameters = [parameters[index] for index in listboxes[0].curselection()]
+            without_parameters = [parameters[index] for index in listboxes[1].curselection()]
+            if not with_parameters and not without_parameters:
+                return
+            found = self.analyzer.find_items(with_parameters, without_parameters)
+            
+            existing = set(self.get_item_ids_list())
+            new_ids = [item_id for item_id in found if item_id not in existing]
+            if new_ids:
+                content = self.item_ids_text_widget.get(1.0, tk.END).strip()
+                if content:
+                    self.item_ids_text_widget.insert(tk.END, "\n")
+                self.item_ids_text_widget.insert(tk.END, "\n".join(new_ids))
+            
+            self.log_message(f"По параметрам: добавлено {len(new_ids)} из {len(found)} предметов")
+            parameters_dialog.destroy()
+            self.update_preview()
+        
+        buttons_frame = ttk.Frame(parameters_dialog)
+        buttons_frame.pack(pady=10)
+        ttk.Button(buttons_frame, text="Добавить", command=on_add).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(buttons_frame, text="Отмена", command=parameters_dialog.destroy).pack(side=tk.LEFT)
+    
     def get_item_ids_list(self) -> List[str]:
         """Получение списка ID предметов из текстового поля"""
         content = self.item_ids_text_widget.get(1.0, tk.END).strip()
@@ -677,11 +803,13 @@ class BulkParametersDialog:
             messagebox.showerror("Ошибка", f"Неверное значение параметра: {message}")
             return
         
-        # Подтверждение
+        # Подтверждение (с предупреждением о необычном значении)
+        warning_text = self.analyzer.check_parameter_value(parameter, new_value)
         result = messagebox.askyesno(
             "Подтверждение", 
             f"Вы уверены, что хотите изменить параметр '{parameter}' на значение '{new_value}' для {len(item_ids)} предметов?\n\n"
-            "Будет создана резервная копия базы данных."
+            + (f"⚠ {warning_text}\n\n" if warning_text else "")
+            + "Будет создана резервная копия базы данных."
         )
         
         if not result:
@@ -721,6 +849,9 @@ class BulkParametersDialog:
             self.log_message(f"Начало массового изменения параметра '{parameter}' на значение '{new_value}'")
             self.log_message(f"Обрабатывается {total_items} предметов")
             
+            # Все изменения копятся в памяти и записываются в файл один раз
+            self.items_db.begin()
+            
             for i, item_id in enumerate(item_ids):
                 if not self.is_processing:  # Проверка на отмену
                     break
@@ -739,12 +870,13 @@ class BulkParametersDialog:
                     # Логируем изменение
                     self.log_message(f"📝 {item_id}: {current_value} → {new_value}")
                     
-                    # Применяем изменение
+                    # Применяем изменение (предмет изменяется на месте)
+                    self.items_db.touch_item(item_id)
                     success = self.apply_parameter_change(item, parameter, new_value)
                     
                     if success:
                         # Сохраняем предмет
-                        save_success = self.items_db.save_item_incremental(item_id, {parameter: new_value})
+                        save_success = self.items_db.save_item(item_id, item)
                         if save_success:
                             successful += 1
                             self.log_message(f"✅ {item_id} успешно изменен")
@@ -767,6 +899,13 @@ class BulkParametersDialog:
                     self.log_message(f"❌ Ошибка обработки {item_id}: {str(e)}")
                     processed += 1
             
+            # Запись накопленных изменений (при отмене сохраняются уже обработанные предметы)
+            self.dialog.after(0, lambda: self.status_var.set("Сохранение изменений..."))
+            if not self.items_db.commit():
+                self.log_message("❌ Ошибка сохранения базы данных")
+                self.dialog.after(0, lambda: self.status_var.set("Ошибка сохранения базы данных"))
+                return
+            
             # Завершение
             if self.is_processing:
                 self.log_message(f"✅ Массовое изменение завершено!")
@@ -788,13 +927,18 @@ class BulkParametersDialog:
                 self.dialog.after(0, lambda: self.status_var.set("Отменено"))
             
         except Exception as e:
+            self.items_db.rollback()
             self.log_message(f"❌ Критическая ошибка: {str(e)}")
             self.dialog.after(0, lambda: self.status_var.set(f"Ошибка: {str(e)}"))
         
         finally:
             self.is_processing = False
-            self.dialog.after(0, lambda: self.start_button.config(state=tk.NORMAL))
-            self.dialog.after(0, lambda: self.cancel_button.config(state=tk.DISABLED))
+            if self.close_requested:
+                # Пользователь закрыл диалог во время обработки - закрываем после commit()
+                self.dialog.after(0, self.finish_closing)
+            else:
+                self.dialog.after(0, lambda: self.start_button.config(state=tk.NORMAL))
+                self.dialog.after(0, lambda: self.cancel_button.config(state=tk.DISABLED))
     
     def apply_parameter_change(self, item: Dict[str, Any], parameter: str, new_value: str) -> bool:
         """Применение изменения параметра к предмету"""
@@ -909,26 +1053,40 @@ class BulkParametersDialog:
         try:
             info("Начало закрытия диалога массового изменения", LogCategory.UI)
             
-            if self.is_processing:
+            if self.processing_thread and self.processing_thread.is_alive():
                 debug("Диалог закрывается во время обработки", LogCategory.UI)
                 result = messagebox.askyesno("Подтверждение", 
                                            "Идет обработка данных. Вы уверены, что хотите закрыть?")
-                if result:
-                    self.is_processing = False
-                    if self.processing_thread and self.processing_thread.is_alive():
-                        debug("Ожидание завершения потока обработки", LogCategory.UI)
-                        self.processing_thread.join(timeout=1)
-                    try:
-                        self.dialog.destroy()
-                        debug("Диалог уничтожен", LogCategory.UI)
-                    except Exception as e:
-                        error(f"Ошибка уничтожения диалога: {e}", LogCategory.ERROR, exception=e)
-            else:
-                try:
-                    self.dialog.destroy()
-                    debug("Диалог уничтожен", LogCategory.UI)
-                except Exception as e:
-                    error(f"Ошибка уничтожения диалога: {e}", LogCategory.ERROR, exception=e)
+                if not result:
+                    return
+                
+                # Обработка останавливается, уже обработанные предметы сохраняются
+                # потоком через commit(); диалог закроется из его завершения
+                self.is_processing = False
+                self.close_requested = True
+                self.status_var.set("Завершение обработки...")
+                self.start_button.config(state=tk.DISABLED)
+                self.cancel_button.config(state=tk.DISABLED)
+                debug("Закрытие отложено до завершения потока обработки", LogCategory.UI)
+                return
+            
+            self.finish_closing()
+            
+        except Exception as e:
+            critical(f"Критическая ошибка при закрытии диалога: {e}", LogCategory.ERROR, exception=e)
+    
+    def finish_closing(self):
+        """Уничтожение диалога и освобождение хранилища (поток обработки уже завершен)"""
+        try:
+            try:
+                self.dialog.destroy()
+                debug("Диалог уничтожен", LogCategory.UI)
+            except Exception as e:
+                error(f"Ошибка уничтожения диалога: {e}", LogCategory.ERROR, exception=e)
+            
+            # Освобождаем общее хранилище предметов
+            self.items_db.close()
+            self.analyzer.close()
             
             if self.on_complete:
                 try:
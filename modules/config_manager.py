@@ -35,9 +35,17 @@ class ConfigManager:
             'scanner': {
                 'api_base_url': 'https://db.sp-tarkov.com/api/item',
                 'request_delay': 0.3,
+                'request_burst': 1,
                 'request_timeout': 10.0,
                 'max_connections': 10,
-                'max_keepalive_connections': 5
+                'max_keepalive_connections': 5,
+                'checkpoint_interval': 500,
+                'max_retries': 5,
+                'retry_base_delay': 1.0,
+                'retry_max_delay': 60.0,
+                'breaker_error_rate': 0.5,
+                'breaker_window': 20,
+                'breaker_cooldown': 30.0
             },
             'cache': {
                 'cache_lifetime_days': 7,
@@ -45,6 +53,9 @@ class ConfigManager:
                 'items_cache_file': 'items_cache.json',
                 'readable_cache_file': 'items_readable.json'
             },
+            'locales': {
+                'language': 'en'
+            },
             'ui': {
                 'default_window_size': {'width': 800, 'height': 600},
                 'min_window_size': {'width': 600, 'height': 400},
@@ -65,7 +76,11 @@ class ConfigManager:
                 'use_orjson': True,
                 'use_httpx': True,
                 'cache_search_results': True,
-                'max_search_results': 1000
+                'max_search_results': 1000,
+                'preload_database': True,
+                'lazy_items': True,
+                'loader_workers': None,
+                'analysis_workers': 1
             },
             'security': {
                 'verify_ssl': True,
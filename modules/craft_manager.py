@@ -6,13 +6,14 @@ Craft Manager - Модуль для редактирования рецепто
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import orjson as json  # Используем orjson для ускорения JSON операций
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 try:
     from items_cache import ItemsCache
     from hideout_areas import HideoutAreas
     from context_menus import setup_context_menus_for_module
+    from atomic_writer import atomic_write_json
+    from json_loader import load_json
 except ImportError:
     # Попробуем импорт из текущей директории
     import sys
@@ -23,6 +24,8 @@ except ImportError:
     from items_cache import ItemsCache
     from hideout_areas import HideoutAreas
     from context_menus import setup_context_menus_for_module
+    from atomic_writer import atomic_write_json
+    from json_loader import load_json
 
 class CraftManager:
     def __init__(self, parent, server_path: Path):
@@ -326,8 +329,7 @@ class CraftManager:
         """Загрузка данных из файла"""
         try:
             if self.production_file.exists():
-                with open(self.production_file, 'rb') as f:
-                    self.production_data = json.loads(f.read())
+                self.production_data = load_json(self.production_file)
                 
                 self.recipes = self.production_data.get('recipes', [])
                 self.populate_recipes_tree()
@@ -1182,15 +1184,9 @@ class CraftManager:
             # Обновление данных
             self.production_data['recipes'] = self.recipes
             
-            # Создание резервной копии
+            # Атомарное сохранение; прежняя версия остается резервной копией
             backup_file = self.production_file.with_suffix('.json.backup')
-            if self.production_file.exists():
-                import shutil
-                shutil.copy2(self.production_file, backup_file)
-            
-            # Сохранение с использованием orjson
-            with open(self.production_file, 'wb') as f:
-                f.write(json.dumps(self.production_data, option=json.OPT_INDENT_2))
+            atomic_write_json(self.production_file, self.production_data, backup_file)
             
             messagebox.showinfo("Успех", f"Данные сохранены в {self.production_file}")
             
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Database Loader - Параллельная фоновая загрузка файлов базы сервера
+
+При запуске редактора файлы, которые понадобятся модулям (items.json,
+production.json, configs/trader.json, файлы торговцев, кэш предметов,
+локаль названий), читаются и разбираются в пуле потоков, пока строится
+интерфейс. Результаты регистрируются в json_loader: ItemsDatabase,
+TradersDatabase, CraftManager и остальные модули получают их через обычный
+load_json() без повторного разбора. Для каждого файла записывается время
+чтения и разбора.
+
+Результаты не держатся дольше, чем нужно: модуль забирает свой файл один
+раз, а невостребованные через PRELOAD_RELEASE_DELAY_MS после завершения
+загрузки освобождаются (json_loader.clear_preloaded). items.json в ленивом
+режиме менеджера предметов не загружается - он читается через mmap.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+
+try:
+    from modules.json_loader import register_preloaded, parse_json_bytes, file_signature
+except ImportError:
+    from json_loader import register_preloaded, parse_json_bytes, file_signature
+
+# Файлы каждого торговца (database/traders/<ID>/)
+TRADER_FILES = ("base.json", "assort.json", "questassort.json", "dialogue.json", "services.json")
+# Через сколько после завершения загрузки невостребованные результаты освобождаются (мс)
+PRELOAD_RELEASE_DELAY_MS = 60000
+
+class DatabaseLoader:
+    """Загрузка файлов базы сервера в пуле потоков с замером времени по файлам"""
+
+    def __init__(self, server_path: Path, max_workers: Optional[int] = None,
+                 languages: Iterable[str] = (), include_items: bool = True):
+        self.server_path = server_path
+        self.max_workers = max_workers
+        # Загружать ли items.json (не нужен, если менеджер предметов в ленивом режиме)
+        self.include_items = include_items
+        # Языки, файлы локалей которых тоже нужно загрузить
+        self.languages = list(languages)
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.futures = []
+        # Относительный путь -> {'size', 'read', 'parse'} (секунды)
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.lock = threading.Lock()
+
+    def collect_files(self) -> List[Path]:
+        """Существующие файлы базы в порядке убывания размера (крупные - первыми)"""
+        database_path = self.server_path / "database"
+        files = [
+            database_path / "hideout" / "production.json",
+            self.server_path / "configs" / "trader.json",
+            self.server_path / "cache" / "items_readable.json",
+            self.server_path / "cache" / "items_cache.json",
+        ]
+        if self.include_items:
+            files.append(database_path / "templates" / "items.json")
+        files.extend(database_path / "locales" / "global" / f"{language}.json" for language in self.languages)
+
+        traders_dir = database_path / "traders"
+        if traders_dir.is_dir():
+            for trader_dir in sorted(traders_dir.iterdir()):
+                if trader_dir.is_dir():
+                    files.extend(trader_dir / name for name in TRADER_FILES)
+
+        existing = []
+        for path in files:
+            try:
+                existing.append((path.stat().st_size, path))
+            except OSError:
+                continue
+        existing.sort(key=lambda entry: -entry[0])
+        return [path for _, path in existing]
+
+    def _load_file(self, path: Path) -> Tuple[Tuple[int, int], Any]:
+        """Чтение и разбор одного файла с замером времени"""
+        signature = file_signature(path)
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            raw = f.read()
+        read_done = time.perf_counter()
+        data = parse_json_bytes(raw)
+        parse_done = time.perf_counter()
+
+        try:
+            name = str(path.relative_to(self.server_path))
+        except ValueError:
+            name = str(path)
+        with self.lock:
+            self.timings[name] = {
+                'size': len(raw),
+                'read': read_done - started,
+                'parse': parse_done - read_done
+            }
+        return signature, data
+
+    def start(self) -> 'DatabaseLoader':
+        """Запуск фоновой загрузки (не блокирует вызывающий поток)"""
+        files = self.collect_files()
+        self.started_at = time.perf_counter()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix="db-loader")
+        for path in files:
+            future = self.executor.submit(self._load_file, path)
+            register_preloaded(path, future)
+            self.futures.append(future)
+        # Потоки завершатся сами после выполнения всех задач
+        self.executor.shutdown(wait=False)
+        return self
+
+    def is_done(self) -> bool:
+        """Завершена ли загрузка всех файлов"""
+        return all(future.done() for future in self.futures)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание завершения загрузки; False - не успели за timeout"""
+        done, not_done = wait(self.futures, timeout=timeout)
+        if not not_done and not self.finished_at:
+            self.finished_at = time.perf_counter()
+        return not not_done
+
+    def get_report(self) -> Dict[str, Any]:
+        """Сводка: общее время, суммарный объем, время по файлам (от медленных к быстрым)"""
+        if self.is_done() and not self.finished_at:
+            self.finished_at = time.perf_counter()
+        with self.lock:
+            timings = dict(self.timings)
+        errors = [str(future.exception()) for future in self.futures
+                  if future.done() and future.exception() is not None]
+        return {
+            'files': len(self.futures),
+            'loaded': len(timings),
+            'errors': errors,
+            'total_bytes': sum(entry['size'] for entry in timings.values()),
+            'elapsed': (self.finished_at or time.perf_counter()) - self.started_at,
+            'timings': dict(sorted(timings.items(), key=lambda entry: -(entry[1]['read'] + entry[1]['parse'])))
+        }
+
+def main():
+    """Тестирование модуля"""
+    import sys
+    server_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent
+
+    loader = DatabaseLoader(server_path).start()
+    loader.wait()
+    report = loader.get_report()
+    print(f"Загружено {report['loaded']} из {report['files']} файлов "
+          f"({report['total_bytes'] / (1024 * 1024):.1f} MB) за {report['elapsed']:.2f} с")
+    for name, timing in report['timings'].items():
+        print(f"   {name}: чтение {timing['read']:.3f} с, разбор {timing['parse']:.3f} с")
+    for message in report['errors']:
+        print(f"   Ошибка: {message}")
+
+if __name__ == "__main__":
+    main()
@@ -7,40 +7,70 @@ Item Parameters Analyzer - Модуль для анализа параметро
 import orjson as json
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Union, Set
+from array import array
 from collections import defaultdict, Counter
 import re
 
+try:
+    from modules.items_store import acquire_items_store, release_items_store
+    from modules.parallel_analysis import run_sharded
+    from modules.items_bitsets import ItemsBitsets, new_bits_buffer, set_bit, bits_from_buffer
+    from modules.parameter_sketches import NumericSketch, TOP_K, HAS_NUMPY, format_number
+except ImportError:
+    from items_store import acquire_items_store, release_items_store
+    from parallel_analysis import run_sharded
+    from items_bitsets import ItemsBitsets, new_bits_buffer, set_bit, bits_from_buffer
+    from parameter_sketches import NumericSketch, TOP_K, HAS_NUMPY, format_number
+
 class ItemParametersAnalyzer:
     """Класс для анализа параметров предметов и их валидации"""
     
     def __init__(self, server_path: Path):
         self.server_path = server_path
         self.items_file = server_path / "database" / "templates" / "items.json"
-        self.items_data = {}
+        self._store = None
         self.parameter_analysis = {}
         
         # Загрузка данных
         self.load_items()
         self.analyze_parameters()
     
+    @property
+    def items_data(self) -> Dict[str, Any]:
+        """Данные предметов из общего хранилища"""
+        return self._store.data if self._store is not None else {}
+    
     def load_items(self) -> bool:
-        """Загрузка данных предметов"""
+        """Загрузка данных предметов (из общего хранилища items.json)"""
         try:
             if not self.items_file.exists():
                 print(f"Файл {self.items_file} не найден")
                 return False
             
-            with open(self.items_file, 'rb') as f:
-                self.items_data = json.loads(f.read())
+            if self._store is None:
+                self._store = acquire_items_store(self.items_file)
+            else:
+                self._store.load()
             
             print(f"Загружено {len(self.items_data)} предметов для анализа параметров")
             return True
             
         except Exception as e:
             print(f"Ошибка загрузки файла предметов: {e}")
-            self.items_data = {}
             return False
     
+    def close(self):
+        """Освобождение ссылки на общее хранилище"""
+        if self._store is not None:
+            release_items_store(self._store)
+            self._store = None
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
     def analyze_parameters(self):
         """Анализ всех параметров предметов"""
         if not self.items_data:
@@ -48,38 +78,107 @@ class ItemParametersAnalyzer:
         
         print("Анализ параметров предметов...")
         
+        # Части базы анализируются в пуле процессов, небольшая база - целиком здесь
+        sharded = run_sharded(self.items_data, analyze_parameters_shard)
+        if sharded:
+            shards, partials = sharded
+            print(f"Параллельный анализ: {len(shards)} частей")
+        else:
+            partials = [self.collect_parameters(self.items_data)]
+        
+        # Сохраняем результаты анализа
+        self.parameter_analysis = self.merge_parameters(partials, list(self.items_data))
+        
+        print(f"Анализ завершен. Найдено {len(self.parameter_analysis['parameter_types'])} уникальных параметров")
+    
+    @classmethod
+    def collect_parameters(cls, items_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Счетчики значений, типы и местоположения параметров набора предметов
+        
+        Местоположения - битовые множества номеров предметов в items_data
+        (см. items_bitsets.py). Числовые значения собираются в колонки для
+        сводок (см. parameter_sketches.py), остальные - в счетчики строк.
+        """
         # Счетчики для каждого параметра
         parameter_values = defaultdict(Counter)
+        parameter_numbers = defaultdict(lambda: array('d'))
         parameter_types = {}
-        parameter_locations = defaultdict(set)
+        items_count = len(items_data)
+        parameter_locations = defaultdict(lambda: new_bits_buffer(items_count))
         
         # Анализируем каждый предмет
-        for item_id, item in self.items_data.items():
+        for ordinal, item in enumerate(items_data.values()):
             # Анализируем основные поля
             for key, value in item.items():
                 if key.startswith('_'):  # Основные поля предмета
-                    self._analyze_parameter(key, value, parameter_values, parameter_types, parameter_locations, item_id)
+                    cls._analyze_parameter(key, value, parameter_values, parameter_numbers, parameter_types, parameter_locations, ordinal)
             
             # Анализируем _props
             if '_props' in item and isinstance(item['_props'], dict):
                 for prop_key, prop_value in item['_props'].items():
-                    self._analyze_parameter(f"_props.{prop_key}", prop_value, parameter_values, parameter_types, parameter_locations, item_id)
+                    cls._analyze_parameter(f"_props.{prop_key}", prop_value, parameter_values, parameter_numbers, parameter_types, parameter_locations, ordinal)
             
             # Анализируем locale
             if 'locale' in item and isinstance(item['locale'], dict):
                 for locale_key, locale_value in item['locale'].items():
-                    self._analyze_parameter(f"locale.{locale_key}", locale_value, parameter_values, parameter_types, parameter_locations, item_id)
+                    cls._analyze_parameter(f"locale.{locale_key}", locale_value, parameter_values, parameter_numbers, parameter_types, parameter_locations, ordinal)
         
-        # Сохраняем результаты анализа
-        self.parameter_analysis = {
+        return {
             'parameter_values': dict(parameter_values),
+            'parameter_numbers': dict(parameter_numbers),
             'parameter_types': parameter_types,
-            'parameter_locations': {k: list(v) for k, v in parameter_locations.items()}
+            'parameter_locations': {k: bits_from_buffer(v) for k, v in parameter_locations.items()},
+            'total_items': items_count
         }
+    
+    @staticmethod
+    def merge_parameters(partials: List[Dict[str, Any]], item_ids: List[str]) -> Dict[str, Any]:
+        """Сложение результатов частей базы в порядке частей (как один проход)"""
+        parameter_values: Dict[str, Counter] = {}
+        parameter_numbers: Dict[str, array] = {}
+        parameter_types: Dict[str, str] = {}
+        parameter_locations: Dict[str, int] = {}
+        # Части - непрерывные отрезки items.json: номер предмета части сдвигается
+        # на номер ее первого предмета в общей нумерации
+        offset = 0
         
-        print(f"Анализ завершен. Найдено {len(parameter_types)} уникальных параметров")
+        for partial in partials:
+            for param_name, values in partial['parameter_values'].items():
+                if param_name in parameter_values:
+                    parameter_values[param_name].update(values)
+                else:
+                    parameter_values[param_name] = Counter(values)
+            for param_name, numbers in partial['parameter_numbers'].items():
+                parameter_numbers.setdefault(param_name, array('d')).extend(numbers)
+            for param_name, value_type in partial['parameter_types'].items():
+                if param_name not in parameter_types:
+                    parameter_types[param_name] = value_type
+                elif parameter_types[param_name] != value_type:
+                    parameter_types[param_name] = "mixed"
+            for param_name, bits in partial['parameter_locations'].items():
+                parameter_locations[param_name] = parameter_locations.get(param_name, 0) | (bits << offset)
+            offset += partial['total_items']
+        
+        # Числовые колонки сворачиваются в сводки, от строковых счетчиков остаются top-k
+        numeric_sketches = {}
+        for param_name, numbers in parameter_numbers.items():
+            sketch = NumericSketch.from_values(numbers)
+            if sketch is not None:
+                numeric_sketches[param_name] = sketch
+        parameter_distinct = {param_name: len(values) for param_name, values in parameter_values.items()}
+        parameter_values = {param_name: values if len(values) <= TOP_K else Counter(dict(values.most_common(TOP_K)))
+                            for param_name, values in parameter_values.items()}
+        
+        return {
+            'parameter_values': parameter_values,
+            'parameter_distinct': parameter_distinct,
+            'numeric_sketches': numeric_sketches,
+            'parameter_types': parameter_types,
+            'parameter_locations': ItemsBitsets(item_ids, parameter_locations)
+        }
     
-    def _analyze_parameter(self, param_name: str, value: Any, parameter_values: Dict, parameter_types: Dict, parameter_locations: Dict, item_id: str):
+    @staticmethod
+    def _analyze_parameter(param_name: str, value: Any, parameter_values: Dict, parameter_numbers: Dict, parameter_types: Dict, parameter_locations: Dict, ordinal: int):
         """Анализ одного параметра"""
         # Определяем тип значения
         value_type = type(value).__name__
@@ -91,8 +190,10 @@ class ItemParametersAnalyzer:
             # Если тип изменился, отмечаем как mixed
             parameter_types[param_name] = "mixed"
         
-        # Добавляем значение в счетчик
-        if isinstance(value, (str, int, float, bool)):
+        # Числа - в колонку для сводки (без NumPy - в счетчик), остальные значения - в счетчик
+        if HAS_NUMPY and isinstance(value, (int, float)) and not isinstance(value, bool) and abs(value) < 1e300:
+            parameter_numbers[param_name].append(value)
+        elif isinstance(value, (str, int, float, bool)):
             parameter_values[param_name][str(value)] += 1
         elif isinstance(value, list):
             parameter_values[param_name][f"list[{len(value)}]"] += 1
@@ -101,8 +202,8 @@ class ItemParametersAnalyzer:
         else:
             parameter_values[param_name][str(type(value).__name__)] += 1
         
-        # Записываем местоположение параметра
-        parameter_locations[param_name].add(item_id)
+        # Записываем местоположение параметра (номер предмета в битовом множестве)
+        set_bit(parameter_locations[param_name], ordinal)
     
     def get_available_parameters(self) -> List[str]:
         """Получение списка всех доступных параметров"""
@@ -112,17 +213,41 @@ class ItemParametersAnalyzer:
         """Получение типа параметра"""
         return self.parameter_analysis.get('parameter_types', {}).get(parameter, 'unknown')
     
+    def get_numeric_sketch(self, parameter: str) -> Optional[NumericSketch]:
+        """Сводка распределения числовых значений параметра (None - числовых значений нет)"""
+        return self.parameter_analysis.get('numeric_sketches', {}).get(parameter)
+    
     def get_parameter_values(self, parameter: str, limit: int = 50) -> List[str]:
         """Получение возможных значений параметра"""
         values = self.parameter_analysis.get('parameter_values', {}).get(parameter, Counter())
         
-        # Возвращаем наиболее частые значения
-        most_common = values.most_common(limit)
-        return [str(value) for value, count in most_common]
+        # Возвращаем наиболее частые значения (числовые - из сводки)
+        most_common = [(str(value), count) for value, count in values.most_common(limit)]
+        sketch = self.get_numeric_sketch(parameter)
+        if sketch is not None:
+            most_common += [(format_number(value), count) for value, count in sketch.top_values[:limit]]
+            most_common.sort(key=lambda pair: pair[1], reverse=True)
+        return [value for value, count in most_common[:limit]]
+    
+    def get_parameter_locations(self) -> ItemsBitsets:
+        """Битовые множества предметов по параметрам"""
+        return self.parameter_analysis.get('parameter_locations') or ItemsBitsets()
     
     def get_parameter_usage_count(self, parameter: str) -> int:
         """Получение количества использований параметра"""
-        return len(self.parameter_analysis.get('parameter_locations', {}).get(parameter, []))
+        return self.get_parameter_locations().count(parameter)
+    
+    def get_parameter_items(self, parameter: str) -> List[str]:
+        """ID предметов, у которых есть параметр"""
+        locations = self.get_parameter_locations()
+        return locations.ids(locations.get(parameter))
+    
+    def find_items(self, with_parameters: List[str] = (), without_parameters: List[str] = ()) -> List[str]:
+        """ID предметов со всеми параметрами with_parameters и без параметров without_parameters
+        
+        Например, find_items(['_props.Caliber'], ['_props.ammoType']).
+        """
+        return self.get_parameter_locations().find(with_parameters, without_parameters)
     
     def validate_parameter_value(self, parameter: str, value: str) -> tuple[bool, str]:
         """Валидация значения параметра"""
@@ -160,18 +285,41 @@ class ItemParametersAnalyzer:
         except ValueError as e:
             return False, f"Неверный формат значения для типа {param_type}: {str(e)}"
     
+    def check_parameter_value(self, parameter: str, value: str) -> Optional[str]:
+        """Предупреждение о допустимом, но необычном значении (None - значение обычное)
+        
+        Числа сравниваются со сводкой распределения (диапазон, выбросы),
+        строки - с полным набором значений, если он небольшой.
+        """
+        sketch = self.get_numeric_sketch(parameter)
+        if sketch is not None:
+            try:
+                return sketch.check(float(value))
+            except ValueError:
+                return None
+        
+        if self.get_parameter_type(parameter) == 'str':
+            values = self.parameter_analysis.get('parameter_values', {}).get(parameter)
+            distinct = self.parameter_analysis.get('parameter_distinct', {}).get(parameter, 0)
+            if values and distinct <= TOP_K and value not in values:
+                return f"Значение не встречается в базе (вариантов: {distinct})"
+        return None
+    
     def get_parameter_info(self, parameter: str) -> Dict[str, Any]:
         """Получение подробной информации о параметре"""
         param_type = self.get_parameter_type(parameter)
         values = self.get_parameter_values(parameter, 20)
         usage_count = self.get_parameter_usage_count(parameter)
+        sketch = self.get_numeric_sketch(parameter)
         
         return {
             'parameter': parameter,
             'type': param_type,
             'usage_count': usage_count,
             'sample_values': values,
-            'is_common': usage_count > len(self.items_data) * 0.1  # Используется в >10% предметов
+            'is_common': usage_count > len(self.items_data) * 0.1,  # Используется в >10% предметов
+            'numeric_summary': sketch.to_dict() if sketch is not None else None,
+            'summary_text': sketch.describe() if sketch is not None else ''
         }
     
     def get_common_parameters(self) -> List[Dict[str, Any]]:
@@ -225,6 +373,11 @@ class ItemParametersAnalyzer:
     
     def suggest_parameter_value(self, parameter: str, partial_value: str = "") -> List[str]:
         """Предложение значений для параметра на основе частичного ввода"""
+        # Для чисел - подсказки по диапазону (см. NumericSketch.suggest)
+        sketch = self.get_numeric_sketch(parameter)
+        if sketch is not None and not self.parameter_analysis.get('parameter_values', {}).get(parameter):
+            return sketch.suggest(partial_value, 10)
+        
         all_values = self.get_parameter_values(parameter, 100)
         
         if not partial_value:
@@ -255,6 +408,10 @@ class ItemParametersAnalyzer:
             'total_items': len(self.items_data)
         }
 
+def analyze_parameters_shard(payload: bytes) -> Dict[str, Any]:
+    """Анализ параметров части предметов в процессе пула (см. parallel_analysis.py)"""
+    return ItemParametersAnalyzer.collect_parameters(json.loads(payload))
+
 def main():
     """Главная функция для тестирования модуля"""
     from pathlib import Path
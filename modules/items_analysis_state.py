@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items Analysis State - Инкрементальный анализ предметов
+
+Состояние анализа хранит для каждого предмета хеш шаблона и его вклад в
+счетчики: тип, путь префаба и "форму" - параметры, типы значений и поля
+структуры (одинаковые формы разных предметов хранятся один раз). Все
+счетчики вычитаемые: после правки или перезагрузки items.json вклад
+удаленных и измененных предметов вычитается, вклад новых и измененных
+добавляется, а результаты анализа (в формате items_analysis_cache.json)
+собираются из счетчиков без обхода всей базы.
+
+ItemsAnalysisIndex - индекс общего хранилища (см. items_store.py): при
+построении сверяет хеши с сохраненным состоянием, правки предметов получает
+через item_changed(). Если новый предмет добавляет особый путь параметра
+(см. items_parameter_usage.py), состояние строится заново.
+
+Примеры значений после правок пополняются только из добавленных предметов,
+поэтому могут отличаться от полного анализа (ItemsAnalyzer.analyze_items).
+"""
+
+import orjson as json
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from modules.items_index import StoreIndex
+    from modules.items_parameter_usage import ParameterUsage, is_special_path, MAX_SAMPLES
+    from modules.scan_planner import template_hash
+    from modules.atomic_writer import atomic_write_json
+except ImportError:
+    from items_index import StoreIndex
+    from items_parameter_usage import ParameterUsage, is_special_path, MAX_SAMPLES
+    from scan_planner import template_hash
+    from atomic_writer import atomic_write_json
+
+# Версия формата файла состояния (другая версия - состояние строится заново)
+STATE_VERSION = 1
+# Разделитель частей элемента формы
+SEPARATOR = '\x1f'
+# Виды элементов формы: ключ _props, параметр (collect_all_parameters),
+# учтенный путь с типом значения, счетчик структуры
+PROP_KEY, PARAMETER, RECORD, STRUCTURE = 'K', 'U', 'R', 'S'
+# Основные поля предмета (как в ItemsAnalyzer.analyze_data_structure)
+STRUCTURE_FIELDS = ['_id', '_name', '_parent', '_type', '_props']
+COUNTER_NAMES = ('types', 'type_parameters', 'prefab_types', 'prefab_paths', 'prefab_categories',
+                 'prefab_parameters', 'structure', 'parameters', 'categories', 'subcategories')
+# Запись учтенного пути: [число предметов, по типам, по категориям, по подкатегориям, типы значений]
+USAGE, BY_TYPE, BY_CATEGORY, BY_SUBCATEGORY, VALUE_TYPES = range(5)
+
+def _adjust(counter: Dict[str, int], key: str, delta: int):
+    """Изменение счетчика; нулевые ключи удаляются"""
+    count = counter.get(key, 0) + delta
+    if count > 0:
+        counter[key] = count
+    else:
+        counter.pop(key, None)
+
+def _adjust_nested(counter: Dict[str, Dict[str, int]], key: str, nested_key: str, delta: int):
+    nested = counter.setdefault(key, {})
+    _adjust(nested, nested_key, delta)
+    if not nested:
+        del counter[key]
+
+def _split_token(token: str) -> Tuple[str, str, str]:
+    parts = token.split(SEPARATOR)
+    return parts[0], parts[1], parts[2] if len(parts) > 2 else ''
+
+class ItemsAnalysisIndex(StoreIndex):
+    """Вычитаемые счетчики анализа предметов с хешами шаблонов"""
+
+    def __init__(self, analyzer, state_file: Path):
+        # analyzer - ItemsAnalyzer (правила разбора предметов и группировка параметров)
+        self.analyzer = analyzer
+        self.state_file = state_file
+        self.items_data: Dict[str, Any] = {}
+        # Состояние совпадает с файлом состояния
+        self.saved = False
+        # Появился новый особый путь - нужен полный пересчет
+        self.needs_rebuild = False
+        self._results: Optional[Dict[str, Any]] = None
+        self._reset([])
+
+    def _reset(self, all_parameters: List[str]):
+        self.usage_rules = ParameterUsage(all_parameters)
+        self.special_paths = set(self.usage_rules.special_paths)
+        # Таблица элементов форм и таблица форм
+        self.tokens: List[str] = []
+        self.token_ids: Dict[str, int] = {}
+        self.token_parts: List[Tuple[str, str, str]] = []
+        self.shapes: List[List[int]] = []
+        self.shape_ids: Dict[Tuple[int, ...], int] = {}
+        # ID -> [хеш шаблона, тип, путь префаба, форма]
+        self.items: Dict[str, list] = {}
+        self.counters: Dict[str, dict] = {name: {} for name in COUNTER_NAMES}
+        # Путь -> запись (см. USAGE ... VALUE_TYPES); путь -> [[ID, пример], ...]
+        self.usage: Dict[str, list] = {}
+        self.samples: Dict[str, list] = {}
+        self._results = None
+
+    def _token_id(self, token: str) -> int:
+        token_id = self.token_ids.get(token)
+        if token_id is None:
+            token_id = self.token_ids[token] = len(self.tokens)
+            self.tokens.append(token)
+            self.token_parts.append(_split_token(token))
+        return token_id
+
+    def _shape_id(self, token_ids: List[int]) -> int:
+        key = tuple(token_ids)
+        shape_id = self.shape_ids.get(key)
+        if shape_id is None:
+            shape_id = self.shape_ids[key] = len(self.shapes)
+            self.shapes.append(token_ids)
+        return shape_id
+
+    def build(self, items_data: Dict[str, Any]):
+        """Загрузка сохраненного состояния и пересчет только измененных предметов"""
+        self.items_data = items_data
+        if self.load_state():
+            self.sync(items_data)
+        else:
+            self.rebuild()
+
+    def sync(self, items_data: Dict[str, Any]) -> int:
+        """Сверка хешей шаблонов с состоянием; возвращает число пересчитанных предметов"""
+        removed = [item_id for item_id in self.items if not isinstance(items_data.get(item_id), dict)]
+        changed = []
+        for item_id, item in items_data.items():
+            if not isinstance(item, dict):
+                continue
+            item_hash = template_hash(item)
+            entry = self.items.get(item_id)
+            if entry is None or entry[0] != item_hash:
+                changed.append((item_id, item_hash))
+
+        for item_id in removed:
+            self.remove_item(item_id)
+        for item_id, item_hash in changed:
+            self.remove_item(item_id)
+            self.add_item(item_id, items_data[item_id], item_hash)
+
+        self.saved = not removed and not changed
+        if not self.saved:
+            print(f"Анализ предметов: пересчитано {len(changed)}, удалено {len(removed)}")
+        return len(removed) + len(changed)
+
+    def rebuild(self):
+        """Построение состояния по всем предметам"""
+        print("Анализ предметов: полный пересчет состояния")
+        self._reset(self.analyzer.collect_all_parameters(self.items_data))
+        for item_id, item in self.items_data.items():
+            self.add_item(item_id, item)
+        self.needs_rebuild = False
+        self.saved = False
+
+    def add_item(self, item_id: str, item: Dict[str, Any], item_hash: Optional[str] = None):
+        if not isinstance(item, dict):
+            return
+        analyzer = self.analyzer
+        item_type = item.get('_type', 'Unknown')
+        prefab_path = analyzer.extract_prefab_path(item)
+        records = list(self.usage_rules.item_records(item))
+
+        tokens = []
+        for field in STRUCTURE_FIELDS:
+            if field in item:
+                tokens.append(f"{STRUCTURE}{SEPARATOR}has_{field}")
+        props = item.get('_props')
+        if '_props' in item:
+            tokens.append(f"{STRUCTURE}{SEPARATOR}has_props")
+        if isinstance(props, dict):
+            for prop_name, prop_value in props.items():
+                tokens.append(f"{PROP_KEY}{SEPARATOR}{prop_name}")
+                if isinstance(prop_value, dict):
+                    tokens.append(f"{STRUCTURE}{SEPARATOR}props_has_dict_{prop_name}")
+                elif isinstance(prop_value, list):
+                    tokens.append(f"{STRUCTURE}{SEPARATOR}props_has_list_{prop_name}")
+        for param_name in dict.fromkeys(analyzer.item_parameters(item)):
+            tokens.append(f"{PARAMETER}{SEPARATOR}{param_name}")
+            if param_name not in self.special_paths and is_special_path(param_name):
+                self.needs_rebuild = True
+        for path, value in records:
+            value_type = type(value).__name__ if value is not None else ''
+            tokens.append(f"{RECORD}{SEPARATOR}{path}{SEPARATOR}{value_type}")
+
+        shape_id = self._shape_id([self._token_id(token) for token in tokens])
+        self.items[item_id] = [item_hash or template_hash(item), item_type, prefab_path, shape_id]
+        self._apply(item_type, prefab_path, shape_id, 1)
+
+        for path, value in records:
+            if value is None:
+                continue
+            samples = self.samples.setdefault(path, [])
+            if len(samples) < MAX_SAMPLES:
+                samples.append([item_id, str(value)[:100]])
+        self.saved = False
+        self._results = None
+
+    def remove_item(self, item_id: str):
+        entry = self.items.pop(item_id, None)
+        if entry is None:
+            return
+        item_hash, item_type, prefab_path, shape_id = entry
+        self._apply(item_type, prefab_path, shape_id, -1)
+
+        for token_id in self.shapes[shape_id]:
+            kind, path, value_type = self.token_parts[token_id]
+            samples = self.samples.get(path) if kind == RECORD else None
+            if samples:
+                samples[:] = [sample for sample in samples if sample[0] != item_id]
+                if not samples:
+                    del self.samples[path]
+        self.saved = False
+        self._results = None
+
+    def _apply(self, item_type: str, prefab_path: str, shape_id: int, delta: int):
+        """Добавление (delta=1) или вычитание (delta=-1) вклада предмета"""
+        counters = self.counters
+        if prefab_path:
+            category, subcategory = self.analyzer.analyze_prefab_path(prefab_path)
+        else:
+            category, subcategory = 'unknown', 'unknown'
+        _adjust(counters['types'], item_type, delta)
+        _adjust(counters['categories'], category, delta)
+        _adjust(counters['subcategories'], subcategory, delta)
+        if prefab_path:
+            _adjust_nested(counters['prefab_types'], item_type,
+                           self.analyzer.extract_prefab_type(prefab_path), delta)
+            _adjust(counters['prefab_paths'], prefab_path, delta)
+            _adjust_nested(counters['prefab_categories'], category, subcategory, delta)
+
+        for token_id in self.shapes[shape_id]:
+            kind, name, value_type = self.token_parts[token_id]
+            if kind == RECORD:
+                entry = self.usage.get(name)
+                if entry is None:
+                    entry = self.usage[name] = [0, {}, {}, {}, {}]
+                entry[USAGE] += delta
+                _adjust(entry[BY_TYPE], item_type, delta)
+                _adjust(entry[BY_CATEGORY], category, delta)
+                _adjust(entry[BY_SUBCATEGORY], subcategory, delta)
+                if value_type:
+                    _adjust(entry[VALUE_TYPES], value_type, delta)
+                if entry[USAGE] <= 0:
+                    del self.usage[name]
+            elif kind == PARAMETER:
+                _adjust(counters['parameters'], name, delta)
+            elif kind == PROP_KEY:
+                _adjust_nested(counters['type_parameters'], item_type, name, delta)
+                if prefab_path:
+                    _adjust_nested(counters['prefab_parameters'], prefab_path, name, delta)
+            else:
+                _adjust(counters['structure'], name, delta)
+
+    def _parameter_details(self, param_name: str, total_items: int) -> Dict[str, Any]:
+        """Статистика параметра в формате ItemsAnalyzer.analyze_single_parameter"""
+        entry = self.usage.get(param_name) or [0, {}, {}, {}, {}]
+        counters = self.counters
+
+        def missing(counts: Dict[str, int], used: Dict[str, int]) -> List[str]:
+            return [key for key, count in counts.items() if used.get(key, 0) < count]
+
+        return {
+            'total_usage': entry[USAGE],
+            'usage_by_type': dict(entry[BY_TYPE]),
+            'usage_by_prefab_category': dict(entry[BY_CATEGORY]),
+            'usage_by_prefab_subcategory': dict(entry[BY_SUBCATEGORY]),
+            'items_without_param': total_items - entry[USAGE],
+            'types_without_param': missing(counters['types'], entry[BY_TYPE]),
+            'prefab_categories_without_param': missing(counters['categories'], entry[BY_CATEGORY]),
+            'prefab_subcategories_without_param': missing(counters['subcategories'], entry[BY_SUBCATEGORY]),
+            'parameter_types': list(entry[VALUE_TYPES]),
+            'sample_values': [text for item_id, text in self.samples.get(param_name, [])]
+        }
+
+    def get_results(self) -> Dict[str, Any]:
+        """Результаты анализа в формате ItemsAnalyzer.analyze_items (из счетчиков)"""
+        if self.needs_rebuild:
+            self.rebuild()
+        if self._results is not None:
+            return self._results
+
+        counters = self.counters
+        total_items = len(self.items)
+        type_analysis = {
+            'type_counts': dict(counters['types']),
+            'type_parameters': {k: list(v) for k, v in counters['type_parameters'].items()},
+            'prefab_types_by_item_type': {k: list(v) for k, v in counters['prefab_types'].items()}
+        }
+        prefab_analysis = {
+            'prefab_paths': dict(counters['prefab_paths']),
+            'prefab_categories': {k: dict(v) for k, v in counters['prefab_categories'].items()},
+            'prefab_parameters': {k: list(v) for k, v in counters['prefab_parameters'].items()}
+        }
+
+        all_parameters = sorted(counters['parameters'])
+        parameter_details = {name: self._parameter_details(name, total_items) for name in all_parameters}
+        parameters_analysis = {
+            'parameter_details': parameter_details,
+            'frequency_groups': self.analyzer.group_parameters_by_frequency(parameter_details, total_items),
+            'total_parameters': len(all_parameters),
+            'total_items': total_items
+        }
+
+        structure_stats = counters['structure']
+        structure_analysis = {
+            'structure_stats': dict(structure_stats),
+            'required_fields': [field for field in STRUCTURE_FIELDS
+                                if structure_stats.get(f'has_{field}', 0) > 0],
+            'optional_fields': [field for field in STRUCTURE_FIELDS
+                                if structure_stats.get(f'has_{field}', 0) < total_items]
+        }
+
+        self._results = self.analyzer.build_results(total_items, type_analysis, prefab_analysis,
+                                                    parameters_analysis, structure_analysis)
+        return self._results
+
+    def load_state(self) -> bool:
+        """Загрузка состояния из файла (False - файла нет или он не подходит)"""
+        if not self.state_file.exists():
+            return False
+        try:
+            with open(self.state_file, 'rb') as f:
+                state = json.loads(f.read())
+            if state.get('version') != STATE_VERSION:
+                return False
+
+            self._reset(state['special_paths'])
+            for token in state['tokens']:
+                self._token_id(token)
+            for token_ids in state['shapes']:
+                self._shape_id(token_ids)
+            self.items = state['items']
+            self.counters = {name: state['counters'][name] for name in COUNTER_NAMES}
+            self.usage = state['usage']
+            self.samples = state['samples']
+            return True
+        except Exception as e:
+            print(f"Ошибка загрузки состояния анализа: {e}")
+            self._reset([])
+            return False
+
+    def save_state(self):
+        """Запись состояния (неиспользуемые формы и элементы не сохраняются)"""
+        tokens, token_map = [], {}
+        shapes, shape_map = [], {}
+        items = {}
+        for item_id, (item_hash, item_type, prefab_path, shape_id) in self.items.items():
+            new_shape_id = shape_map.get(shape_id)
+            if new_shape_id is None:
+                token_ids = []
+                for token_id in self.shapes[shape_id]:
+                    new_token_id = token_map.get(token_id)
+                    if new_token_id is None:
+                        new_token_id = token_map[token_id] = len(tokens)
+                        tokens.append(self.tokens[token_id])
+                    token_ids.append(new_token_id)
+                new_shape_id = shape_map[shape_id] = len(shapes)
+                shapes.append(token_ids)
+            items[item_id] = [item_hash, item_type, prefab_path, new_shape_id]
+
+        atomic_write_json(self.state_file, {
+            'version': STATE_VERSION,
+            'special_paths': sorted(self.special_paths),
+            'tokens': tokens,
+            'shapes': shapes,
+            'items': items,
+            'counters': self.counters,
+            'usage': self.usage,
+            'samples': self.samples
+        })
+        self.saved = True
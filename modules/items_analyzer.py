@@ -10,6 +10,28 @@ from typing import Dict, List, Any, Set, Counter, Tuple
 from collections import defaultdict
 import re
 
+try:
+    from modules.items_store import acquire_items_store, release_items_store
+    from modules.atomic_writer import atomic_write_json
+    from modules.items_parameter_usage import ParameterUsage, is_special_path
+    from modules.parallel_analysis import run_sharded
+    from modules.items_analysis_state import ItemsAnalysisIndex
+except ImportError:
+    from items_store import acquire_items_store, release_items_store
+    from atomic_writer import atomic_write_json
+    from items_parameter_usage import ParameterUsage, is_special_path
+    from parallel_analysis import run_sharded
+    from items_analysis_state import ItemsAnalysisIndex
+
+def _merge_ordered(target: Dict[str, dict], source: Dict[str, list]):
+    """Объединение списков по ключам с сохранением порядка появления"""
+    for key, values in source.items():
+        target.setdefault(key, {}).update(dict.fromkeys(values))
+
+def _merge_counts(target: Dict[str, int], source: Dict[str, int]):
+    for key, count in source.items():
+        target[key] = target.get(key, 0) + count
+
 class ItemsAnalyzer:
     """Детальный анализатор параметров предметов"""
     
@@ -17,6 +39,8 @@ class ItemsAnalyzer:
         self.server_path = server_path
         self.items_file = server_path / "database" / "templates" / "items.json"
         self.cache_file = server_path / "modules" / "items_analysis_cache.json"
+        # Хеши и вычитаемые счетчики для инкрементального анализа (см. items_analysis_state.py)
+        self.state_file = server_path / "modules" / "items_analysis_state.json"
         
         # Результаты анализа
         self.analysis_results = {}
@@ -34,34 +58,24 @@ class ItemsAnalyzer:
             
             print(f"📦 Загружено {len(items_data)} предметов")
             
-            # Анализируем типы предметов
-            print("📊 Анализируем типы предметов...")
-            type_analysis = self.analyze_item_types(items_data)
-            
-            # Анализируем префабы
-            print("🎨 Анализируем префабы...")
-            prefab_analysis = self.analyze_prefabs(items_data)
-            
-            # Анализируем параметры детально
-            print("⚙️ Анализируем параметры детально...")
-            parameters_analysis = self.analyze_parameters_detailed(items_data)
+            # Части базы анализируются в пуле процессов, небольшая база - целиком здесь
+            print("📊 Анализируем типы, префабы, параметры и структуру...")
+            sharded = run_sharded(items_data, analyze_items_shard)
+            if sharded:
+                shards, partials = sharded
+                print(f"  ⚡ Параллельный анализ: {len(shards)} частей")
+            else:
+                shards, partials = [list(items_data)], [self.analyze_shard(items_data)]
             
-            # Анализируем структуру данных
-            print("🏗️ Анализируем структуру данных...")
-            structure_analysis = self.analyze_data_structure(items_data)
+            # Частичные результаты складываются в порядке частей
+            type_analysis = self.merge_type_analysis([partial['types'] for partial in partials])
+            prefab_analysis = self.merge_prefab_analysis([partial['prefabs'] for partial in partials])
+            parameters_analysis = self.merge_parameters_analysis(items_data, shards, partials)
+            structure_analysis = self.merge_structure_analysis([partial['structure'] for partial in partials])
             
             # Собираем результаты
-            self.analysis_results = {
-                'metadata': {
-                    'total_items': len(items_data),
-                    'analysis_date': str(Path().cwd()),
-                    'items_file': str(self.items_file)
-                },
-                'types': type_analysis,
-                'prefabs': prefab_analysis,
-                'parameters': parameters_analysis,
-                'structure': structure_analysis
-            }
+            self.analysis_results = self.build_results(len(items_data), type_analysis, prefab_analysis,
+                                                       parameters_analysis, structure_analysis)
             
             # Сохраняем результаты
             self.save_analysis_results()
@@ -75,15 +89,63 @@ class ItemsAnalyzer:
             traceback.print_exc()
             return None
     
+    def build_results(self, total_items, type_analysis, prefab_analysis, parameters_analysis, structure_analysis):
+        """Результаты анализа в формате кэша"""
+        return {
+            'metadata': {
+                'total_items': total_items,
+                'analysis_date': str(Path().cwd()),
+                'items_file': str(self.items_file)
+            },
+            'types': type_analysis,
+            'prefabs': prefab_analysis,
+            'parameters': parameters_analysis,
+            'structure': structure_analysis
+        }
+    
+    def update_analysis(self):
+        """Актуальные результаты анализа: пересчитываются только измененные предметы
+        
+        Состояние анализа живет в общем хранилище items.json как индекс и
+        получает правки предметов через item_changed(). Кэш и состояние
+        перезаписываются, только если результаты изменились.
+        """
+        try:
+            if not self.items_file.exists():
+                print(f"❌ Файл не найден: {self.items_file}")
+                return self.load_analysis_results()
+            
+            store = acquire_items_store(self.items_file)
+            try:
+                with store.lock:
+                    index = store.get_index('analysis', lambda: ItemsAnalysisIndex(self, self.state_file))
+                    results = index.get_results()
+                    if not index.saved or not self.cache_file.exists():
+                        self.analysis_results = results
+                        self.save_analysis_results()
+                        index.save_state()
+            finally:
+                release_items_store(store)
+            
+            self.analysis_results = results
+            return results
+        except Exception as e:
+            print(f"❌ Ошибка обновления анализа: {e}")
+            return self.load_analysis_results()
+    
     def load_items_data(self):
-        """Загрузка данных предметов"""
+        """Загрузка данных предметов (из общего хранилища items.json)"""
         try:
             if not self.items_file.exists():
                 print(f"❌ Файл не найден: {self.items_file}")
                 return None
             
-            with open(self.items_file, 'rb') as f:
-                data = json.loads(f.read())
+            # Если items.json уже открыт другим окном, повторного разбора не будет
+            store = acquire_items_store(self.items_file)
+            try:
+                data = store.data
+            finally:
+                release_items_store(store)
             
             return data
         except Exception as e:
@@ -93,7 +155,8 @@ class ItemsAnalyzer:
     def analyze_item_types(self, items_data):
         """Анализ типов предметов"""
         type_stats = Counter()
-        type_parameters = defaultdict(set)
+        # Упорядоченные множества (dict): порядок не зависит от хеширования строк
+        type_parameters = defaultdict(dict)
         
         for item_id, item_data in items_data.items():
             # Основной тип предмета
@@ -103,16 +166,16 @@ class ItemsAnalyzer:
             # Собираем параметры для каждого типа
             if '_props' in item_data:
                 for param_name in item_data['_props'].keys():
-                    type_parameters[item_type].add(param_name)
+                    type_parameters[item_type][param_name] = None
         
         # Анализируем префабы по типам
-        prefab_types = defaultdict(set)
+        prefab_types = defaultdict(dict)
         for item_id, item_data in items_data.items():
             item_type = item_data.get('_type', 'Unknown')
             prefab_path = self.extract_prefab_path(item_data)
             if prefab_path:
                 prefab_type = self.extract_prefab_type(prefab_path)
-                prefab_types[item_type].add(prefab_type)
+                prefab_types[item_type][prefab_type] = None
         
         return {
             'type_counts': dict(type_stats),
@@ -124,7 +187,7 @@ class ItemsAnalyzer:
         """Анализ префабов предметов"""
         prefab_paths = Counter()
         prefab_categories = defaultdict(Counter)
-        prefab_parameters = defaultdict(set)
+        prefab_parameters = defaultdict(dict)
         
         for item_id, item_data in items_data.items():
             prefab_path = self.extract_prefab_path(item_data)
@@ -138,7 +201,7 @@ class ItemsAnalyzer:
                 # Собираем параметры для каждого префаба
                 if '_props' in item_data:
                     for param_name in item_data['_props'].keys():
-                        prefab_parameters[prefab_path].add(param_name)
+                        prefab_parameters[prefab_path][param_name] = None
         
         return {
             'prefab_paths': dict(prefab_paths),
@@ -146,24 +209,85 @@ class ItemsAnalyzer:
             'prefab_parameters': {k: list(v) for k, v in prefab_parameters.items()}
         }
     
+    def analyze_shard(self, items_data) -> Dict[str, Any]:
+        """Частичный анализ набора предметов (вся база или одна часть для пула процессов)"""
+        all_parameters = self.collect_all_parameters(items_data)
+        return {
+            'types': self.analyze_item_types(items_data),
+            'prefabs': self.analyze_prefabs(items_data),
+            'parameters': all_parameters,
+            'usage': self.collect_parameter_usage(items_data, all_parameters),
+            'structure': self.analyze_data_structure(items_data)
+        }
+    
+    def merge_type_analysis(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Сложение анализа типов частей базы (в порядке частей)"""
+        type_counts, type_parameters, prefab_types = {}, {}, {}
+        for partial in partials:
+            _merge_counts(type_counts, partial['type_counts'])
+            _merge_ordered(type_parameters, partial['type_parameters'])
+            _merge_ordered(prefab_types, partial['prefab_types_by_item_type'])
+        return {
+            'type_counts': type_counts,
+            'type_parameters': {k: list(v) for k, v in type_parameters.items()},
+            'prefab_types_by_item_type': {k: list(v) for k, v in prefab_types.items()}
+        }
+    
+    def merge_prefab_analysis(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Сложение анализа префабов частей базы (в порядке частей)"""
+        prefab_paths, prefab_categories, prefab_parameters = {}, {}, {}
+        for partial in partials:
+            _merge_counts(prefab_paths, partial['prefab_paths'])
+            for category, subcategories in partial['prefab_categories'].items():
+                _merge_counts(prefab_categories.setdefault(category, {}), subcategories)
+            _merge_ordered(prefab_parameters, partial['prefab_parameters'])
+        return {
+            'prefab_paths': prefab_paths,
+            'prefab_categories': prefab_categories,
+            'prefab_parameters': {k: list(v) for k, v in prefab_parameters.items()}
+        }
+    
+    def merge_structure_analysis(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Сложение анализа структуры частей базы (в порядке частей)"""
+        structure_stats, required_fields, optional_fields = {}, {}, {}
+        for partial in partials:
+            _merge_counts(structure_stats, partial['structure_stats'])
+            required_fields.update(dict.fromkeys(partial['required_fields']))
+            optional_fields.update(dict.fromkeys(partial['optional_fields']))
+        return {
+            'structure_stats': structure_stats,
+            'required_fields': list(required_fields),
+            'optional_fields': list(optional_fields)
+        }
+    
     def analyze_parameters_detailed(self, items_data):
-        """Детальный анализ параметров предметов"""
-        print("  🔍 Собираем все параметры...")
-        
-        # Собираем все параметры (включая вложенные)
+        """Детальный анализ параметров предметов (все параметры за один проход по предметам)"""
         all_parameters = self.collect_all_parameters(items_data)
-        
+        partial = {'parameters': all_parameters, 'usage': self.collect_parameter_usage(items_data, all_parameters)}
+        return self.merge_parameters_analysis(items_data, [list(items_data)], [partial])
+    
+    def merge_parameters_analysis(self, items_data, shards: List[List[str]], partials: List[Dict[str, Any]]):
+        """Сложение накопителей использования параметров частей базы (в порядке частей)"""
+        # Все параметры (включая вложенные) - объединение параметров частей
+        all_parameters = sorted(set().union(*(partial['parameters'] for partial in partials)))
         print(f"  📊 Найдено {len(all_parameters)} уникальных параметров")
         
-        # Анализируем каждый параметр детально
-        parameter_details = {}
+        special_paths = [param_name for param_name in all_parameters if is_special_path(param_name)]
+        usage = ParameterUsage()
+        for shard, partial in zip(shards, partials):
+            shard_usage = partial['usage']
+            # Особые пути из других частей досчитываются по предметам этой части
+            local_paths = set(shard_usage.special_paths)
+            missing = [path for path in special_paths if path not in local_paths]
+            if missing:
+                for item_id in shard:
+                    item_data = items_data[item_id]
+                    shard_usage.add_paths(item_data, *self.classify_item(item_data), missing)
+            usage.merge(shard_usage)
+        
+        parameter_details = usage.build_details(all_parameters)
         total_items = len(items_data)
         
-        for param_name in all_parameters:
-            print(f"  ⚙️ Анализируем параметр: {param_name}")
-            param_info = self.analyze_single_parameter(items_data, param_name, total_items)
-            parameter_details[param_name] = param_info
-        
         # Группируем параметры по частоте использования
         frequency_groups = self.group_parameters_by_frequency(parameter_details, total_items)
         
@@ -179,25 +303,45 @@ class ItemsAnalyzer:
         all_params = set()
         
         for item_id, item_data in items_data.items():
-            if '_props' in item_data:
-                # Основные параметры
-                for param_name in item_data['_props'].keys():
-                    all_params.add(param_name)
-                
-                # Вложенные параметры
-                for param_name, param_value in item_data['_props'].items():
-                    if isinstance(param_value, dict):
-                        for nested_param in param_value.keys():
-                            all_params.add(f"{param_name}.{nested_param}")
-                    elif isinstance(param_value, list):
-                        # Анализируем элементы списка
-                        for i, item in enumerate(param_value):
-                            if isinstance(item, dict):
-                                for nested_param in item.keys():
-                                    all_params.add(f"{param_name}[{i}].{nested_param}")
+            all_params.update(self.item_parameters(item_data))
         
         return sorted(all_params)
     
+    def item_parameters(self, item_data) -> List[str]:
+        """Параметры одного предмета (включая вложенные)"""
+        params = []
+        if '_props' in item_data:
+            # Основные параметры
+            params.extend(item_data['_props'].keys())
+            
+            # Вложенные параметры
+            for param_name, param_value in item_data['_props'].items():
+                if isinstance(param_value, dict):
+                    for nested_param in param_value.keys():
+                        params.append(f"{param_name}.{nested_param}")
+                elif isinstance(param_value, list):
+                    # Анализируем элементы списка
+                    for i, item in enumerate(param_value):
+                        if isinstance(item, dict):
+                            for nested_param in item.keys():
+                                params.append(f"{param_name}[{i}].{nested_param}")
+        
+        return params
+    
+    def collect_parameter_usage(self, items_data, all_parameters) -> ParameterUsage:
+        """Накопление использования параметров за один проход (см. items_parameter_usage.py)"""
+        usage = ParameterUsage(all_parameters)
+        for item_id, item_data in items_data.items():
+            usage.add_item(item_data, *self.classify_item(item_data))
+        return usage
+    
+    def classify_item(self, item_data) -> Tuple[str, str, str]:
+        """Тип предмета, категория и подкатегория префаба"""
+        item_type = item_data.get('_type', 'Unknown')
+        prefab_path = self.extract_prefab_path(item_data)
+        category, subcategory = self.analyze_prefab_path(prefab_path) if prefab_path else ('unknown', 'unknown')
+        return item_type, category, subcategory
+    
     def analyze_single_parameter(self, items_data, param_name, total_items):
         """Детальный анализ одного параметра"""
         usage_stats = {
@@ -348,17 +492,17 @@ class ItemsAnalyzer:
     def analyze_data_structure(self, items_data):
         """Анализ структуры данных предметов"""
         structure_stats = defaultdict(int)
-        required_fields = set()
-        optional_fields = set()
+        required_fields = {}
+        optional_fields = {}
         
         for item_id, item_data in items_data.items():
             # Анализируем основные поля
             for field in ['_id', '_name', '_parent', '_type', '_props']:
                 if field in item_data:
                     structure_stats[f'has_{field}'] += 1
-                    required_fields.add(field)
+                    required_fields[field] = None
                 else:
-                    optional_fields.add(field)
+                    optional_fields[field] = None
             
             # Анализируем вложенную структуру
             if '_props' in item_data:
@@ -412,8 +556,7 @@ class ItemsAnalyzer:
     def save_analysis_results(self):
         """Сохранение результатов анализа"""
         try:
-            with open(self.cache_file, 'wb') as f:
-                f.write(json.dumps(self.analysis_results, option=json.OPT_INDENT_2))
+            atomic_write_json(self.cache_file, self.analysis_results)
             print(f"💾 Результаты сохранены в {self.cache_file}")
         except Exception as e:
             print(f"❌ Ошибка сохранения: {e}")
@@ -531,6 +674,10 @@ class ItemsAnalyzer:
         if sample_values:
             print(f"    💡 Примеры значений: {', '.join(sample_values)}")
 
+def analyze_items_shard(payload: bytes) -> Dict[str, Any]:
+    """Анализ части предметов в процессе пула (см. parallel_analysis.py)"""
+    return ItemsAnalyzer(Path()).analyze_shard(json.loads(payload))
+
 def main():
     """Главная функция для запуска анализа"""
     import sys
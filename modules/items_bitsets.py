@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items Bitsets - Битовые множества предметов
+
+ID предметов получают плотные порядковые номера (порядок items.json), а
+множество предметов хранится как битовая строка - целое число Python, в
+котором бит N означает предмет с номером N. Строится множество через
+bytearray, пересечение, объединение и разность - одна побитовая операция
+над целыми (&, |, & ~), в JSON множество записывается шестнадцатеричной
+строкой.
+
+ItemsBitsets хранит такие множества по ключам (например, местоположения
+параметров в ItemParametersAnalyzer) и отвечает на запросы вида
+"предметы с _props.Caliber, но без _props.ammoType".
+"""
+
+from typing import Dict, List, Any, Iterable, Iterator, Optional
+
+def new_bits_buffer(size: int) -> bytearray:
+    """Буфер для построения множества из size предметов"""
+    return bytearray((size + 7) // 8)
+
+def set_bit(buffer: bytearray, ordinal: int):
+    """Добавление предмета с номером ordinal в буфер"""
+    buffer[ordinal >> 3] |= 1 << (ordinal & 7)
+
+def bits_from_buffer(buffer: bytearray) -> int:
+    """Битовая строка из буфера"""
+    return int.from_bytes(buffer, 'little')
+
+def bit_count(bits: int) -> int:
+    """Число предметов в множестве"""
+    return bin(bits).count('1')
+
+def iter_ordinals(bits: int) -> Iterator[int]:
+    """Номера предметов множества по возрастанию"""
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for byte_index, byte in enumerate(raw):
+        if not byte:
+            continue
+        base = byte_index << 3
+        for bit in range(8):
+            if byte & (1 << bit):
+                yield base + bit
+
+class ItemsBitsets:
+    """Битовые множества предметов по ключам с общей нумерацией ID"""
+
+    def __init__(self, item_ids: Iterable[str] = (), bitsets: Optional[Dict[str, int]] = None):
+        self.item_ids: List[str] = list(item_ids)
+        self.bitsets: Dict[str, int] = bitsets if bitsets is not None else {}
+        self._ordinals: Optional[Dict[str, int]] = None
+
+    @property
+    def all_bits(self) -> int:
+        """Множество всех предметов"""
+        return (1 << len(self.item_ids)) - 1
+
+    def ordinal(self, item_id: str) -> Optional[int]:
+        """Порядковый номер предмета (None - предмет не пронумерован)"""
+        if self._ordinals is None:
+            self._ordinals = {item_id: ordinal for ordinal, item_id in enumerate(self.item_ids)}
+        return self._ordinals.get(item_id)
+
+    def keys(self) -> List[str]:
+        return list(self.bitsets)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.bitsets
+
+    def __len__(self) -> int:
+        return len(self.bitsets)
+
+    def get(self, key: str) -> int:
+        """Множество предметов ключа (0 - пустое)"""
+        return self.bitsets.get(key, 0)
+
+    def count(self, key: str) -> int:
+        """Число предметов ключа"""
+        return bit_count(self.get(key))
+
+    def contains(self, key: str, item_id: str) -> bool:
+        """Входит ли предмет в множество ключа"""
+        ordinal = self.ordinal(item_id)
+        return ordinal is not None and bool(self.get(key) >> ordinal & 1)
+
+    def ids(self, bits: int) -> List[str]:
+        """ID предметов множества (в порядке items.json)"""
+        item_ids = self.item_ids
+        return [item_ids[ordinal] for ordinal in iter_ordinals(bits) if ordinal < len(item_ids)]
+
+    def bits_for_ids(self, item_ids: Iterable[str]) -> int:
+        """Множество из списка ID (непронумерованные ID пропускаются)"""
+        buffer = new_bits_buffer(len(self.item_ids))
+        for item_id in item_ids:
+            ordinal = self.ordinal(item_id)
+            if ordinal is not None:
+                set_bit(buffer, ordinal)
+        return bits_from_buffer(buffer)
+
+    def select(self, include: Iterable[str] = (), exclude: Iterable[str] = (),
+               any_of: Iterable[str] = ()) -> int:
+        """Предметы со всеми ключами include, хотя бы одним из any_of и без ключей exclude"""
+        bits = self.all_bits
+        for key in include:
+            bits &= self.get(key)
+        any_of = list(any_of)
+        if any_of:
+            union = 0
+            for key in any_of:
+                union |= self.get(key)
+            bits &= union
+        for key in exclude:
+            bits &= ~self.get(key)
+        return bits
+
+    def find(self, include: Iterable[str] = (), exclude: Iterable[str] = (),
+             any_of: Iterable[str] = ()) -> List[str]:
+        """ID предметов, подходящих под select()"""
+        return self.ids(self.select(include, exclude, any_of))
+
+    def to_json(self) -> Dict[str, Any]:
+        """Компактное представление для JSON (множества - шестнадцатеричные строки)"""
+        return {
+            'item_ids': self.item_ids,
+            'bitsets': {key: format(bits, 'x') for key, bits in self.bitsets.items()}
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'ItemsBitsets':
+        """Восстановление из to_json()"""
+        return cls(data.get('item_ids', []),
+                   {key: int(bits, 16) for key, bits in data.get('bitsets', {}).items()})
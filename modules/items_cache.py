@@ -4,14 +4,28 @@
 Items Cache - Модуль для работы с кэшем предметов
 """
 
-import orjson as json  # Используем orjson для ускорения JSON операций
 import time
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 
+try:
+    from modules.items_index import TrigramTextIndex
+    from modules.json_loader import load_json_shared
+    from modules.locales_index import get_locales_index
+except ImportError:
+    from items_index import TrigramTextIndex
+    from json_loader import load_json_shared
+    from locales_index import get_locales_index
+
 class ItemsCache:
-    def __init__(self, server_path: Path):
+    # Веса полей при ранжировании результатов поиска
+    SEARCH_FIELD_WEIGHTS = {'name': 4, 'short_name': 3, 'id': 2, 'description': 1}
+    
+    def __init__(self, server_path: Path, language: Optional[str] = None):
         self.server_path = server_path
+        # Локаль сервера - запасной источник названий для предметов не из кэша
+        self.language = language
+        self._locales = None
         self.cache_dir = server_path / "cache"
         self.items_cache_file = self.cache_dir / "items_cache.json"
         self.readable_cache_file = self.cache_dir / "items_readable.json"
@@ -19,6 +33,13 @@ class ItemsCache:
         # Создание папки кэша
         self.cache_dir.mkdir(exist_ok=True)
         
+        # Текстовый индекс для поиска (строится при первом поиске)
+        self._text_index = None
+        self._text_index_source = None
+        # Статистика кэша (считается при первом запросе)
+        self._stats = None
+        self._stats_source = None
+        
         # Загрузка кэша
         try:
             self.cache = self.load_cache()
@@ -34,8 +55,7 @@ class ItemsCache:
         # Сначала пробуем загрузить читаемый кэш
         if self.readable_cache_file.exists():
             try:
-                with open(self.readable_cache_file, 'rb') as f:
-                    return json.loads(f.read())
+                return load_json_shared(self.readable_cache_file)
             except Exception as e:
                 print(f"Ошибка загрузки читаемого кэша: {e}")
                 pass
@@ -43,8 +63,7 @@ class ItemsCache:
         # Если не получилось, загружаем полный кэш
         if self.items_cache_file.exists():
             try:
-                with open(self.items_cache_file, 'rb') as f:
-                    full_cache = json.loads(f.read())
+                full_cache = load_json_shared(self.items_cache_file)
                 
                 # Конвертируем в читаемый формат
                 readable_cache = {}
@@ -70,8 +89,7 @@ class ItemsCache:
         """Загрузка полного кэша предметов"""
         if self.items_cache_file.exists():
             try:
-                with open(self.items_cache_file, 'rb') as f:
-                    return json.loads(f.read())
+                return load_json_shared(self.items_cache_file)
             except Exception as e:
                 print(f"Ошибка загрузки полного кэша: {e}")
         return {}
@@ -137,40 +155,52 @@ class ItemsCache:
         # Сначала пробуем читаемый кэш
         if item_id in self.cache:
             name = self.cache[item_id].get('name', f"Unknown Item ({item_id[:8]}...)")
-            # Если в читаемом кэше неправильное название, пробуем полный кэш
+            # Если в читаемом кэше неправильное название, пробуем полный кэш и локаль
             if name.startswith('Unknown Item ('):
                 if item_id in self.full_cache:
                     return self._extract_name(self.full_cache[item_id])
+                return self._get_locale_text(item_id, 'names') or name
             return name
         
         # Если нет в читаемом кэше, пробуем полный кэш
         if item_id in self.full_cache:
             return self._extract_name(self.full_cache[item_id])
         
-        return f"Unknown Item ({item_id[:8]}...)"
+        # Затем локаль сервера
+        return self._get_locale_text(item_id, 'names') or f"Unknown Item ({item_id[:8]}...)"
     
     def get_item_short_name(self, item_id: str) -> str:
         """Получение короткого названия предмета"""
         # Сначала пробуем читаемый кэш
         if item_id in self.cache:
             short_name = self.cache[item_id].get('short_name', f"Unknown ({item_id[:8]}...)")
-            # Если в читаемом кэше неправильное название, пробуем полный кэш
+            # Если в читаемом кэше неправильное название, пробуем полный кэш и локаль
             if short_name.startswith('Unknown ('):
                 if item_id in self.full_cache:
                     return self._extract_short_name(self.full_cache[item_id])
+                return self._get_locale_text(item_id, 'short_names') or short_name
             return short_name
         
         # Если нет в читаемом кэше, пробуем полный кэш
         if item_id in self.full_cache:
             return self._extract_short_name(self.full_cache[item_id])
         
-        return f"Unknown ({item_id[:8]}...)"
+        # Затем локаль сервера
+        return self._get_locale_text(item_id, 'short_names') or f"Unknown ({item_id[:8]}...)"
     
     def get_item_description(self, item_id: str) -> str:
         """Получение описания предмета"""
         if item_id in self.cache:
             return self.cache[item_id].get('description', "No description available")
-        return "No description available"
+        return self._get_locale_text(item_id, 'descriptions') or "No description available"
+    
+    def _get_locale_text(self, item_id: str, field: str) -> str:
+        """Строка из локали сервера (names, short_names, descriptions) или пустая строка"""
+        if self._locales is None:
+            self._locales = get_locales_index(self.server_path, self.language) or False
+        if not self._locales:
+            return ''
+        return getattr(self._locales, field).get(item_id, '')
     
     def get_item_price(self, item_id: str) -> int:
         """Получение цены предмета"""
@@ -227,23 +257,28 @@ class ItemsCache:
         """Получение количества закэшированных предметов"""
         return len(self.cache)
     
-    def search_items(self, query: str) -> List[Dict[str, Any]]:
-        """Поиск предметов по запросу"""
-        query_lower = query.lower()
-        results = []
-        
-        for item_id, item in self.cache.items():
-            name = item.get('name', '').lower()
-            short_name = item.get('short_name', '').lower()
-            description = item.get('description', '').lower()
-            
-            if (query_lower in name or 
-                query_lower in short_name or 
-                query_lower in description or
-                query_lower in item_id.lower()):
-                results.append(item)
-        
-        return results
+    def search_items(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Поиск предметов по запросу (лучшие совпадения первыми)"""
+        return [self.cache[item_id] for item_id, _ in self._get_text_index().search(query, limit=limit)]
+    
+    def _get_text_index(self) -> TrigramTextIndex:
+        """Текстовый индекс по читаемому кэшу (перестраивается при замене кэша)"""
+        if self._text_index is None or self._text_index_source is not self.cache:
+            index = TrigramTextIndex(self._text_fields, self.SEARCH_FIELD_WEIGHTS)
+            index.build(self.cache)
+            self._text_index = index
+            self._text_index_source = self.cache
+        return self._text_index
+    
+    @staticmethod
+    def _text_fields(item_id: str, item: Dict[str, Any]) -> Dict[str, str]:
+        """Текстовые поля записи кэша для поискового индекса"""
+        return {
+            'name': item.get('name', ''),
+            'short_name': item.get('short_name', ''),
+            'description': item.get('description', ''),
+            'id': item_id,
+        }
     
     def get_items_by_rarity(self, rarity: str) -> List[Dict[str, Any]]:
         """Получение предметов по редкости"""
@@ -263,22 +298,24 @@ class ItemsCache:
         return results
     
     def get_cache_stats(self) -> Dict[str, Any]:
-        """Получение статистики кэша"""
-        total_items = len(self.cache)
+        """Получение статистики кэша (пересчитывается только при замене кэша)"""
+        if self._stats is None or self._stats_source is not self.cache:
+            self._stats = self._compute_stats(self.cache)
+            self._stats_source = self.cache
         
-        # Подсчет по типам
+        return {
+            'total_items': len(self.cache),
+            'types': dict(self._stats['types']),
+            'rarity': dict(self._stats['rarity']),
+            'price_ranges': dict(self._stats['price_ranges']),
+            'cache_file_size': self.readable_cache_file.stat().st_size if self.readable_cache_file.exists() else 0
+        }
+    
+    @staticmethod
+    def _compute_stats(cache: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """Подсчет по типам, редкости и ценовым диапазонам за один проход"""
         types_count = {}
-        for item in self.cache.values():
-            item_type = item.get('type', 'Unknown')
-            types_count[item_type] = types_count.get(item_type, 0) + 1
-        
-        # Подсчет по редкости
         rarity_count = {}
-        for item in self.cache.values():
-            rarity = item.get('rarity', 'Unknown')
-            rarity_count[rarity] = rarity_count.get(rarity, 0) + 1
-        
-        # Подсчет по ценовым диапазонам
         price_ranges = {
             '0-1000': 0,
             '1000-10000': 0,
@@ -286,7 +323,13 @@ class ItemsCache:
             '100000+': 0
         }
         
-        for item in self.cache.values():
+        for item in cache.values():
+            item_type = item.get('type', 'Unknown')
+            types_count[item_type] = types_count.get(item_type, 0) + 1
+            
+            rarity = item.get('rarity', 'Unknown')
+            rarity_count[rarity] = rarity_count.get(rarity, 0) + 1
+            
             price = item.get('price', 0)
             if price < 1000:
                 price_ranges['0-1000'] += 1
@@ -297,13 +340,7 @@ class ItemsCache:
             else:
                 price_ranges['100000+'] += 1
         
-        return {
-            'total_items': total_items,
-            'types': types_count,
-            'rarity': rarity_count,
-            'price_ranges': price_ranges,
-            'cache_file_size': self.readable_cache_file.stat().st_size if self.readable_cache_file.exists() else 0
-        }
+        return {'types': types_count, 'rarity': rarity_count, 'price_ranges': price_ranges}
     
     def format_price(self, price: int) -> str:
         """Форматирование цены для отображения"""
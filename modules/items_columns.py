@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items Columns - Колоночное представление числовых свойств предметов
+
+Для каждого числового поля _props (Weight, BasePrice, Width, Height,
+Durability и т.д.) хранится массив NumPy, строки которого соответствуют
+предметам из массива ID. Отсутствующее значение - NaN, удаленные предметы
+помечаются в маске валидности. Фильтры по диапазону, сортировка и
+агрегаты выполняются векторно, без обхода вложенных словарей.
+
+Таблица - индекс общего хранилища (см. items_store.py) и обновляется
+инкрементально при изменении предметов.
+"""
+
+import numpy as np
+from typing import Dict, List, Any, Optional, Iterable
+
+try:
+    from modules.items_index import StoreIndex
+except ImportError:
+    from items_index import StoreIndex
+
+def _numeric_props(item: Dict[str, Any]) -> Dict[str, float]:
+    """Числовые свойства _props предмета (bool не считается числом)"""
+    props = item.get('_props') if isinstance(item, dict) else None
+    if not isinstance(props, dict):
+        return {}
+    return {key: value for key, value in props.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+class ItemsColumns(StoreIndex):
+    """Массивы NumPy по числовым полям _props с маской валидности строк"""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.valid = np.zeros(0, dtype=bool)
+        self.columns: Dict[str, np.ndarray] = {}
+        self.size = 0  # Число занятых строк (массивы могут быть длиннее)
+
+    def build(self, items_data: Dict[str, Any]):
+        """Построение всех колонок за один проход"""
+        values: Dict[str, List[float]] = {}
+        ids = list(items_data)
+        for row, item_id in enumerate(ids):
+            for field, value in _numeric_props(items_data[item_id]).items():
+                column = values.get(field)
+                if column is None:
+                    column = values[field] = [np.nan] * len(ids)
+                column[row] = value
+
+        self.ids = ids
+        self.rows = {item_id: row for row, item_id in enumerate(ids)}
+        self.size = len(ids)
+        self.valid = np.ones(self.size, dtype=bool)
+        self.columns = {field: np.array(column, dtype=np.float64) for field, column in values.items()}
+
+    def _ensure_capacity(self, rows: int):
+        """Увеличение массивов с запасом (амортизированное добавление строк)"""
+        capacity = len(self.valid)
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, 16)
+        valid = np.zeros(new_capacity, dtype=bool)
+        valid[:capacity] = self.valid
+        self.valid = valid
+        for field, column in self.columns.items():
+            grown = np.full(new_capacity, np.nan)
+            grown[:capacity] = column
+            self.columns[field] = grown
+
+    def add_item(self, item_id: str, item: Dict[str, Any]):
+        row = self.rows.get(item_id)
+        if row is None:
+            row = self.size
+            self._ensure_capacity(row + 1)
+            self.ids.append(item_id)
+            self.rows[item_id] = row
+            self.size += 1
+
+        for field, value in _numeric_props(item).items():
+            column = self.columns.get(field)
+            if column is None:
+                column = self.columns[field] = np.full(len(self.valid), np.nan)
+            column[row] = value
+        self.valid[row] = True
+
+    def remove_item(self, item_id: str):
+        row = self.rows.get(item_id)
+        if row is None:
+            return
+        self.valid[row] = False
+        for column in self.columns.values():
+            column[row] = np.nan
+
+    def numeric_fields(self) -> List[str]:
+        """Имена числовых полей, для которых есть колонки"""
+        return sorted(self.columns)
+
+    def _mask(self, field: str, item_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Маска строк: валидные, со значением поля и (опционально) из списка ID"""
+        column = self.columns.get(field)
+        if column is None:
+            return np.zeros(self.size, dtype=bool)
+        mask = self.valid[:self.size] & ~np.isnan(column[:self.size])
+        if item_ids is not None:
+            subset = np.zeros(self.size, dtype=bool)
+            rows = [self.rows[item_id] for item_id in item_ids if item_id in self.rows]
+            subset[rows] = True
+            mask &= subset
+        return mask
+
+    def values(self, field: str, item_ids: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Значения поля по ID (только у предметов, где поле задано)"""
+        rows = np.flatnonzero(self._mask(field, item_ids))
+        if not rows.size:
+            return {}
+        column = self.columns[field]
+        return {self.ids[row]: float(column[row]) for row in rows}
+
+    def filter_range(self, field: str, min_value: Optional[float] = None,
+                     max_value: Optional[float] = None,
+                     item_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """ID предметов, у которых значение поля попадает в [min_value, max_value]"""
+        mask = self._mask(field, item_ids)
+        if not mask.any():
+            return []
+        column = self.columns[field][:self.size]
+        if min_value is not None:
+            mask &= column >= min_value
+        if max_value is not None:
+            mask &= column <= max_value
+        return [self.ids[row] for row in np.flatnonzero(mask)]
+
+    def sort_ids(self, field: str, item_ids: Iterable[str], descending: bool = False) -> List[str]:
+        """Сортировка ID по значению поля; предметы без значения идут в конце"""
+        item_ids = list(item_ids)
+        rows = np.array([self.rows.get(item_id, -1) for item_id in item_ids], dtype=np.int64)
+        column = self.columns.get(field)
+        if column is None or not rows.size:
+            return item_ids
+
+        keys = np.where(rows >= 0, column[np.maximum(rows, 0)], np.nan)
+        missing = np.isnan(keys)
+        keys = np.where(missing, 0.0, -keys if descending else keys)
+        # lexsort: последний ключ главный - сначала по наличию значения, затем по значению
+        order = np.lexsort((keys, missing))
+        return [item_ids[index] for index in order]
+
+    def stats(self, field: str, item_ids: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Агрегаты по полю: количество, минимум, максимум, среднее, медиана, сумма"""
+        mask = self._mask(field, item_ids)
+        if not mask.any():
+            return {'count': 0}
+        data = self.columns[field][:self.size][mask]
+        return {
+            'count': int(data.size),
+            'min': float(data.min()),
+            'max': float(data.max()),
+            'mean': float(data.mean()),
+            'median': float(np.median(data)),
+            'std': float(data.std()),
+            'sum': float(data.sum())
+        }
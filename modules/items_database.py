@@ -4,66 +4,190 @@
 Items Database - Модуль для работы с базой данных предметов из items.json
 """
 
-import orjson as json
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, Tuple
+from collections import Counter
 import time
 
+try:
+    from modules.items_store import acquire_items_store, release_items_store
+    from modules.items_index import ItemsSecondaryIndex, TrigramTextIndex, ItemsStatsIndex, ItemsHierarchyIndex
+    from modules.items_journal import apply_item_changes
+    from modules.items_lazy import LazyItemsMapping
+    from modules.items_references import ItemsReferencesIndex
+    from modules.locales_index import get_locales_index, get_configured_language
+    from modules.items_index import extract_prefab_path
+except ImportError:
+    from items_store import acquire_items_store, release_items_store
+    from items_index import ItemsSecondaryIndex, TrigramTextIndex, ItemsStatsIndex, ItemsHierarchyIndex
+    from items_journal import apply_item_changes
+    from items_lazy import LazyItemsMapping
+    from items_references import ItemsReferencesIndex
+    from locales_index import get_locales_index, get_configured_language
+    from items_index import extract_prefab_path
+
 class ItemsDatabase:
     """Класс для работы с базой данных предметов"""
     
-    def __init__(self, server_path: Path):
+    def __init__(self, server_path: Path, lazy: bool = False, language: Optional[str] = None):
+        """
+        Args:
+            server_path: Путь к директории сервера SPT
+            lazy: Ленивый режим - предметы читаются из файла по одному, пока
+                  не понадобятся все данные (поиск, фильтры, изменения)
+            language: Язык названий из database/locales/global (None - из config.yaml)
+        """
         self.server_path = server_path
         self.items_file = server_path / "database" / "templates" / "items.json"
-        self.items_data = {}
-        self.last_modified = 0
         
-        # Загрузка данных
-        self.load_items()
+        # Язык названий из database/locales (None - из config.yaml); индекс
+        # локали загружается при первом обращении
+        self.language = language
+        self._locales = None
+        
+        # Данные берутся из общего хранилища (файл разбирается один раз на процесс)
+        self._store = acquire_items_store(self.items_file, load=not lazy)
+        self._lazy_items: Optional[LazyItemsMapping] = None
+        # Счетчики по заголовкам ленивого режима: (ключ версии файла, результат)
+        self._header_stats = None
+        if lazy:
+            self._open_lazy()
+    
+    def _open_lazy(self):
+        """Переход в ленивый режим (если данные еще не загружены другим окном)"""
+        if self._store.data:
+            self._store.load()
+            return
+        try:
+            self._lazy_items = LazyItemsMapping(self.items_file)
+        except Exception as e:
+            print(f"Ленивый режим недоступен, загружаем все предметы: {e}")
+            self._store.load()
+    
+    def _materialize(self):
+        """Выход из ленивого режима: полная загрузка в общее хранилище"""
+        if self._lazy_items is not None:
+            self._lazy_items.close()
+            self._lazy_items = None
+            self._store.load()
+    
+    def is_lazy(self) -> bool:
+        """Работает ли база в ленивом режиме"""
+        return self._lazy_items is not None
+    
+    def _get_store(self):
+        """Общее хранилище (после close() база недоступна)"""
+        if self._store is None:
+            raise RuntimeError(f"База предметов {self.items_file} закрыта")
+        return self._store
+    
+    @property
+    def items_data(self) -> Dict[str, Any]:
+        """Данные предметов из общего хранилища (в ленивом режиме - полная загрузка)"""
+        store = self._get_store()
+        self._materialize()
+        return store.data
+    
+    @property
+    def last_modified(self) -> float:
+        """Время модификации загруженного файла"""
+        return self._get_store().last_modified
     
     def load_items(self) -> bool:
-        """Загрузка данных предметов из файла"""
-        try:
-            if not self.items_file.exists():
-                print(f"Файл {self.items_file} не найден")
-                return False
-            
-            # Проверяем время модификации файла
-            current_modified = self.items_file.stat().st_mtime
-            if current_modified == self.last_modified and self.items_data:
-                return True  # Файл не изменился, данные уже загружены
-            
-            with open(self.items_file, 'rb') as f:
-                self.items_data = json.loads(f.read())
-            
-            self.last_modified = current_modified
-            print(f"Загружено {len(self.items_data)} предметов из {self.items_file}")
+        """Загрузка данных предметов из файла (только если файл изменился)"""
+        store = self._get_store()
+        if self._lazy_items is not None:
+            if self._lazy_items.is_stale():
+                self._materialize()
             return True
-            
-        except Exception as e:
-            print(f"Ошибка загрузки файла предметов: {e}")
-            self.items_data = {}
-            return False
+        return store.load()
     
     def reload_items(self) -> bool:
         """Принудительная перезагрузка данных предметов"""
-        self.items_data = {}
-        self.last_modified = 0
-        return self.load_items()
+        store = self._get_store()
+        self._locales = None
+        self._materialize()
+        return store.load(force=True)
+    
+    def close(self):
+        """Освобождение ссылки на общее хранилище"""
+        if self._lazy_items is not None:
+            self._lazy_items.close()
+            self._lazy_items = None
+        if self._store is not None:
+            if self.in_transaction():
+                print("Незавершенная транзакция отменена при закрытии базы")
+                self.rollback()
+            release_items_store(self._store)
+            self._store = None
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
     
     def get_item(self, item_id: str) -> Optional[Dict[str, Any]]:
         """Получение предмета по ID"""
+        if self._lazy_items is not None:
+            # Файл мог быть перезаписан другим окном - тогда читаем из хранилища
+            if not self._lazy_items.is_stale():
+                return self._lazy_items.get(item_id)
+        
         if not self.items_data:
             self.load_items()
         
         return self.items_data.get(item_id)
     
+    def get_locales(self):
+        """Индекс локали сервера для языка базы (None, если файла локали нет)"""
+        if self._locales is None:
+            self.language = self.language or get_configured_language()
+            self._locales = get_locales_index(self.server_path, self.language) or False
+        return self._locales or None
+    
+    def set_language(self, language: str):
+        """Смена языка названий предметов"""
+        self.language = language
+        self._locales = None
+    
     def get_item_name(self, item_id: str) -> str:
-        """Получение названия предмета"""
+        """Получение названия предмета (сначала из локали сервера)"""
         item = self.get_item(item_id)
         if not item:
             return f"Unknown Item ({item_id[:8]}...)"
         
+        locales = self.get_locales()
+        if locales is not None and locales.get_name(item_id):
+            return locales.get_name(item_id)
+        return self._extract_name(item_id, item)
+    
+    def get_item_short_name(self, item_id: str) -> str:
+        """Получение короткого названия предмета (сначала из локали сервера)"""
+        item = self.get_item(item_id)
+        if not item:
+            return f"Unknown ({item_id[:8]}...)"
+        
+        locales = self.get_locales()
+        if locales is not None and locales.get_short_name(item_id):
+            return locales.get_short_name(item_id)
+        return self._extract_short_name(item_id, item)
+    
+    def get_item_description(self, item_id: str) -> str:
+        """Получение описания предмета (сначала из локали сервера)"""
+        item = self.get_item(item_id)
+        if not item:
+            return "No description available"
+        
+        locales = self.get_locales()
+        if locales is not None and locales.get_description(item_id):
+            return locales.get_description(item_id)
+        return self._extract_description(item)
+    
+    @staticmethod
+    def _extract_name(item_id: str, item: Dict[str, Any]) -> str:
+        """Извлечение названия из данных предмета"""
         # Приоритет: locale.Name -> locale.ShortName -> props.Name -> _name
         if 'locale' in item and item['locale']:
             if item['locale'].get('Name'):
@@ -76,12 +200,9 @@ class ItemsDatabase:
         
         return item.get('_name', f"Unknown Item ({item_id[:8]}...)")
     
-    def get_item_short_name(self, item_id: str) -> str:
-        """Получение короткого названия предмета"""
-        item = self.get_item(item_id)
-        if not item:
-            return f"Unknown ({item_id[:8]}...)"
-        
+    @staticmethod
+    def _extract_short_name(item_id: str, item: Dict[str, Any]) -> str:
+        """Извлечение короткого названия из данных предмета"""
         # Приоритет: locale.Name -> locale.ShortName -> props.Name -> props.ShortName -> _name
         if 'locale' in item and item['locale']:
             if item['locale'].get('Name'):
@@ -97,12 +218,9 @@ class ItemsDatabase:
         
         return item.get('_name', f"Unknown ({item_id[:8]}...)")
     
-    def get_item_description(self, item_id: str) -> str:
-        """Получение описания предмета"""
-        item = self.get_item(item_id)
-        if not item:
-            return "No description available"
-        
+    @staticmethod
+    def _extract_description(item: Dict[str, Any]) -> str:
+        """Извлечение описания из данных предмета"""
         if 'locale' in item and 'Description' in item['locale']:
             return item['locale']['Description']
         elif 'props' in item and 'Description' in item['props']:
@@ -272,92 +390,99 @@ class ItemsDatabase:
         
         return armor_props
     
-    def search_items(self, query: str, search_in: List[str] = None) -> List[Dict[str, Any]]:
-        """Поиск предметов по запросу"""
+    def search_items(self, query: str, search_in: List[str] = None,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Поиск предметов по запросу (лучшие совпадения первыми)"""
         if not self.items_data:
             return []
         
         if search_in is None:
             search_in = ['name', 'short_name', 'description', 'id']
         
-        query_lower = query.lower()
-        results = []
+        return [self._make_search_result(item_id)
+                for item_id, _ in self._get_text_index().search(query, search_in, limit)]
+    
+    def search_item_ids(self, query: str, search_in: List[str] = None,
+                        limit: Optional[int] = None) -> List[str]:
+        """Поиск ID предметов по запросу (лучшие совпадения первыми)
         
-        for item_id, item in self.items_data.items():
-            match_found = False
-            
-            # Поиск в названиях
-            if 'name' in search_in:
-                name = self.get_item_name(item_id).lower()
-                if query_lower in name:
-                    match_found = True
-            
-            if 'short_name' in search_in and not match_found:
-                short_name = self.get_item_short_name(item_id).lower()
-                if query_lower in short_name:
-                    match_found = True
-            
-            # Поиск в описании
-            if 'description' in search_in and not match_found:
-                description = self.get_item_description(item_id).lower()
-                if query_lower in description:
-                    match_found = True
-            
-            # Поиск по ID
-            if 'id' in search_in and not match_found:
-                if query_lower in item_id.lower():
-                    match_found = True
-            
-            if match_found:
-                results.append({
-                    'id': item_id,
-                    'name': self.get_item_name(item_id),
-                    'short_name': self.get_item_short_name(item_id),
-                    'type': self.get_item_type(item_id),
-                    'rarity': self.get_item_rarity(item_id),
-                    'price': self.get_item_price(item_id)
-                })
+        Кроме полей search_items поддерживается 'internal_name' (поле _name).
+        """
+        if not self.items_data:
+            return []
         
-        return results
+        return [item_id for item_id, _ in self._get_text_index().search(query, search_in, limit)]
+    
+    def _get_text_index(self) -> TrigramTextIndex:
+        """Текстовый индекс общего хранилища (строится один раз на язык)"""
+        self._materialize()
+        locales = self.get_locales()
+        if locales is None:
+            return self._store.get_index('text', _make_items_text_index)
+        return self._store.get_index(f"text:{locales.language}", lambda: _make_items_text_index(locales))
+    
+    def iter_item_headers(self):
+        """(ID, тип, путь префаба) всех предметов; в ленивом режиме без разбора шаблонов"""
+        if self._lazy_items is not None and not self._lazy_items.is_stale():
+            yield from self._lazy_items.iter_headers()
+            return
+        
+        for item_id, item in self.items_data.items():
+            yield item_id, item.get('_type', 'Unknown'), extract_prefab_path(item)
+    
+    def get_columns(self):
+        """Колоночная таблица числовых свойств _props (см. items_columns.py, нужен numpy)"""
+        try:
+            from modules.items_columns import ItemsColumns
+        except ImportError:
+            from items_columns import ItemsColumns
+        self._materialize()
+        return self._store.get_index('columns', ItemsColumns)
+    
+    def filter_items_by_range(self, field: str, min_value: Optional[float] = None,
+                              max_value: Optional[float] = None) -> List[str]:
+        """ID предметов, у которых _props.<field> попадает в диапазон"""
+        return self.get_columns().filter_range(field, min_value, max_value)
+    
+    def sort_item_ids(self, item_ids: List[str], field: str, descending: bool = False) -> List[str]:
+        """Сортировка ID по числовому полю _props (без значения - в конце)"""
+        return self.get_columns().sort_ids(field, item_ids, descending)
+    
+    def get_property_stats(self, field: str, item_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Статистика числового поля _props по всей базе или по списку ID"""
+        return self.get_columns().stats(field, item_ids)
+    
+    def _get_secondary_index(self) -> ItemsSecondaryIndex:
+        """Вторичные индексы общего хранилища (строятся один раз)"""
+        self._materialize()
+        return self._store.get_index('secondary', ItemsSecondaryIndex)
+    
+    def _make_search_result(self, item_id: str) -> Dict[str, Any]:
+        """Краткая информация о предмете для результатов поиска"""
+        return {
+            'id': item_id,
+            'name': self.get_item_name(item_id),
+            'short_name': self.get_item_short_name(item_id),
+            'type': self.get_item_type(item_id),
+            'rarity': self.get_item_rarity(item_id),
+            'price': self.get_item_price(item_id)
+        }
     
     def get_items_by_type(self, item_type: str) -> List[Dict[str, Any]]:
         """Получение предметов по типу"""
         if not self.items_data:
             return []
         
-        results = []
-        for item_id, item in self.items_data.items():
-            if item.get('_type', '').lower() == item_type.lower():
-                results.append({
-                    'id': item_id,
-                    'name': self.get_item_name(item_id),
-                    'short_name': self.get_item_short_name(item_id),
-                    'type': self.get_item_type(item_id),
-                    'rarity': self.get_item_rarity(item_id),
-                    'price': self.get_item_price(item_id)
-                })
-        
-        return results
+        index = self._get_secondary_index()
+        return [self._make_search_result(item_id) for item_id in index.lookup('type', item_type)]
     
     def get_items_by_rarity(self, rarity: str) -> List[Dict[str, Any]]:
         """Получение предметов по редкости"""
         if not self.items_data:
             return []
         
-        results = []
-        for item_id, item in self.items_data.items():
-            props = item.get('_props', {})
-            if props.get('RarityPvE', '').lower() == rarity.lower():
-                results.append({
-                    'id': item_id,
-                    'name': self.get_item_name(item_id),
-                    'short_name': self.get_item_short_name(item_id),
-                    'type': self.get_item_type(item_id),
-                    'rarity': self.get_item_rarity(item_id),
-                    'price': self.get_item_price(item_id)
-                })
-        
-        return results
+        index = self._get_secondary_index()
+        return [self._make_search_result(item_id) for item_id in index.lookup('rarity', rarity)]
     
     def get_items_by_caliber(self, caliber: str) -> List[Dict[str, Any]]:
         """Получение боеприпасов по калибру"""
@@ -365,18 +490,10 @@ class ItemsDatabase:
             return []
         
         results = []
-        for item_id, item in self.items_data.items():
-            props = item.get('_props', {})
-            if props.get('Caliber', '').lower() == caliber.lower():
-                results.append({
-                    'id': item_id,
-                    'name': self.get_item_name(item_id),
-                    'short_name': self.get_item_short_name(item_id),
-                    'type': self.get_item_type(item_id),
-                    'rarity': self.get_item_rarity(item_id),
-                    'price': self.get_item_price(item_id),
-                    'caliber': props.get('Caliber', '')
-                })
+        for item_id in self._get_secondary_index().lookup('caliber', caliber):
+            result = self._make_search_result(item_id)
+            result['caliber'] = self.get_item_props(item_id).get('Caliber', '')
+            results.append(result)
         
         return results
     
@@ -386,122 +503,271 @@ class ItemsDatabase:
             return []
         
         results = []
-        for item_id, item in self.items_data.items():
-            props = item.get('_props', {})
-            if props.get('weapClass', '').lower() == weapon_class.lower():
-                results.append({
-                    'id': item_id,
-                    'name': self.get_item_name(item_id),
-                    'short_name': self.get_item_short_name(item_id),
-                    'type': self.get_item_type(item_id),
-                    'rarity': self.get_item_rarity(item_id),
-                    'price': self.get_item_price(item_id),
-                    'weapon_class': props.get('weapClass', '')
-                })
+        for item_id in self._get_secondary_index().lookup('weapon_class', weapon_class):
+            result = self._make_search_result(item_id)
+            result['weapon_class'] = self.get_item_props(item_id).get('weapClass', '')
+            results.append(result)
         
         return results
     
+    def get_items_by_parent(self, parent_id: str) -> List[Dict[str, Any]]:
+        """Получение прямых потомков узла по _parent"""
+        if not self.items_data:
+            return []
+        
+        index = self._get_secondary_index()
+        return [self._make_search_result(item_id) for item_id in index.lookup('parent', parent_id)]
+    
+    def _get_hierarchy(self) -> ItemsHierarchyIndex:
+        """Дерево шаблонов по _parent (строится один раз)"""
+        self._materialize()
+        return self._store.get_index('hierarchy', ItemsHierarchyIndex)
+    
+    def is_descendant(self, item_id: str, ancestor_id: str) -> bool:
+        """Является ли предмет потомком узла на любой глубине (например, все магазины)"""
+        if not self.items_data:
+            return False
+        
+        return self._get_hierarchy().is_descendant(item_id, ancestor_id)
+    
+    def get_descendants(self, node_id: str, items_only: bool = False) -> List[str]:
+        """ID всех потомков узла; items_only - без промежуточных узлов (_type == 'Node')"""
+        if not self.items_data:
+            return []
+        
+        descendants = self._get_hierarchy().get_descendants(node_id)
+        if items_only:
+            items_data = self.items_data
+            descendants = [item_id for item_id in descendants if items_data[item_id].get('_type') != 'Node']
+        return descendants
+    
+    def get_ancestors(self, item_id: str) -> List[str]:
+        """Цепочка родительских узлов предмета от ближайшего к корню"""
+        if not self.items_data:
+            return []
+        
+        return self._get_hierarchy().get_ancestors(item_id)
+    
+    def _get_references_index(self) -> ItemsReferencesIndex:
+        """Обратный индекс ссылок (файлы крафта и торговцев перечитываются при изменении)"""
+        self._materialize()
+        index = self._store.get_index('references', lambda: ItemsReferencesIndex(self.server_path))
+        with self._store.lock:
+            index.refresh_files()
+        return index
+    
+    def get_item_references(self, item_id: str) -> List[Dict[str, str]]:
+        """Где используется шаблон: другие шаблоны, рецепты крафта, ассортимент торговцев
+        
+        Возвращает записи {'type': 'item'|'production'|'assort', 'source': ID
+        шаблона/рецепта/торговца, 'location': место ссылки}. Ссылки шаблона
+        на самого себя не учитываются.
+        """
+        if not self.items_data:
+            return []
+        
+        return [{'type': kind, 'source': source, 'location': location}
+                for kind, source, location in self._get_references_index().get_references(item_id)
+                if not (kind == 'item' and source == item_id)]
+    
+    def get_category_nodes(self) -> List[Tuple[str, str]]:
+        """Узлы дерева шаблонов (ID, имя), отсортированные по имени"""
+        if not self.items_data:
+            return []
+        
+        items_data = self.items_data
+        nodes = [(item_id, items_data[item_id].get('_name', item_id))
+                 for item_id in self._get_secondary_index().lookup('type', 'Node')]
+        return sorted(nodes, key=lambda node: str(node[1]).lower())
+    
+    def get_items_by_prefab_category(self, category: str) -> List[Dict[str, Any]]:
+        """Получение предметов по категории префаба (assets/content/<категория>/...)"""
+        if not self.items_data:
+            return []
+        
+        index = self._get_secondary_index()
+        return [self._make_search_result(item_id) for item_id in index.lookup('prefab_category', category)]
+    
+    def filter_item_ids(self, item_type: Optional[str] = None, rarity: Optional[str] = None,
+                        caliber: Optional[str] = None, weapon_class: Optional[str] = None,
+                        parent: Optional[str] = None, prefab_category: Optional[str] = None,
+                        ancestor: Optional[str] = None) -> List[str]:
+        """ID предметов, удовлетворяющих всем заданным фильтрам (None - фильтр не задан)
+        
+        ancestor - узел дерева шаблонов, потомками которого должны быть предметы.
+        """
+        if not self.items_data:
+            return []
+        
+        filters = {
+            'type': item_type,
+            'rarity': rarity,
+            'caliber': caliber,
+            'weapon_class': weapon_class,
+            'parent': parent,
+            'prefab_category': prefab_category
+        }
+        if ancestor is None:
+            return self._get_secondary_index().filter_ids(filters, self.items_data.keys())
+        
+        hierarchy = self._get_hierarchy()
+        if all(value is None for value in filters.values()):
+            return hierarchy.get_descendants(ancestor)
+        return [item_id for item_id in self._get_secondary_index().filter_ids(filters, self.items_data.keys())
+                if hierarchy.is_descendant(item_id, ancestor)]
+    
     def get_all_calibers(self) -> List[str]:
         """Получение всех калибров боеприпасов"""
         if not self.items_data:
             return []
         
-        calibers = set()
-        for item_id, item in self.items_data.items():
-            props = item.get('_props', {})
-            caliber = props.get('Caliber', '')
-            if caliber:
-                calibers.add(caliber)
-        
-        return sorted(list(calibers))
+        return self._get_secondary_index().values('caliber')
     
     def get_all_weapon_classes(self) -> List[str]:
         """Получение всех классов оружия"""
         if not self.items_data:
             return []
         
-        classes = set()
-        for item_id, item in self.items_data.items():
-            props = item.get('_props', {})
-            weapon_class = props.get('weapClass', '')
-            if weapon_class:
-                classes.add(weapon_class)
-        
-        return sorted(list(classes))
+        return self._get_secondary_index().values('weapon_class')
     
     def get_all_item_types(self) -> List[str]:
         """Получение всех типов предметов"""
         if not self.items_data:
             return []
         
-        types = set()
-        for item_id, item in self.items_data.items():
-            item_type = item.get('_type', '')
-            if item_type:
-                types.add(item_type)
-        
-        return sorted(list(types))
+        return self._get_secondary_index().values('type')
     
     def get_all_rarities(self) -> List[str]:
         """Получение всех редкостей предметов"""
         if not self.items_data:
             return []
         
-        rarities = set()
-        for item_id, item in self.items_data.items():
-            props = item.get('_props', {})
-            rarity = props.get('RarityPvE', '')
-            if rarity:
-                rarities.add(rarity)
+        return self._get_secondary_index().values('rarity')
+    
+    def get_all_prefab_categories(self) -> List[str]:
+        """Получение всех категорий префабов"""
+        if not self.items_data:
+            return []
         
-        return sorted(list(rarities))
+        return self._get_secondary_index().values('prefab_category')
     
     def get_database_stats(self) -> Dict[str, Any]:
-        """Получение статистики базы данных"""
+        """Получение статистики базы данных (счетчики поддерживаются инкрементально)"""
         if not self.items_data:
             return {'total_items': 0}
         
-        total_items = len(self.items_data)
-        
-        # Подсчет по типам
-        types_count = {}
-        for item in self.items_data.values():
-            item_type = item.get('_type', 'Unknown')
-            types_count[item_type] = types_count.get(item_type, 0) + 1
-        
-        # Подсчет по редкости
-        rarity_count = {}
-        for item in self.items_data.values():
-            props = item.get('_props', {})
-            rarity = props.get('RarityPvE', 'Unknown')
-            rarity_count[rarity] = rarity_count.get(rarity, 0) + 1
-        
-        # Подсчет оружия по классам
-        weapon_classes = {}
-        for item in self.items_data.values():
-            props = item.get('_props', {})
-            weapon_class = props.get('weapClass', '')
-            if weapon_class:
-                weapon_classes[weapon_class] = weapon_classes.get(weapon_class, 0) + 1
-        
-        # Подсчет боеприпасов по калибрам
-        calibers = {}
-        for item in self.items_data.values():
-            props = item.get('_props', {})
-            caliber = props.get('Caliber', '')
-            if caliber:
-                calibers[caliber] = calibers.get(caliber, 0) + 1
-        
+        stats = self._store.get_index('stats', ItemsStatsIndex)
         return {
-            'total_items': total_items,
-            'types': types_count,
-            'rarity': rarity_count,
-            'weapon_classes': weapon_classes,
-            'calibers': calibers,
+            'total_items': len(self.items_data),
+            'types': dict(stats.types),
+            'rarity': dict(stats.rarity),
+            'weapon_classes': dict(stats.weapon_classes),
+            'calibers': dict(stats.calibers),
             'file_path': str(self.items_file),
             'last_modified': self.last_modified
         }
     
+    def get_type_prefab_stats(self) -> Tuple[int, Dict[str, int], Dict[str, int]]:
+        """Количество предметов, счетчики по типам и путям префабов
+        
+        В ленивом режиме считается по индексу смещений без разбора предметов.
+        """
+        lazy = self._lazy_items
+        if lazy is not None and not lazy.is_stale():
+            key = (id(lazy), lazy.signature, lazy.journal_size)
+            if self._header_stats is None or self._header_stats[0] != key:
+                types, prefabs = Counter(), Counter()
+                for item_id, item_type, prefab_path in lazy.iter_headers():
+                    types[item_type] += 1
+                    if prefab_path:
+                        prefabs[prefab_path] += 1
+                self._header_stats = (key, (len(lazy), dict(types), dict(prefabs)))
+            total, types, prefabs = self._header_stats[1]
+            return total, dict(types), dict(prefabs)
+        
+        if not self.items_data:
+            return 0, {}, {}
+        stats = self._store.get_index('stats', ItemsStatsIndex)
+        return len(self.items_data), dict(stats.types), dict(stats.prefabs)
+    
+    def in_transaction(self) -> bool:
+        """Проверка, открыта ли транзакция этим экземпляром"""
+        return self._store is not None and self._store.in_transaction(self)
+    
+    def begin(self):
+        """Начало транзакции: изменения копятся в памяти и записываются одним commit()
+        
+        Транзакции могут быть вложенными - файл записывается при завершении внешней.
+        Состояние транзакции хранится в общем хранилище: пока она открыта,
+        сохранения из других окон откладываются до commit()/rollback().
+        """
+        self._store.begin_transaction(self)
+    
+    def commit(self) -> bool:
+        """Завершение транзакции с одной резервной копией и одной записью файла"""
+        return self._store.commit_transaction(self)
+    
+    def rollback(self):
+        """Отмена транзакции: восстановление предметов в памяти, файл не изменяется"""
+        self._store.rollback_transaction(self)
+    
+    @contextmanager
+    def transaction(self):
+        """Контекстный менеджер транзакции: commit при выходе, rollback при исключении"""
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        if not self.commit():
+            raise IOError(f"Не удалось сохранить {self.items_file}")
+    
+    def touch_item(self, item_id: str):
+        """Запоминание состояния предмета перед его изменением на месте
+        
+        Внутри транзакции позволяет откатить изменения, внесенные напрямую в
+        словарь из get_item(); вне транзакции ничего не делает.
+        """
+        self._store.touch_item(self, item_id)
+    
+    def _write_database(self) -> bool:
+        """Резервная копия и запись всей базы данных в файл (False - запись отложена)"""
+        return self._store.save(self)
+    
+    def compact_journal(self) -> bool:
+        """Слияние журнала одиночных изменений в основной файл"""
+        try:
+            return self._store.compact_journal()
+        except Exception as e:
+            print(f"Ошибка слияния журнала изменений: {e}")
+            return False
+    
+    def get_stale_journal(self) -> Optional[Tuple[Path, int]]:
+        """Отложенный устаревший журнал: (файл, число записей) или None"""
+        journal = self._get_store().journal
+        if not journal.has_stale():
+            return None
+        return journal.stale_file, len(journal.read_stale_entries())
+    
+    def replay_stale_journal(self) -> Tuple[int, int]:
+        """Применение отложенного журнала по ID предметов: (применено, осталось)"""
+        try:
+            return self._get_store().replay_stale_journal()
+        except Exception as e:
+            print(f"Ошибка применения отложенного журнала: {e}")
+            return 0, 0
+    
+    def _flush(self) -> bool:
+        """Запись изменений: вне транзакции сразу, внутри - при commit()
+        
+        Возвращает True, если файл был записан.
+        """
+        if self.in_transaction():
+            self._store.dirty = True
+            return False
+        return self._write_database()
+    
     def save_item(self, item_id: str, item_data: Dict[str, Any]) -> bool:
         """Сохранение предмета в базу данных"""
         try:
@@ -509,21 +775,13 @@ class ItemsDatabase:
                 self.load_items()
             
             # Обновляем данные предмета в памяти
+            self.touch_item(item_id)
             self.items_data[item_id] = item_data
+            self._store.item_changed(item_id)
             
-            # Создаем резервную копию
-            backup_file = self.items_file.with_suffix('.json.backup')
-            if self.items_file.exists():
-                backup_file.write_bytes(self.items_file.read_bytes())
-            
-            # Сохраняем ВСЮ базу данных в файл
-            with open(self.items_file, 'wb') as f:
-                f.write(json.dumps(self.items_data, option=json.OPT_INDENT_2))
-            
-            # Обновляем время модификации
-            self.last_modified = self.items_file.stat().st_mtime
-            
-            print(f"Предмет {item_id} сохранен в базу данных")
+            # Сохраняем ВСЮ базу данных в файл (в транзакции - при commit)
+            if self._flush():
+                print(f"Предмет {item_id} сохранен в базу данных")
             return True
             
         except Exception as e:
@@ -541,35 +799,17 @@ class ItemsDatabase:
                 return False
             
             # Применяем изменения к существующему предмету
-            current_item = self.items_data[item_id]
-            
-            # Обновляем основные параметры
-            for key, value in changes.items():
-                if key != '_props':
-                    current_item[key] = value
-            
-            # Обновляем _props если есть изменения
-            if '_props' in changes:
-                if '_props' not in current_item:
-                    current_item['_props'] = {}
-                
-                props_changes = changes['_props']
-                for prop_key, prop_value in props_changes.items():
-                    current_item['_props'][prop_key] = prop_value
-            
-            # Создаем резервную копию
-            backup_file = self.items_file.with_suffix('.json.backup')
-            if self.items_file.exists():
-                backup_file.write_bytes(self.items_file.read_bytes())
-            
-            # Сохраняем ВСЮ базу данных в файл
-            with open(self.items_file, 'wb') as f:
-                f.write(json.dumps(self.items_data, option=json.OPT_INDENT_2))
-            
-            # Обновляем время модификации
-            self.last_modified = self.items_file.stat().st_mtime
-            
-            print(f"Инкрементальные изменения для предмета {item_id} сохранены")
+            self.touch_item(item_id)
+            apply_item_changes(self.items_data[item_id], changes)
+            self._store.item_changed(item_id)
+            
+            # В транзакции файл запишется при commit, иначе изменения
+            # дописываются в журнал без перезаписи всей базы
+            if self.in_transaction():
+                self._store.dirty = True
+            else:
+                self._store.record_changes(item_id, changes, self)
+                print(f"Инкрементальные изменения для предмета {item_id} сохранены")
             return True
             
         except Exception as e:
@@ -583,27 +823,20 @@ class ItemsDatabase:
                 print("Нет данных для сохранения")
                 return False
             
-            # Создаем резервную копию
-            backup_file = self.items_file.with_suffix('.json.backup')
-            if self.items_file.exists():
-                backup_file.write_bytes(self.items_file.read_bytes())
-            
-            # Сохраняем всю базу данных
-            with open(self.items_file, 'wb') as f:
-                f.write(json.dumps(self.items_data, option=json.OPT_INDENT_2))
-            
-            # Обновляем время модификации
-            self.last_modified = self.items_file.stat().st_mtime
-            
-            print(f"База данных сохранена: {len(self.items_data)} предметов")
+            if self._flush():
+                print(f"База данных сохранена: {len(self.items_data)} предметов")
             return True
             
         except Exception as e:
             print(f"Ошибка сохранения базы данных: {e}")
             return False
     
-    def delete_item(self, item_id: str) -> bool:
-        """Удаление предмета из базы данных"""
+    def delete_item(self, item_id: str, force: bool = False) -> bool:
+        """Удаление предмета из базы данных
+        
+        Если на предмет ссылаются другие шаблоны, рецепты или ассортимент
+        торговцев, удаление отменяется (force=True - удалить все равно).
+        """
         try:
             if not self.items_data:
                 self.load_items()
@@ -612,22 +845,20 @@ class ItemsDatabase:
                 print(f"Предмет {item_id} не найден в базе данных")
                 return False
             
-            # Создаем резервную копию
-            backup_file = self.items_file.with_suffix('.json.backup')
-            if self.items_file.exists():
-                backup_file.write_bytes(self.items_file.read_bytes())
+            if not force:
+                references = self.get_item_references(item_id)
+                if references:
+                    print(f"Предмет {item_id} используется в {len(references)} местах, удаление отменено")
+                    return False
             
             # Удаляем предмет
+            self.touch_item(item_id)
             del self.items_data[item_id]
+            self._store.item_changed(item_id)
             
-            # Сохраняем обновленные данные
-            with open(self.items_file, 'wb') as f:
-                f.write(json.dumps(self.items_data, option=json.OPT_INDENT_2))
-            
-            # Обновляем время модификации
-            self.last_modified = self.items_file.stat().st_mtime
-            
-            print(f"Предмет {item_id} удален из базы данных")
+            # Сохраняем обновленные данные (в транзакции - при commit)
+            if self._flush():
+                print(f"Предмет {item_id} удален из базы данных")
             return True
             
         except Exception as e:
@@ -677,6 +908,40 @@ class ItemsDatabase:
         
         return name
 
+# Веса полей при ранжировании результатов поиска
+SEARCH_FIELD_WEIGHTS = {
+    'name': 4,
+    'short_name': 3,
+    'internal_name': 3,
+    'id': 2,
+    'description': 1,
+}
+
+def _items_text_fields(item_id: str, item: Dict[str, Any], locales=None) -> Dict[str, str]:
+    """Текстовые поля предмета для поискового индекса (названия - из локали, если есть)"""
+    if not isinstance(item, dict):
+        return {'id': item_id}
+    if locales is None:
+        locale_name = locale_short_name = locale_description = ''
+    else:
+        locale_name = locales.get_name(item_id)
+        locale_short_name = locales.get_short_name(item_id)
+        locale_description = locales.get_description(item_id)
+    return {
+        'name': locale_name or ItemsDatabase._extract_name(item_id, item),
+        'short_name': locale_short_name or ItemsDatabase._extract_short_name(item_id, item),
+        'internal_name': item.get('_name', ''),
+        'description': locale_description or ItemsDatabase._extract_description(item),
+        'id': item_id,
+    }
+
+def _make_items_text_index(locales=None) -> TrigramTextIndex:
+    """Фабрика текстового индекса для общего хранилища"""
+    if locales is None:
+        return TrigramTextIndex(_items_text_fields, SEARCH_FIELD_WEIGHTS)
+    return TrigramTextIndex(lambda item_id, item: _items_text_fields(item_id, item, locales),
+                            SEARCH_FIELD_WEIGHTS)
+
 def main():
     """Главная функция для тестирования модуля"""
     from pathlib import Path
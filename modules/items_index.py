@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items Index - Вторичные индексы по данным items.json
+
+Индексы строятся один раз по данным общего хранилища (см. items_store.py)
+и обновляются инкрементально при изменении отдельных предметов.
+Текстовый индекс триграмм используется также кэшем предметов (items_cache.py).
+Счетчики для статистики (ItemsStatsIndex) корректируются при каждом изменении.
+Дерево шаблонов по _parent (ItemsHierarchyIndex) отвечает на вопросы о потомках.
+"""
+
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+def extract_prefab_path(item: Dict[str, Any]) -> str:
+    """Путь префаба предмета (_props.Prefab.path) или пустая строка"""
+    props = item.get('_props')
+    if not isinstance(props, dict):
+        return ''
+    prefab = props.get('Prefab')
+    if not isinstance(prefab, dict):
+        return ''
+    path = prefab.get('path', '')
+    if not isinstance(path, str):
+        return ''
+    return path
+
+def extract_prefab_category(item: Dict[str, Any]) -> str:
+    """Категория префаба: assets/content/<категория>/<подкатегория>/..."""
+    parts = extract_prefab_path(item).split('/')
+    if len(parts) >= 4:
+        return parts[2]
+    return ''
+
+class StoreIndex(ABC):
+    """Базовый класс индексов, которые хранилище поддерживает в актуальном состоянии"""
+
+    def build(self, items_data: Dict[str, Any]):
+        """Полное построение индекса"""
+        for item_id, item in items_data.items():
+            self.add_item(item_id, item)
+
+    @abstractmethod
+    def add_item(self, item_id: str, item: Dict[str, Any]):
+        """Добавление предмета в индекс"""
+
+    @abstractmethod
+    def remove_item(self, item_id: str):
+        """Удаление предмета из индекса (по ранее сохраненным ключам)"""
+
+class ItemsSecondaryIndex(StoreIndex):
+    """Хэш-индексы по типу, редкости, калибру, классу оружия, родителю и категории префаба"""
+
+    # Поле индекса -> путь к значению в предмете
+    FIELDS = {
+        'type': ('_type',),
+        'rarity': ('_props', 'RarityPvE'),
+        'caliber': ('_props', 'Caliber'),
+        'weapon_class': ('_props', 'weapClass'),
+        'parent': ('_parent',),
+    }
+
+    def __init__(self):
+        fields = list(self.FIELDS) + ['prefab_category']
+        # поле -> значение в нижнем регистре -> упорядоченное множество ID
+        self.buckets: Dict[str, Dict[str, Dict[str, None]]] = {field: {} for field in fields}
+        # поле -> значение в нижнем регистре -> исходные написания значения
+        self.originals: Dict[str, Dict[str, Counter]] = {field: {} for field in fields}
+        # ID предмета -> ключи, под которыми он проиндексирован
+        self.item_keys: Dict[str, List[Tuple[str, str, str]]] = {}
+
+    def _extract_values(self, item: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Значения индексируемых полей предмета"""
+        values = []
+        for field, path in self.FIELDS.items():
+            value = item
+            for part in path:
+                value = value.get(part, '') if isinstance(value, dict) else ''
+            if isinstance(value, str):
+                values.append((field, value))
+        values.append(('prefab_category', extract_prefab_category(item)))
+        return values
+
+    def add_item(self, item_id: str, item: Dict[str, Any]):
+        if not isinstance(item, dict):
+            return
+        keys = []
+        for field, value in self._extract_values(item):
+            key = value.lower()
+            self.buckets[field].setdefault(key, {})[item_id] = None
+            self.originals[field].setdefault(key, Counter())[value] += 1
+            keys.append((field, key, value))
+        self.item_keys[item_id] = keys
+
+    def remove_item(self, item_id: str):
+        for field, key, value in self.item_keys.pop(item_id, ()):
+            bucket = self.buckets[field].get(key)
+            if bucket is not None:
+                bucket.pop(item_id, None)
+                if not bucket:
+                    del self.buckets[field][key]
+            originals = self.originals[field].get(key)
+            if originals is not None:
+                originals[value] -= 1
+                if originals[value] <= 0:
+                    del originals[value]
+                if not originals:
+                    del self.originals[field][key]
+
+    def lookup(self, field: str, value: str) -> List[str]:
+        """ID предметов с заданным значением поля (без учета регистра)"""
+        return list(self.buckets[field].get(value.lower(), ()))
+
+    def count(self, field: str, value: str) -> int:
+        """Количество предметов с заданным значением поля"""
+        return len(self.buckets[field].get(value.lower(), ()))
+
+    def values(self, field: str) -> List[str]:
+        """Все непустые значения поля (в исходном написании), отсортированные"""
+        result = set()
+        for key, originals in self.originals[field].items():
+            if key:
+                result.update(originals)
+        return sorted(result)
+
+    def filter_ids(self, filters: Dict[str, Optional[str]], all_ids) -> List[str]:
+        """Пересечение нескольких фильтров, начиная с самого короткого списка"""
+        active = [(field, value) for field, value in filters.items() if value is not None]
+        if not active:
+            return list(all_ids)
+
+        buckets = [self.buckets[field].get(value.lower(), {}) for field, value in active]
+        buckets.sort(key=len)
+        smallest, others = buckets[0], buckets[1:]
+        return [item_id for item_id in smallest if all(item_id in other for other in others)]
+
+class TrigramTextIndex(StoreIndex):
+    """Инвертированный индекс триграмм для поиска подстрок по текстовым полям
+
+    Тексты хранятся заранее приведенными к нижнему регистру. Запрос длиной от
+    трех символов сужается пересечением списков вхождений двух самых редких
+    триграмм, после чего кандидаты проверяются точным поиском подстроки.
+    """
+
+    # Удаленные записи помечаются и вычищаются, когда их становится слишком много
+    COMPACT_MIN_DEAD = 1000
+
+    def __init__(self, extractor: Callable[[str, Dict[str, Any]], Dict[str, str]],
+                 field_weights: Optional[Dict[str, int]] = None):
+        self.extractor = extractor
+        self.field_weights = field_weights or {}
+        self.docs: Dict[str, Tuple[int, Dict[str, str]]] = {}
+        self.ordinals: List[Optional[str]] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.dead = 0
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _index_doc(self, item_id: str, fields: Dict[str, str]):
+        ordinal = len(self.ordinals)
+        self.ordinals.append(item_id)
+        self.docs[item_id] = (ordinal, fields)
+
+        grams = set()
+        for text in fields.values():
+            grams |= self._trigrams(text)
+        postings = self.postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = [ordinal]
+            else:
+                posting.append(ordinal)
+
+    def add_item(self, item_id: str, item: Dict[str, Any]):
+        fields = self.extractor(item_id, item)
+        lowered = {field: text.lower() for field, text in fields.items() if isinstance(text, str) and text}
+        self._index_doc(item_id, lowered)
+
+    def remove_item(self, item_id: str):
+        doc = self.docs.pop(item_id, None)
+        if doc is None:
+            return
+        self.ordinals[doc[0]] = None
+        self.dead += 1
+        if self.dead >= self.COMPACT_MIN_DEAD and self.dead * 2 > len(self.ordinals):
+            self._compact()
+
+    def _compact(self):
+        """Перестроение списков вхождений без удаленных записей"""
+        docs = [(item_id, self.docs[item_id][1]) for item_id in self.ordinals if item_id is not None]
+        self.docs = {}
+        self.ordinals = []
+        self.postings = {}
+        self.dead = 0
+        for item_id, fields in docs:
+            self._index_doc(item_id, fields)
+
+    def _candidates(self, query: str):
+        """Ординалы документов, которые могут содержать запрос"""
+        if len(query) < 3:
+            return range(len(self.ordinals))
+
+        lists = []
+        for gram in self._trigrams(query):
+            posting = self.postings.get(gram)
+            if not posting:
+                return ()
+            lists.append(posting)
+        lists.sort(key=len)
+
+        if len(lists) == 1:
+            return lists[0]
+        candidates = set(lists[0])
+        candidates.intersection_update(lists[1])
+        return sorted(candidates)
+
+    def search(self, query: str, fields: Optional[List[str]] = None,
+               limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Поиск подстроки; результат - (ID, оценка), лучшие совпадения первыми
+
+        Оценка учитывает вес поля и характер совпадения: полное совпадение
+        выше совпадения с начала строки, а оно выше вхождения в середине.
+        """
+        query = query.lower()
+        weights = self.field_weights
+        results = []
+
+        for ordinal in self._candidates(query):
+            item_id = self.ordinals[ordinal]
+            if item_id is None:
+                continue
+            best = 0
+            for field, text in self.docs[item_id][1].items():
+                if fields is not None and field not in fields:
+                    continue
+                position = text.find(query)
+                if position < 0:
+                    continue
+                if text == query:
+                    quality = 3
+                elif position == 0:
+                    quality = 2
+                else:
+                    quality = 1
+                score = weights.get(field, 1) * 10 + quality
+                if score > best:
+                    best = score
+            if best:
+                results.append((best, ordinal, item_id))
+
+        results.sort(key=lambda entry: (-entry[0], entry[1]))
+        if limit is not None:
+            results = results[:limit]
+        return [(item_id, score) for score, _, item_id in results]
+
+class ItemsStatsIndex(StoreIndex):
+    """Счетчики для статистики базы: типы, редкость, классы оружия, калибры, пути префабов"""
+
+    def __init__(self):
+        self.types: Counter = Counter()
+        self.rarity: Counter = Counter()
+        self.weapon_classes: Counter = Counter()
+        self.calibers: Counter = Counter()
+        self.prefabs: Counter = Counter()
+        # ID предмета -> (счетчик, ключ), учтенные для предмета
+        self.item_keys: Dict[str, List[Tuple[Counter, Any]]] = {}
+
+    def add_item(self, item_id: str, item: Dict[str, Any]):
+        if not isinstance(item, dict):
+            return
+        props = item.get('_props')
+        if not isinstance(props, dict):
+            props = {}
+
+        keys = [(self.types, item.get('_type', 'Unknown')),
+                (self.rarity, props.get('RarityPvE', 'Unknown'))]
+        weapon_class = props.get('weapClass', '')
+        if weapon_class:
+            keys.append((self.weapon_classes, weapon_class))
+        caliber = props.get('Caliber', '')
+        if caliber:
+            keys.append((self.calibers, caliber))
+        prefab_path = extract_prefab_path(item)
+        if prefab_path:
+            keys.append((self.prefabs, prefab_path))
+
+        for counter, key in keys:
+            counter[key] += 1
+        self.item_keys[item_id] = keys
+
+    def remove_item(self, item_id: str):
+        for counter, key in self.item_keys.pop(item_id, ()):
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+
+    def __len__(self) -> int:
+        return len(self.item_keys)
+
+class ItemsHierarchyIndex(StoreIndex):
+    """Дерево шаблонов по _parent с интервалами обхода в глубину
+
+    Для каждого узла хранятся моменты входа и выхода при обходе дерева:
+    Y - предок X, если вход X лежит строго внутри интервала Y. Интервалы
+    пересчитываются при первом запросе и только если у какого-либо шаблона
+    изменился _parent (правка других полей дерево не трогает).
+    """
+
+    def __init__(self):
+        # ID -> родитель
+        self.parents: Dict[str, str] = {}
+        # Родитель -> упорядоченное множество дочерних ID
+        self.children: Dict[str, Dict[str, None]] = {}
+        # Удаленные, но, возможно, добавляемые снова предметы -> прежний родитель
+        self.detached: Dict[str, str] = {}
+        self.tin: Dict[str, int] = {}
+        self.tout: Dict[str, int] = {}
+        self.order: List[str] = []
+        self.valid = False
+
+    def add_item(self, item_id: str, item: Dict[str, Any]):
+        if not isinstance(item, dict):
+            return
+        parent = item.get('_parent', '')
+        if not isinstance(parent, str):
+            parent = ''
+        previous = self.detached.pop(item_id, None)
+        if previous != parent:
+            self.valid = False
+
+        self.parents[item_id] = parent
+        if parent:
+            self.children.setdefault(parent, {})[item_id] = None
+
+    def remove_item(self, item_id: str):
+        parent = self.parents.pop(item_id, None)
+        if parent is None:
+            return
+        siblings = self.children.get(parent)
+        if siblings is not None:
+            siblings.pop(item_id, None)
+            if not siblings:
+                del self.children[parent]
+        # Интервалы остаются верными, пока предмет не вернулся с другим родителем
+        self.detached[item_id] = parent
+
+    def _ensure_tour(self):
+        """Пересчет интервалов, если структура дерева изменилась"""
+        # Удаление узла с потомками меняет предков у всего поддерева
+        if any(item_id in self.children for item_id in self.detached):
+            self.valid = False
+        self.detached.clear()
+        if self.valid:
+            return
+
+        tin, tout, order = {}, {}, []
+        nodes = set(self.parents) | set(self.children)
+        roots = [node for node in nodes if self.parents.get(node, '') not in nodes or self.parents.get(node) == node]
+        for root in sorted(roots):
+            tin[root] = len(order)
+            order.append(root)
+            stack = [(root, iter(self.children.get(root, ())))]
+            while stack:
+                node, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    tout[node] = len(order)
+                    stack.pop()
+                elif child not in tin:
+                    tin[child] = len(order)
+                    order.append(child)
+                    stack.append((child, iter(self.children.get(child, ()))))
+
+        self.tin, self.tout, self.order = tin, tout, order
+        self.valid = True
+
+    def is_descendant(self, item_id: str, ancestor_id: str) -> bool:
+        """Является ли item_id потомком ancestor_id (на любой глубине)"""
+        if item_id not in self.parents:
+            return False
+        self._ensure_tour()
+        start = self.tin.get(ancestor_id)
+        position = self.tin.get(item_id)
+        if start is None or position is None:
+            return False
+        return start < position < self.tout[ancestor_id]
+
+    def get_descendants(self, node_id: str) -> List[str]:
+        """Все потомки узла в порядке обхода дерева"""
+        self._ensure_tour()
+        start = self.tin.get(node_id)
+        if start is None:
+            return []
+        parents = self.parents
+        return [item_id for item_id in self.order[start + 1:self.tout[node_id]] if item_id in parents]
+
+    def get_ancestors(self, item_id: str) -> List[str]:
+        """Цепочка родителей от ближайшего к корню"""
+        ancestors = []
+        seen = {item_id}
+        parent = self.parents.get(item_id, '')
+        while parent and parent not in seen:
+            ancestors.append(parent)
+            seen.add(parent)
+            parent = self.parents.get(parent, '')
+        return ancestors
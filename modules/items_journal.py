@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items Journal - Журнал инкрементальных изменений items.json
+
+Одиночные правки предметов не переписывают весь items.json, а дописываются
+строкой JSON в журнал рядом с ним (items.json.journal). Журнал применяется
+поверх файла при загрузке и сливается в основной файл (компактируется) по
+запросу, при закрытии последнего окна или при превышении размера.
+
+Первая строка журнала - заголовок с mtime/size файла, к которому относятся
+записи. Если файл после этого был изменен вне редактора (восстановление
+резервной копии, обновление сервера, git), журнал устарел и не
+применяется, но и не удаляется: он переносится в items.json.journal.stale,
+откуда записи можно применить по ID предметов (ItemsStore.replay_stale_journal)
+или восстановить вручную. Записи идемпотентны, поэтому повторное применение
+после сбоя безопасно; оборванные строки пропускаются.
+"""
+
+import os
+import orjson as json
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+def apply_item_changes(item: Dict[str, Any], changes: Dict[str, Any]):
+    """Применение инкрементальных изменений к предмету (_props сливается по ключам)"""
+    for key, value in changes.items():
+        if key != '_props':
+            item[key] = value
+
+    if '_props' in changes:
+        if '_props' not in item:
+            item['_props'] = {}
+        for prop_key, prop_value in changes['_props'].items():
+            item['_props'][prop_key] = prop_value
+
+class ItemsJournal:
+    """Append-only журнал изменений предметов"""
+
+    # Размер журнала, после которого изменения сливаются в основной файл
+    COMPACT_THRESHOLD = 1024 * 1024
+
+    def __init__(self, items_file: Path):
+        self.items_file = items_file
+        self.journal_file = items_file.with_suffix('.json.journal')
+        self.stale_file = items_file.with_suffix('.json.journal.stale')
+
+    def _base_signature(self) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) основного файла"""
+        try:
+            stat = self.items_file.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def size(self) -> int:
+        """Размер журнала в байтах (0, если журнала нет)"""
+        try:
+            return self.journal_file.stat().st_size
+        except OSError:
+            return 0
+
+    def has_entries(self) -> bool:
+        """Есть ли несохраненный в основной файл журнал"""
+        return self.size() > 0
+
+    def needs_compaction(self) -> bool:
+        """Превышен ли порог размера журнала"""
+        return self.size() > self.COMPACT_THRESHOLD
+
+    def append(self, item_id: str, changes: Dict[str, Any]):
+        """Дописывание изменений предмета с fsync"""
+        lines = []
+        if not self.has_entries():
+            lines.append(json.dumps({'base': self._base_signature()}))
+        lines.append(json.dumps({'id': item_id, 'changes': changes}))
+
+        with open(self.journal_file, 'a+b') as f:
+            # После оборванной записи начинаем с новой строки
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    lines.insert(0, b'')
+            f.write(b'\n'.join(lines) + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _parse_entries(lines: List[bytes]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Записи (ID, изменения) из строк журнала; заголовки и оборванные строки пропускаются"""
+        entries = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Оборванная запись (сбой во время записи)
+                print("Журнал изменений: пропущена поврежденная запись")
+                continue
+            if isinstance(entry, dict) and 'id' in entry:
+                entries.append((entry['id'], entry.get('changes', {})))
+        return entries
+
+    def read_entries(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Записи журнала (ID, изменения) в порядке записи; устаревший журнал откладывается"""
+        if not self.has_entries():
+            return []
+
+        try:
+            with open(self.journal_file, 'rb') as f:
+                lines = f.read().split(b'\n')
+        except OSError as e:
+            print(f"Ошибка чтения журнала изменений: {e}")
+            return []
+
+        try:
+            header = json.loads(lines[0])
+            base = header.get('base')
+        except (json.JSONDecodeError, AttributeError):
+            base = None
+        if base is None or tuple(base) != self._base_signature():
+            self.set_aside()
+            return []
+
+        return self._parse_entries(lines[1:])
+
+    def set_aside(self):
+        """Перенос устаревшего журнала в .stale (записи дописываются к уже отложенным)"""
+        try:
+            if self.stale_file.exists():
+                with open(self.journal_file, 'rb') as source, open(self.stale_file, 'ab') as target:
+                    target.write(b'\n' + source.read())
+                self.journal_file.unlink()
+            else:
+                os.replace(self.journal_file, self.stale_file)
+        except OSError as e:
+            print(f"Ошибка переноса устаревшего журнала изменений: {e}")
+            return
+        print(f"ВНИМАНИЕ: items.json изменен вне редактора, журнал изменений "
+              f"не применен и сохранен в {self.stale_file.name}")
+
+    def has_stale(self) -> bool:
+        """Есть ли отложенный устаревший журнал"""
+        try:
+            return self.stale_file.stat().st_size > 0
+        except OSError:
+            return False
+
+    def read_stale_entries(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Записи отложенного журнала (ID, изменения) в порядке записи"""
+        try:
+            with open(self.stale_file, 'rb') as f:
+                return self._parse_entries(f.read().split(b'\n'))
+        except OSError:
+            return []
+
+    def write_stale_entries(self, entries: List[Tuple[str, Dict[str, Any]]]):
+        """Замена отложенного журнала записями entries (пустой список - удаление)"""
+        if not entries:
+            try:
+                self.stale_file.unlink()
+            except FileNotFoundError:
+                pass
+            return
+        lines = [json.dumps({'id': item_id, 'changes': changes}) for item_id, changes in entries]
+        with open(self.stale_file, 'wb') as f:
+            f.write(b'\n'.join(lines) + b'\n')
+
+    def replay(self, items_data: Dict[str, Any]) -> int:
+        """Применение журнала к загруженным данным; возвращает число записей"""
+        applied = 0
+        for item_id, changes in self.read_entries():
+            item = items_data.get(item_id)
+            if isinstance(item, dict):
+                apply_item_changes(item, changes)
+                applied += 1
+
+        if applied:
+            print(f"Применено {applied} изменений из журнала {self.journal_file.name}")
+        return applied
+
+    def clear(self):
+        """Удаление журнала (после записи основного файла)"""
+        try:
+            self.journal_file.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items Lazy - Ленивый доступ к отдельным предметам items.json
+
+Вместо загрузки всего файла используется индекс смещений: для каждого
+шаблона хранится диапазон байтов в items.json, а также тип и путь префаба
+(для статистики без разбора предметов). Индекс строится один раз и
+сохраняется рядом с файлом (items.json.offsets); при изменении mtime или
+размера items.json он перестраивается.
+
+Предметы читаются из отображенного в память файла и разбираются по
+одному при обращении; последние разобранные держатся в небольшом LRU.
+Несохраненные изменения из журнала (items_journal.py) накладываются
+поверх прочитанных предметов.
+"""
+
+import mmap
+import threading
+import weakref
+import orjson as json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+
+try:
+    from modules.atomic_writer import atomic_write_bytes
+    from modules.items_index import extract_prefab_path
+    from modules.items_journal import ItemsJournal, apply_item_changes
+    from modules.json_loader import load_json
+except ImportError:
+    from atomic_writer import atomic_write_bytes
+    from items_index import extract_prefab_path
+    from items_journal import ItemsJournal, apply_item_changes
+    from json_loader import load_json
+
+_WHITESPACE = b' \t\r\n'
+
+# Открытые отображения - их нужно закрыть перед перезаписью файла (на Windows
+# файл, отображенный в память, нельзя заменить)
+_open_mappings = weakref.WeakSet()
+
+def release_lazy_mappings(items_file: Path):
+    """Закрытие отображений файла перед его перезаписью"""
+    for mapping in list(_open_mappings):
+        if mapping.items_file == items_file:
+            mapping.close()
+
+class LazyItemsMapping:
+    """Доступ к предметам items.json по ID без полной загрузки файла"""
+
+    # Сколько разобранных предметов держать в памяти
+    CACHE_SIZE = 256
+    # Версия формата файла индекса
+    INDEX_FORMAT = 1
+
+    def __init__(self, items_file: Path):
+        self.items_file = items_file
+        self.index_file = items_file.with_suffix('.json.offsets')
+        self.journal = ItemsJournal(items_file)
+        self.signature: Optional[Tuple[int, int]] = None
+        # ID -> [начало, конец, тип, путь префаба]
+        self.entries: Dict[str, List[Any]] = {}
+        # ID -> изменения из журнала, еще не слитые в файл
+        self.pending: Dict[str, List[Dict[str, Any]]] = {}
+        self.journal_size = 0
+        self._cache: OrderedDict = OrderedDict()
+        self._file = None
+        self._mmap = None
+        self.lock = threading.RLock()
+        self.open()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.items_file.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def is_stale(self) -> bool:
+        """Изменились ли файл или журнал с момента открытия (или отображение закрыто)"""
+        if self._mmap is None:
+            return True
+        return self._stat() != self.signature or self.journal.size() != self.journal_size
+
+    def open(self):
+        """Открытие файла: чтение или построение индекса смещений и отображение в память"""
+        with self.lock:
+            self.close()
+            signature = self._stat()
+            if signature is None:
+                raise FileNotFoundError(f"Файл {self.items_file} не найден")
+
+            entries = self._read_index(signature)
+            self._file = open(self.items_file, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if entries is None:
+                entries = self._build_index(signature)
+            self.entries = entries
+            self.signature = signature
+
+            self.pending = {}
+            for item_id, changes in self.journal.read_entries():
+                self.pending.setdefault(item_id, []).append(changes)
+            # Размер после чтения: устаревший журнал при чтении откладывается
+            self.journal_size = self.journal.size()
+            _open_mappings.add(self)
+
+    def close(self):
+        """Закрытие отображения файла (обязательно перед перезаписью items.json)"""
+        with self.lock:
+            self._cache.clear()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            _open_mappings.discard(self)
+
+    def _read_index(self, signature: Tuple[int, int]) -> Optional[Dict[str, List[Any]]]:
+        """Чтение сохраненного индекса, если он относится к текущей версии файла"""
+        try:
+            with open(self.index_file, 'rb') as f:
+                index = json.loads(f.read())
+        except (OSError, json.JSONDecodeError):
+            return None
+        if index.get('format') != self.INDEX_FORMAT or tuple(index.get('base', ())) != signature:
+            return None
+        return index.get('items')
+
+    def _skip_whitespace(self, pos: int, step: int) -> int:
+        """Позиция первого непробельного байта от pos в направлении step"""
+        mm = self._mmap
+        while 0 <= pos < len(mm) and mm[pos] in _WHITESPACE:
+            pos += step
+        return pos
+
+    def _find_key(self, item_id: str, pos: int) -> Tuple[int, int]:
+        """Поиск ключа верхнего уровня: "<ID>" после '{' или ',' и перед ': {'
+
+        Возвращает (позиция ключа, позиция открывающей скобки значения).
+        """
+        mm = self._mmap
+        key = json.dumps(item_id)
+        while True:
+            key_pos = mm.find(key, pos)
+            if key_pos < 0:
+                raise ValueError(f"Ключ {item_id} не найден в {self.items_file.name}")
+            before = self._skip_whitespace(key_pos - 1, -1)
+            colon = self._skip_whitespace(key_pos + len(key), 1)
+            if before >= 0 and mm[before] in b'{,' and colon < len(mm) and mm[colon] == ord(':'):
+                value_start = self._skip_whitespace(colon + 1, 1)
+                if value_start < len(mm) and mm[value_start] == ord('{'):
+                    return key_pos, value_start
+            pos = key_pos + len(key)
+
+    def _build_index(self, signature: Tuple[int, int]) -> Dict[str, List[Any]]:
+        """Построение индекса: один полный разбор файла и поиск ключей по порядку"""
+        data = load_json(self.items_file)
+        if not isinstance(data, dict):
+            raise ValueError("items.json должен содержать объект")
+
+        mm = self._mmap
+        closing = mm.rfind(b'}')
+        entries: Dict[str, List[Any]] = {}
+        previous = None
+        pos = mm.find(b'{') + 1
+
+        for item_id, item in data.items():
+            if not isinstance(item, dict):
+                raise ValueError(f"Шаблон {item_id} не является объектом")
+            key_pos, value_start = self._find_key(item_id, pos)
+            if previous is not None:
+                previous[1] = mm.rfind(b'}', previous[0], key_pos) + 1
+            previous = [value_start, 0, item.get('_type', 'Unknown'), extract_prefab_path(item)]
+            entries[item_id] = previous
+            pos = value_start + 1
+        if previous is not None:
+            previous[1] = mm.rfind(b'}', previous[0], closing) + 1
+
+        # Проверка границ на первом и последнем шаблоне
+        ids = list(entries)
+        for item_id in (ids[0], ids[-1]) if ids else ():
+            start, end = entries[item_id][:2]
+            if json.loads(mm[start:end]) != data[item_id]:
+                raise ValueError("Не удалось определить границы шаблонов в items.json")
+
+        try:
+            index = {'format': self.INDEX_FORMAT, 'base': signature, 'items': entries}
+            atomic_write_bytes(self.index_file, json.dumps(index))
+        except OSError as e:
+            print(f"Не удалось сохранить индекс смещений: {e}")
+
+        print(f"Построен индекс смещений для {len(entries)} предметов")
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def keys(self):
+        return self.entries.keys()
+
+    def get(self, item_id: str, default: Any = None) -> Any:
+        """Предмет по ID (разбирается при первом обращении)"""
+        with self.lock:
+            item = self._cache.get(item_id)
+            if item is not None:
+                self._cache.move_to_end(item_id)
+                return item
+
+            entry = self.entries.get(item_id)
+            if entry is None or self._mmap is None:
+                return default
+
+            item = json.loads(self._mmap[entry[0]:entry[1]])
+            for changes in self.pending.get(item_id, ()):
+                apply_item_changes(item, changes)
+
+            self._cache[item_id] = item
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return item
+
+    def __getitem__(self, item_id: str) -> Any:
+        item = self.get(item_id)
+        if item is None:
+            raise KeyError(item_id)
+        return item
+
+    def iter_headers(self) -> Iterator[Tuple[str, str, str]]:
+        """(ID, тип, путь префаба) всех предметов без разбора шаблонов"""
+        for item_id, entry in self.entries.items():
+            if item_id in self.pending:
+                item = self.get(item_id)
+                yield item_id, item.get('_type', 'Unknown'), extract_prefab_path(item)
+            else:
+                yield item_id, entry[2], entry[3]
@@ -26,7 +26,7 @@ from tkinter import ttk, messagebox    # Дополнительные компо
 import orjson as json                  # Быстрая библиотека для работы с JSON
 from pathlib import Path               # Для работы с путями файловой системы
 from typing import Dict, List, Optional, Any, Union  # Аннотации типов для лучшей читаемости кода
-from collections import defaultdict, Counter  # Специальные коллекции для подсчета и группировки
+from collections import defaultdict  # Специальная коллекция для группировки
 import re                              # Регулярные выражения для поиска и фильтрации
 
 # Импорт системы отладочного логирования
@@ -82,6 +82,7 @@ try:
     from modules.items_cache import ItemsCache            # Модуль для работы с кэшем предметов
     from modules.hideout_areas import HideoutAreas        # Модуль для работы с зонами убежища
     from modules.context_menus import setup_context_menus_for_module  # Модуль для настройки контекстных меню
+    from modules.config_manager import ConfigManager     # Модуль настроек (config.yaml)
 except ImportError:
     # Если модули не найдены, добавляем путь к модулям в sys.path
     # Это необходимо для корректного импорта при запуске из разных директорий
@@ -96,6 +97,7 @@ except ImportError:
     from items_cache import ItemsCache
     from hideout_areas import HideoutAreas
     from context_menus import setup_context_menus_for_module
+    from config_manager import ConfigManager
 
 class ItemsManager:
     """
@@ -137,7 +139,9 @@ class ItemsManager:
         
         # Инициализация модулей
         info("Инициализация модулей базы данных", LogCategory.DATABASE)
-        self.items_db = ItemsDatabase(server_path)
+        # Ленивый режим: для статистики достаточно индекса смещений items.json
+        lazy_items = ConfigManager().get('performance.lazy_items', True)
+        self.items_db = ItemsDatabase(server_path, lazy=bool(lazy_items))
         self.items_cache = ItemsCache(server_path)
         self.hideout_areas = HideoutAreas()
         
@@ -160,6 +164,8 @@ class ItemsManager:
         # Переменные для статистики
         self.items_statistics = {}
         self.prefab_statistics = {}
+        # Отложенный журнал, от применения которого пользователь отказался
+        self.declined_stale_journal = None
         
         debug("Инициализированы переменные статистики", LogCategory.SYSTEM)
         
@@ -172,6 +178,9 @@ class ItemsManager:
         
         # Обработка закрытия окна
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # Освобождение общего хранилища предметов при уничтожении окна модуля
+        self.window.bind("<Destroy>", self.on_window_destroy, add="+")
     
     def create_widgets(self):
         """Создание интерфейса"""
@@ -351,6 +360,11 @@ class ItemsManager:
         refresh_btn = ttk.Button(info_frame, text="🔄 Обновить статистику", 
                                 command=self.load_statistics)
         refresh_btn.pack(side=tk.RIGHT)
+        
+        # Кнопка слияния журнала изменений в items.json
+        compact_btn = ttk.Button(info_frame, text="💾 Записать журнал в items.json", 
+                                command=self.compact_journal)
+        compact_btn.pack(side=tk.RIGHT, padx=(0, 5))
     
     def load_statistics(self):
         """Загрузка и анализ статистики предметов"""
@@ -358,41 +372,27 @@ class ItemsManager:
             self.status_label.config(text="Загрузка статистики...")
             self.window.update()
             
-            # Получение всех предметов
-            items_data = self.items_db.items_data
-            total_items = len(items_data)
+            # Счетчики по типам и путям префабов поддерживаются базой данных
+            total_items, by_type, by_prefab = self.items_db.get_type_prefab_stats()
+            prefab_categories = defaultdict(lambda: defaultdict(int))
+            
+            for prefab_path, count in by_prefab.items():
+                # Разбор пути на категории
+                path_parts = prefab_path.split("/")
+                if len(path_parts) >= 4:  # assets/content/category/subcategory/...
+                    category = path_parts[2] if len(path_parts) > 2 else "unknown"
+                    subcategory = path_parts[3] if len(path_parts) > 3 else "unknown"
+                    prefab_categories[category][subcategory] += count
             
             if total_items == 0:
                 self.status_label.config(text="Нет данных о предметах")
                 return
             
-            # Анализ по типам
-            type_counter = Counter()
-            prefab_counter = Counter()
-            prefab_categories = defaultdict(lambda: defaultdict(int))
-            
-            for item_id, item_data in items_data.items():
-                # Анализ типа
-                item_type = item_data.get("_type", "Unknown")
-                type_counter[item_type] += 1
-                
-                # Анализ пути префаба
-                prefab_path = self.extract_prefab_path(item_data)
-                if prefab_path:
-                    prefab_counter[prefab_path] += 1
-                    
-                    # Разбор пути на категории
-                    path_parts = prefab_path.split("/")
-                    if len(path_parts) >= 4:  # assets/content/category/subcategory/...
-                        category = path_parts[2] if len(path_parts) > 2 else "unknown"
-                        subcategory = path_parts[3] if len(path_parts) > 3 else "unknown"
-                        prefab_categories[category][subcategory] += 1
-            
             # Сохранение статистики
             self.items_statistics = {
                 'total': total_items,
-                'by_type': dict(type_counter),
-                'by_prefab': dict(prefab_counter),
+                'by_type': by_type,
+                'by_prefab': by_prefab,
                 'prefab_categories': dict(prefab_categories)
             }
             
@@ -403,10 +403,38 @@ class ItemsManager:
             
             self.status_label.config(text=f"Статистика загружена: {total_items} предметов")
             
+            self.check_stale_journal()
+            
         except Exception as e:
             self.status_label.config(text=f"Ошибка загрузки: {str(e)}")
             messagebox.showerror("Ошибка", f"Не удалось загрузить статистику: {str(e)}")
     
+    def check_stale_journal(self):
+        """Предложение применить журнал изменений, отложенный из-за изменения items.json вне редактора"""
+        stale = self.items_db.get_stale_journal()
+        if stale is None:
+            return
+        stale_file, count = stale
+        if self.declined_stale_journal == (stale_file, count):
+            return
+        
+        warning(f"Найден отложенный журнал изменений: {stale_file} ({count} записей)", LogCategory.DATABASE)
+        replay = messagebox.askyesno(
+            "Журнал изменений не применен",
+            f"items.json был изменен вне редактора (восстановление копии, обновление сервера и т.п.), "
+            f"поэтому {count} сохраненных изменений предметов не были применены.\n\n"
+            f"Применить их к текущему items.json по ID предметов?\n\n"
+            f"Нет - изменения останутся в файле {stale_file.name} для ручного восстановления.")
+        if not replay:
+            self.declined_stale_journal = (stale_file, count)
+            return
+        
+        applied, missing = self.items_db.replay_stale_journal()
+        message = f"Применено изменений: {applied}"
+        if missing:
+            message += f"\nПредметы не найдены: {missing} (записи остались в {stale_file.name})"
+        messagebox.showinfo("Журнал изменений", message)
+    
     def extract_prefab_path(self, item_data):
         """Извлечение пути префаба из данных предмета"""
         try:
@@ -532,6 +560,14 @@ class ItemsManager:
             error(f"Неожиданная ошибка при открытии интерфейса массового изменения: {e}", LogCategory.ERROR, exception=e)
             messagebox.showerror("Ошибка", f"Неожиданная ошибка при открытии интерфейса массового изменения:\n{str(e)}")
     
+    def compact_journal(self):
+        """Слияние журнала одиночных изменений в items.json (его читает сервер SPT)"""
+        info("Слияние журнала изменений по запросу", LogCategory.DATABASE)
+        if self.items_db.compact_journal():
+            messagebox.showinfo("Журнал изменений", "Изменения из журнала записаны в items.json")
+        else:
+            messagebox.showinfo("Журнал изменений", "Нет изменений для записи")
+    
     def open_create_interface(self):
         """Открытие интерфейса создания предметов"""
         messagebox.showinfo("В разработке", "Интерфейс создания и дублирования предметов будет реализован в следующих версиях")
@@ -541,6 +577,13 @@ class ItemsManager:
         # Окно управляется основной программой, просто очищаем содержимое
         for widget in self.window.winfo_children():
             widget.destroy()
+        self.items_db.close()
+    
+    def on_window_destroy(self, event):
+        """Обработка уничтожения окна модуля"""
+        # Событие приходит и для дочерних виджетов - реагируем только на само окно
+        if event.widget is self.window:
+            self.items_db.close()
 
 def main():
     """Главная функция для тестирования модуля"""
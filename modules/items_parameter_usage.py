@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items Parameter Usage - Использование параметров предметов за один проход
+
+ParameterUsage за один обход предметов накапливает для каждого пути
+параметра (как в ItemsAnalyzer.collect_all_parameters) число предметов с
+параметром, разбивку по типам и категориям префабов, типы значений и
+примеры. Списки "без параметра" не требуют второго обхода: они получаются
+из общего числа предметов каждого типа и категории.
+
+Наличие и значение параметра определяются по тем же правилам, что у
+ItemsAnalyzer.has_parameter/get_parameter_value: путь из одной точки
+проверяется прямым обращением к вложенному словарю, остальные ("особые")
+пути - общей функцией lookup_parameter. Накопители частей базы складываются
+через merge() в порядке частей - результат совпадает с одним проходом.
+"""
+
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+
+# Запись пути: [число предметов, по типам, по категориям, по подкатегориям,
+#               типы значений (упорядоченное множество), примеры значений]
+USAGE, BY_TYPE, BY_CATEGORY, BY_SUBCATEGORY, VALUE_TYPES, SAMPLES = range(6)
+# Сколько примеров значений хранить для параметра
+MAX_SAMPLES = 5
+
+def lookup_parameter(item_data: Dict[str, Any], param_name: str) -> Tuple[bool, Any]:
+    """(есть ли параметр, значение) по правилам ItemsAnalyzer.has_parameter/get_parameter_value"""
+    props = item_data.get('_props') if '_props' in item_data else None
+    if not isinstance(props, dict):
+        return False, None
+
+    # Простой параметр
+    if param_name in props:
+        return True, props[param_name]
+
+    # Вложенный параметр (например, "Prefab.path")
+    if '.' in param_name:
+        current = props
+        for part in param_name.split('.'):
+            if isinstance(current, dict) and part in current:
+                current = current[part]
+            else:
+                return False, None
+        return True, current
+
+    # Параметр в массиве (например, "Requirements[0]")
+    if '[' in param_name and ']' in param_name:
+        param_value = props.get(param_name.split('[')[0])
+        if isinstance(param_value, list):
+            return True, param_value
+
+    return False, None
+
+def is_special_path(param_name: str) -> bool:
+    """Путь, наличие которого не определить прямым обращением (две и больше точек или [] без точки)"""
+    dots = param_name.count('.')
+    return dots >= 2 or (dots == 0 and '[' in param_name and ']' in param_name)
+
+def _add_counts(target: Dict[str, int], source: Dict[str, int]):
+    for key, count in source.items():
+        target[key] = target.get(key, 0) + count
+
+class ParameterUsage:
+    """Накопитель использования параметров (складывается из частей базы)"""
+
+    def __init__(self, special_paths: Iterable[str] = ()):
+        self.special_paths = [path for path in special_paths if is_special_path(path)]
+        self._special = set(self.special_paths)
+        self.total_items = 0
+        # Число всех предметов по типу, категории и подкатегории префаба
+        self.type_counts: Dict[str, int] = {}
+        self.category_counts: Dict[str, int] = {}
+        self.subcategory_counts: Dict[str, int] = {}
+        # Путь параметра -> запись (см. USAGE ... SAMPLES)
+        self.usage: Dict[str, list] = {}
+
+    def _record(self, path: str, value: Any, item_type: str, category: str, subcategory: str):
+        entry = self.usage.get(path)
+        if entry is None:
+            entry = self.usage[path] = [0, {}, {}, {}, {}, []]
+        entry[USAGE] += 1
+        by_type = entry[BY_TYPE]
+        by_type[item_type] = by_type.get(item_type, 0) + 1
+        by_category = entry[BY_CATEGORY]
+        by_category[category] = by_category.get(category, 0) + 1
+        by_subcategory = entry[BY_SUBCATEGORY]
+        by_subcategory[subcategory] = by_subcategory.get(subcategory, 0) + 1
+        if value is not None:
+            entry[VALUE_TYPES][type(value).__name__] = None
+            if len(entry[SAMPLES]) < MAX_SAMPLES:
+                entry[SAMPLES].append(str(value)[:100])
+
+    def add_item(self, item_data: Dict[str, Any], item_type: str, category: str, subcategory: str):
+        """Учет одного предмета (тип и категории префаба уже определены)"""
+        self.total_items += 1
+        self.type_counts[item_type] = self.type_counts.get(item_type, 0) + 1
+        self.category_counts[category] = self.category_counts.get(category, 0) + 1
+        self.subcategory_counts[subcategory] = self.subcategory_counts.get(subcategory, 0) + 1
+
+        record = self._record
+        for path, value in self.item_records(item_data):
+            record(path, value, item_type, category, subcategory)
+
+    def item_records(self, item_data: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """Пути параметров предмета, которые учитываются в статистике, и их значения"""
+        props = item_data.get('_props') if '_props' in item_data else None
+        if not isinstance(props, dict):
+            return
+
+        special = self._special
+        for key, value in props.items():
+            # Простой параметр (особые пути учитываются ниже через lookup_parameter)
+            if not special or key not in special:
+                yield key, value
+
+            # Вложенный параметр "key.nested" (обе части без точек - один шаг вглубь)
+            if isinstance(value, dict) and '.' not in key:
+                for nested_key, nested_value in value.items():
+                    if '.' in nested_key:
+                        continue
+                    path = f"{key}.{nested_key}"
+                    # Одноименный параметр верхнего уровня уже учтен как простой
+                    if path not in props:
+                        yield path, nested_value
+
+        for path in self.special_paths:
+            found, value = lookup_parameter(item_data, path)
+            if found:
+                yield path, value
+
+    def add_paths(self, item_data: Dict[str, Any], item_type: str, category: str, subcategory: str,
+                  paths: Iterable[str]):
+        """Учет только заданных особых путей (без общих счетчиков предметов)
+
+        Нужен при сложении частей базы: особый путь, найденный в другой части,
+        досчитывается по предметам этой части перед merge().
+        """
+        for path in paths:
+            found, value = lookup_parameter(item_data, path)
+            if found:
+                self._record(path, value, item_type, category, subcategory)
+
+    def merge(self, other: 'ParameterUsage'):
+        """Добавление накопителя следующей части базы"""
+        self.total_items += other.total_items
+        _add_counts(self.type_counts, other.type_counts)
+        _add_counts(self.category_counts, other.category_counts)
+        _add_counts(self.subcategory_counts, other.subcategory_counts)
+
+        for path, other_entry in other.usage.items():
+            entry = self.usage.get(path)
+            if entry is None:
+                self.usage[path] = [other_entry[USAGE], dict(other_entry[BY_TYPE]),
+                                    dict(other_entry[BY_CATEGORY]), dict(other_entry[BY_SUBCATEGORY]),
+                                    dict(other_entry[VALUE_TYPES]), list(other_entry[SAMPLES])]
+                continue
+            entry[USAGE] += other_entry[USAGE]
+            _add_counts(entry[BY_TYPE], other_entry[BY_TYPE])
+            _add_counts(entry[BY_CATEGORY], other_entry[BY_CATEGORY])
+            _add_counts(entry[BY_SUBCATEGORY], other_entry[BY_SUBCATEGORY])
+            entry[VALUE_TYPES].update(other_entry[VALUE_TYPES])
+            if len(entry[SAMPLES]) < MAX_SAMPLES:
+                entry[SAMPLES].extend(other_entry[SAMPLES][:MAX_SAMPLES - len(entry[SAMPLES])])
+
+    @staticmethod
+    def _missing(counts: Dict[str, int], used: Dict[str, int]) -> List[str]:
+        """Ключи, у которых не все предметы имеют параметр"""
+        return [key for key, count in counts.items() if used.get(key, 0) < count]
+
+    def get_details(self, param_name: str) -> Dict[str, Any]:
+        """Статистика параметра в формате ItemsAnalyzer.analyze_single_parameter"""
+        entry = self.usage.get(param_name) or [0, {}, {}, {}, {}, []]
+        return {
+            'total_usage': entry[USAGE],
+            'usage_by_type': dict(entry[BY_TYPE]),
+            'usage_by_prefab_category': dict(entry[BY_CATEGORY]),
+            'usage_by_prefab_subcategory': dict(entry[BY_SUBCATEGORY]),
+            'items_without_param': self.total_items - entry[USAGE],
+            'types_without_param': self._missing(self.type_counts, entry[BY_TYPE]),
+            'prefab_categories_without_param': self._missing(self.category_counts, entry[BY_CATEGORY]),
+            'prefab_subcategories_without_param': self._missing(self.subcategory_counts, entry[BY_SUBCATEGORY]),
+            'parameter_types': list(entry[VALUE_TYPES]),
+            'sample_values': list(entry[SAMPLES])
+        }
+
+    def build_details(self, all_parameters: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Статистика всех параметров (в порядке all_parameters)"""
+        return {param_name: self.get_details(param_name) for param_name in all_parameters}
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items References - Обратный индекс ссылок на шаблоны предметов
+
+Для каждого ID шаблона хранится, кто на него ссылается:
+- другие шаблоны (_parent, фильтры Slots/Chambers/Cartridges/Grids/StackSlots,
+  ConflictingItems, defAmmo);
+- рецепты крафта из hideout/production.json (endProduct, requirements);
+- ассортимент торговцев из traders/<ID>/assort.json (items, barter_scheme).
+
+Ссылки из items.json обновляются инкрементально через общее хранилище
+(см. items_store.py). Файлы крафта и торговцев перечитываются по одному,
+только если у них изменились mtime или размер.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from modules.items_index import StoreIndex
+    from modules.json_loader import load_json
+except ImportError:
+    from items_index import StoreIndex
+    from json_loader import load_json
+
+# Ссылка: (вид источника, ID источника, место внутри источника)
+Reference = Tuple[str, str, str]
+
+# Поля _props со списками слотов, у которых в _props.filters есть Filter/ExcludedFilter
+SLOT_FIELDS = ('Slots', 'Chambers', 'Cartridges', 'Grids', 'StackSlots')
+# Поля _props со списком ID
+ID_LIST_FIELDS = ('ConflictingItems',)
+# Поля _props с одним ID
+ID_FIELDS = ('defAmmo',)
+
+def extract_item_references(item: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(ID, на который ссылается шаблон, место ссылки) для одного шаблона"""
+    refs = []
+    if not isinstance(item, dict):
+        return refs
+
+    parent = item.get('_parent')
+    if isinstance(parent, str) and parent:
+        refs.append((parent, '_parent'))
+
+    props = item.get('_props')
+    if not isinstance(props, dict):
+        return refs
+
+    for field in SLOT_FIELDS:
+        slots = props.get(field)
+        if not isinstance(slots, list):
+            continue
+        for slot in slots:
+            if not isinstance(slot, dict):
+                continue
+            name = slot.get('_name')
+            location = f"{field}:{name}" if name else field
+            slot_props = slot.get('_props')
+            filters = slot_props.get('filters') if isinstance(slot_props, dict) else None
+            if not isinstance(filters, list):
+                continue
+            for filter_entry in filters:
+                if not isinstance(filter_entry, dict):
+                    continue
+                for key, suffix in (('Filter', ''), ('ExcludedFilter', '.ExcludedFilter')):
+                    ids = filter_entry.get(key)
+                    if isinstance(ids, list):
+                        refs.extend((target, location + suffix) for target in ids if isinstance(target, str))
+
+    for field in ID_LIST_FIELDS:
+        ids = props.get(field)
+        if isinstance(ids, list):
+            refs.extend((target, field) for target in ids if isinstance(target, str))
+
+    for field in ID_FIELDS:
+        target = props.get(field)
+        if isinstance(target, str) and target:
+            refs.append((target, field))
+
+    return refs
+
+def extract_production_references(production: Any) -> List[Tuple[str, Reference]]:
+    """Ссылки рецептов production.json: (ID шаблона, ссылка)"""
+    recipes = production.get('recipes', []) if isinstance(production, dict) else production
+    refs = []
+    if not isinstance(recipes, list):
+        return refs
+
+    for recipe in recipes:
+        if not isinstance(recipe, dict):
+            continue
+        recipe_id = str(recipe.get('_id', ''))
+        end_product = recipe.get('endProduct')
+        if isinstance(end_product, str) and end_product:
+            refs.append((end_product, ('production', recipe_id, 'endProduct')))
+        for requirement in recipe.get('requirements', []) or []:
+            if not isinstance(requirement, dict):
+                continue
+            template_id = requirement.get('templateId')
+            if isinstance(template_id, str) and template_id:
+                location = f"requirements:{requirement.get('type', '')}"
+                refs.append((template_id, ('production', recipe_id, location)))
+    return refs
+
+def extract_assort_references(trader_id: str, assort: Any) -> List[Tuple[str, Reference]]:
+    """Ссылки ассортимента торговца: (ID шаблона, ссылка)"""
+    refs = []
+    if not isinstance(assort, dict):
+        return refs
+
+    for entry in assort.get('items', []) or []:
+        if isinstance(entry, dict) and isinstance(entry.get('_tpl'), str):
+            refs.append((entry['_tpl'], ('assort', trader_id, f"items:{entry.get('_id', '')}")))
+
+    barter_scheme = assort.get('barter_scheme')
+    if isinstance(barter_scheme, dict):
+        for assort_id, schemes in barter_scheme.items():
+            for scheme in schemes if isinstance(schemes, list) else ():
+                for payment in scheme if isinstance(scheme, list) else ():
+                    if isinstance(payment, dict) and isinstance(payment.get('_tpl'), str):
+                        refs.append((payment['_tpl'], ('assort', trader_id, f"barter_scheme:{assort_id}")))
+    return refs
+
+class ItemsReferencesIndex(StoreIndex):
+    """Кто ссылается на шаблон: шаблоны, рецепты крафта и ассортимент торговцев"""
+
+    def __init__(self, server_path: Path):
+        self.production_file = server_path / "database" / "hideout" / "production.json"
+        self.traders_dir = server_path / "database" / "traders"
+        # ID шаблона -> упорядоченное множество ссылок на него
+        self.referenced_by: Dict[str, Dict[Reference, None]] = {}
+        # Источник (ID шаблона или путь к файлу) -> его ссылки, для удаления
+        self.source_refs: Dict[Any, List[Tuple[str, Reference]]] = {}
+        # Путь к файлу -> (mtime_ns, size) на момент чтения
+        self.file_signatures: Dict[Path, Tuple[int, int]] = {}
+
+    def _add_refs(self, source: Any, refs: List[Tuple[str, Reference]]):
+        for target, ref in refs:
+            self.referenced_by.setdefault(target, {})[ref] = None
+        self.source_refs[source] = refs
+
+    def _remove_refs(self, source: Any):
+        for target, ref in self.source_refs.pop(source, ()):
+            refs = self.referenced_by.get(target)
+            if refs is not None:
+                refs.pop(ref, None)
+                if not refs:
+                    del self.referenced_by[target]
+
+    def build(self, items_data: Dict[str, Any]):
+        super().build(items_data)
+        self.refresh_files()
+
+    def add_item(self, item_id: str, item: Dict[str, Any]):
+        refs = [(target, ('item', item_id, location)) for target, location in extract_item_references(item)]
+        self._add_refs(item_id, refs)
+
+    def remove_item(self, item_id: str):
+        self._remove_refs(item_id)
+
+    def _external_files(self) -> List[Tuple[Path, Optional[str]]]:
+        """Файлы крафта и ассортимента: (путь, ID торговца или None)"""
+        files = [(self.production_file, None)]
+        if self.traders_dir.is_dir():
+            for trader_dir in sorted(self.traders_dir.iterdir()):
+                if trader_dir.is_dir():
+                    files.append((trader_dir / "assort.json", trader_dir.name))
+        return files
+
+    def refresh_files(self):
+        """Перечитывание изменившихся файлов крафта и торговцев"""
+        seen = set()
+        for path, trader_id in self._external_files():
+            seen.add(path)
+            try:
+                stat = path.stat()
+            except OSError:
+                if path in self.file_signatures:
+                    del self.file_signatures[path]
+                    self._remove_refs(path)
+                continue
+
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self.file_signatures.get(path) == signature:
+                continue
+            try:
+                data = load_json(path)
+            except Exception as e:
+                print(f"Ошибка чтения {path} для индекса ссылок: {e}")
+                continue
+
+            self._remove_refs(path)
+            if trader_id is None:
+                self._add_refs(path, extract_production_references(data))
+            else:
+                self._add_refs(path, extract_assort_references(trader_id, data))
+            self.file_signatures[path] = signature
+
+        # Файлы удаленных торговцев
+        for path in [path for path in self.file_signatures if path not in seen]:
+            del self.file_signatures[path]
+            self._remove_refs(path)
+
+    def get_references(self, item_id: str) -> List[Reference]:
+        """Все ссылки на шаблон"""
+        return list(self.referenced_by.get(item_id, ()))
+
+    def is_referenced(self, item_id: str) -> bool:
+        """Есть ли ссылки на шаблон"""
+        return item_id in self.referenced_by
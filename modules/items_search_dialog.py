@@ -9,7 +9,7 @@ from tkinter import ttk, messagebox, simpledialog
 import orjson
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Set
-from collections import defaultdict
+from collections import defaultdict, Counter
 
 # Импорт модулей проекта
 try:
@@ -125,10 +125,10 @@ class ItemsSearchDialog:
         self.perform_search()
     
     def load_analysis_results(self):
-        """Загрузка результатов анализа параметров"""
+        """Загрузка результатов анализа параметров (кэш обновляется по измененным предметам)"""
         try:
             analyzer = ItemsAnalyzer(self.server_path)
-            return analyzer.load_analysis_results()
+            return analyzer.update_analysis()
         except Exception as e:
             print(f"Ошибка загрузки анализа: {e}")
             return None
@@ -234,7 +234,7 @@ class ItemsSearchDialog:
         self.type_var = tk.StringVar()
         self.type_combo = ttk.Combobox(row1, textvariable=self.type_var, width=15)
         self.type_combo.pack(side=tk.LEFT, padx=(0, 20))
-        self.type_combo['values'] = ['Все', 'Item', 'Node']
+        self.type_combo['values'] = ['Все'] + (self.items_db.get_all_item_types() or ['Item', 'Node'])
         self.type_combo.set('Все')
         self.type_combo.bind('<<ComboboxSelected>>', self.on_search_change)
         
@@ -247,7 +247,7 @@ class ItemsSearchDialog:
         self.prefab_category_var = tk.StringVar()
         self.prefab_category_combo = ttk.Combobox(row2, textvariable=self.prefab_category_var, width=20)
         self.prefab_category_combo.pack(side=tk.LEFT, padx=(0, 20))
-        self.prefab_category_combo['values'] = ['Все', 'weapons', 'items', 'location_objects', 'prefabs']
+        self.prefab_category_combo['values'] = ['Все'] + (self.items_db.get_all_prefab_categories() or ['weapons', 'items', 'location_objects', 'prefabs'])
         self.prefab_category_combo.set('Все')
         self.prefab_category_combo.bind('<<ComboboxSelected>>', self.on_search_change)
         
@@ -256,10 +256,20 @@ class ItemsSearchDialog:
         self.rarity_var = tk.StringVar()
         self.rarity_combo = ttk.Combobox(row2, textvariable=self.rarity_var, width=15)
         self.rarity_combo.pack(side=tk.LEFT, padx=(0, 20))
-        self.rarity_combo['values'] = ['Все', 'Common', 'Rare', 'Superrare', 'Not_exist', 'Not_exist_quest']
+        self.rarity_combo['values'] = ['Все'] + (self.items_db.get_all_rarities() or ['Common', 'Rare', 'Superrare', 'Not_exist', 'Not_exist_quest'])
         self.rarity_combo.set('Все')
         self.rarity_combo.bind('<<ComboboxSelected>>', self.on_search_change)
         
+        # Узел дерева шаблонов (все потомки на любой глубине, например все магазины)
+        ttk.Label(row2, text="Раздел:").pack(side=tk.LEFT, padx=(0, 5))
+        self.category_node_var = tk.StringVar()
+        self.category_node_combo = ttk.Combobox(row2, textvariable=self.category_node_var, width=25)
+        self.category_node_combo.pack(side=tk.LEFT, padx=(0, 20))
+        self.category_nodes = self.get_category_node_choices()
+        self.category_node_combo['values'] = ['Все'] + list(self.category_nodes)
+        self.category_node_combo.set('Все')
+        self.category_node_combo.bind('<<ComboboxSelected>>', self.on_search_change)
+        
         # Кнопка поиска
         search_btn = ttk.Button(row2, text="🔍 Поиск", command=self.perform_search)
         search_btn.pack(side=tk.LEFT, padx=(20, 0))
@@ -268,6 +278,12 @@ class ItemsSearchDialog:
         reset_btn = ttk.Button(row2, text="🔄 Сбросить", command=self.reset_filters)
         reset_btn.pack(side=tk.LEFT, padx=(5, 0))
     
+    def get_category_node_choices(self) -> Dict[str, str]:
+        """Отображаемое имя узла -> ID (одинаковые имена различаются по ID)"""
+        nodes = self.items_db.get_category_nodes()
+        names = Counter(name for _, name in nodes)
+        return {(name if names[name] == 1 else f"{name} ({node_id})"): node_id for node_id, name in nodes}
+    
     def create_results_panel(self, parent):
         """Создание панели результатов"""
         results_frame = ttk.LabelFrame(parent, text="Результаты поиска", padding=10)
@@ -286,8 +302,8 @@ class ItemsSearchDialog:
         self.results_tree.heading("Название", text="Название")
         self.results_tree.heading("Тип", text="Тип")
         self.results_tree.heading("Редкость", text="Редкость")
-        self.results_tree.heading("Вес", text="Вес")
-        self.results_tree.heading("Цена", text="Цена")
+        self.results_tree.heading("Вес", text="Вес", command=lambda: self.sort_results_by('Weight'))
+        self.results_tree.heading("Цена", text="Цена", command=lambda: self.sort_results_by('BasePrice'))
         self.results_tree.heading("Размер", text="Размер")
         
         # Настройка ширины колонок (уменьшены на 30%)
@@ -315,6 +331,10 @@ class ItemsSearchDialog:
         # Обработка выбора
         self.results_tree.bind("<<TreeviewSelect>>", self.on_item_select)
         self.results_tree.bind("<Double-1>", self.on_item_double_click)
+        
+        # Кнопка "Где используется"
+        ttk.Button(results_frame, text="🔗 Где используется", 
+                  command=self.show_item_references).pack(anchor=tk.W, pady=(5, 0))
     
     def create_edit_panel(self, parent):
         """Создание панели редактирования"""
@@ -1053,37 +1073,30 @@ class ItemsSearchDialog:
             type_filter = self.type_var.get()
             prefab_category_filter = self.prefab_category_var.get()
             rarity_filter = self.rarity_var.get()
+            category_node = self.category_nodes.get(self.category_node_var.get())
             
-            # Поиск по всем предметам
-            for item_id, item_data in self.items_db.items_data.items():
-                # Фильтр по ID
-                if id_filter and id_filter not in item_id.lower():
-                    continue
-                
-                # Фильтр по типу
-                if type_filter != 'Все' and item_data.get('_type') != type_filter:
-                    continue
-                
-                # Фильтр по названию
-                item_name = item_data.get('_name', '')
-                if name_filter and name_filter not in item_name.lower():
-                    continue
-                
-                # Фильтр по редкости
-                if rarity_filter != 'Все':
-                    props = item_data.get('_props', {})
-                    item_rarity = props.get('RarityPvE', '')
-                    if rarity_filter != item_rarity:
-                        continue
-                
-                # Фильтр по категории префаба
-                if prefab_category_filter != 'Все':
-                    prefab_path = self.extract_prefab_path(item_data)
-                    if not prefab_path or not prefab_path.startswith(f'assets/content/{prefab_category_filter}'):
-                        continue
-                
-                # Добавляем в результаты
-                self.search_results.append((item_id, item_data))
+            # Фильтры по типу, редкости и категории префаба отвечают вторичные индексы,
+            # по разделу - дерево шаблонов
+            candidate_ids = self.items_db.filter_item_ids(
+                item_type=type_filter if type_filter != 'Все' else None,
+                rarity=rarity_filter if rarity_filter != 'Все' else None,
+                prefab_category=prefab_category_filter if prefab_category_filter != 'Все' else None,
+                ancestor=category_node
+            )
+            
+            # Текстовые фильтры сужаются по индексу триграмм; при поиске по
+            # названию результаты идут в порядке релевантности
+            if name_filter:
+                name_ids = self.items_db.search_item_ids(name_filter, ['internal_name'])
+                candidate_set = set(candidate_ids)
+                candidate_ids = [item_id for item_id in name_ids if item_id in candidate_set]
+            if id_filter:
+                id_set = set(self.items_db.search_item_ids(id_filter, ['id']))
+                candidate_ids = [item_id for item_id in candidate_ids if item_id in id_set]
+            
+            items_data = self.items_db.items_data
+            for item_id in candidate_ids:
+                self.search_results.append((item_id, items_data[item_id]))
             
             # Отображение результатов
             self.display_search_results()
@@ -1091,6 +1104,23 @@ class ItemsSearchDialog:
         except Exception as e:
             messagebox.showerror("Ошибка поиска", f"Ошибка при выполнении поиска: {str(e)}")
     
+    def sort_results_by(self, field: str):
+        """Сортировка результатов по числовому полю _props (повторный клик - обратный порядок)"""
+        if not self.search_results:
+            return
+        
+        descending = getattr(self, '_sort_state', None) == (field, False)
+        self._sort_state = (field, descending)
+        
+        # Сортировка выполняется по колоночной таблице без обхода словарей
+        items = dict(self.search_results)
+        sorted_ids = self.items_db.sort_item_ids(list(items), field, descending)
+        self.search_results = [(item_id, items[item_id]) for item_id in sorted_ids]
+        
+        for item in self.results_tree.get_children():
+            self.results_tree.delete(item)
+        self.display_search_results()
+    
     def display_search_results(self):
         """Отображение результатов поиска"""
         for item_id, item_data in self.search_results:
@@ -1142,6 +1172,47 @@ class ItemsSearchDialog:
                     self.load_item_to_form(item_data)
                     break
     
+    def show_item_references(self):
+        """Показ шаблонов, рецептов и ассортимента торговцев, ссылающихся на выбранный предмет"""
+        if not self.current_item:
+            messagebox.showwarning("Предупреждение", "Выберите предмет")
+            return
+        
+        item_id = self.current_item[0]
+        try:
+            references = self.items_db.get_item_references(item_id)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Ошибка поиска ссылок: {str(e)}")
+            return
+        
+        if not references:
+            messagebox.showinfo("Информация", f"На предмет {item_id} нет ссылок")
+            return
+        
+        references_dialog = tk.Toplevel(self.dialog)
+        references_dialog.title(f"Где используется {item_id}")
+        references_dialog.geometry("600x400")
+        references_dialog.transient(self.dialog)
+        
+        center_window(references_dialog, 600, 400)
+        
+        columns = ("Источник", "ID", "Место")
+        tree = ttk.Treeview(references_dialog, columns=columns, show="headings")
+        for column, width in zip(columns, (120, 220, 240)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        source_names = {'item': "Шаблон", 'production': "Крафт", 'assort': "Торговец"}
+        for reference in references:
+            tree.insert('', 'end', values=(
+                source_names.get(reference['type'], reference['type']),
+                reference['source'],
+                reference['location']
+            ))
+        
+        ttk.Button(references_dialog, text="Закрыть", command=references_dialog.destroy).pack(pady=(0, 10))
+    
     def on_item_double_click(self, event):
         """Обработка двойного клика по предмету"""
         self.on_item_select(event)
@@ -1392,6 +1463,7 @@ class ItemsSearchDialog:
         self.type_var.set('Все')
         self.prefab_category_var.set('Все')
         self.rarity_var.set('Все')
+        self.category_node_var.set('Все')
         self.perform_search()
     
     def on_closing(self):
@@ -1401,6 +1473,14 @@ class ItemsSearchDialog:
             self.dialog.unbind_all("<MouseWheel>")
         except:
             pass
+        # Сброс инкрементального состояния анализа в кэш, пока хранилище с
+        # правками этого окна еще не освобождено
+        try:
+            ItemsAnalyzer(self.server_path).update_analysis()
+        except Exception as e:
+            print(f"Ошибка обновления кэша анализа: {e}")
+        # Освобождаем общее хранилище предметов
+        self.items_db.close()
         self.dialog.destroy()
 
 def main():
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Items Store - Общее для всего процесса хранилище данных items.json
+
+Все модули (менеджер предметов, диалоги поиска и массового изменения,
+анализаторы, сканер) берут данные предметов отсюда, а не читают файл сами.
+Файл разбирается один раз, данные живут, пока на хранилище есть хотя бы
+одна ссылка, и перечитываются только при изменении mtime или размера файла.
+
+Производные индексы (см. items_index.py) тоже живут в хранилище: они
+строятся при первом обращении и обновляются через item_changed().
+
+Одиночные правки пишутся в журнал (см. items_journal.py), который
+применяется при загрузке и сливается в файл через save(): при освобождении
+последней ссылки, при выходе из программы (compact_open_stores, atexit) и
+по запросу пользователя.
+
+Транзакция (ItemsDatabase.begin/commit/rollback) тоже принадлежит
+хранилищу, так как правки вносятся в общие данные: пока один держатель
+держит транзакцию открытой, запись файла другими держателями откладывается
+до ее завершения, иначе в файл попали бы еще не подтвержденные изменения.
+"""
+
+import atexit
+import copy
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Tuple
+
+try:
+    from modules.items_journal import ItemsJournal, apply_item_changes
+    from modules.atomic_writer import atomic_write_json
+    from modules.json_loader import load_json
+    from modules.items_lazy import release_lazy_mappings
+except ImportError:
+    from items_journal import ItemsJournal, apply_item_changes
+    from atomic_writer import atomic_write_json
+    from json_loader import load_json
+    from items_lazy import release_lazy_mappings
+
+class ItemsStore:
+    """Разделяемое хранилище данных предметов с подсчетом ссылок"""
+
+    def __init__(self, items_file: Path):
+        self.items_file = items_file
+        self.data: Dict[str, Any] = {}
+        self.last_modified = 0
+        self.file_size = 0
+        self.ref_count = 0
+        self.load_count = 0  # Сколько раз файл реально разбирался
+        self.indexes: Dict[str, Any] = {}
+        self.journal = ItemsJournal(items_file)
+        self.lock = threading.RLock()
+        
+        # Состояние транзакции: владелец (ItemsDatabase), глубина вложенности,
+        # снимки предметов для отката и признак несохраненных изменений
+        self.transaction_owner = None
+        self.transaction_depth = 0
+        self.undo: Dict[str, Any] = {}
+        self.dirty = False
+        # Запись файла, отложенная до завершения транзакции
+        self.save_pending = False
+
+    def _stat(self) -> Optional[tuple]:
+        """Получение (mtime, size) файла или None, если файла нет"""
+        try:
+            stat = self.items_file.stat()
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def is_stale(self) -> bool:
+        """Проверка, изменился ли файл с момента последней загрузки"""
+        current = self._stat()
+        if current is None:
+            return bool(self.data)
+        return current != (self.last_modified, self.file_size)
+
+    def load(self, force: bool = False) -> bool:
+        """Загрузка данных, если файл изменился (или принудительно)"""
+        with self.lock:
+            current = self._stat()
+            if current is None:
+                print(f"Файл {self.items_file} не найден")
+                return False
+
+            if not force and self.data and current == (self.last_modified, self.file_size):
+                return True  # Файл не изменился, данные уже загружены
+
+            try:
+                data = load_json(self.items_file)
+            except Exception as e:
+                print(f"Ошибка загрузки файла предметов: {e}")
+                return False
+
+            # Обновляем словарь на месте, чтобы ссылки у всех модулей остались валидными
+            self.data.clear()
+            self.data.update(data)
+            self.last_modified, self.file_size = current
+            self.load_count += 1
+            self.indexes.clear()  # Индексы перестроятся при следующем обращении
+            print(f"Загружено {len(self.data)} предметов из {self.items_file}")
+            
+            # Изменения, еще не слитые в основной файл
+            self.journal.replay(self.data)
+            return True
+
+    def get_index(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Получение производного индекса (строится один раз при первом обращении)"""
+        with self.lock:
+            index = self.indexes.get(name)
+            if index is None:
+                index = factory()
+                index.build(self.data)
+                self.indexes[name] = index
+            return index
+
+    def item_changed(self, item_id: str):
+        """Инкрементальное обновление построенных индексов после изменения/удаления предмета"""
+        with self.lock:
+            item = self.data.get(item_id)
+            for index in self.indexes.values():
+                index.remove_item(item_id)
+                if item is not None:
+                    index.add_item(item_id, item)
+
+    def in_transaction(self, owner: Any = None) -> bool:
+        """Открыта ли транзакция (с owner - открыта ли она этим держателем)"""
+        if owner is None:
+            return self.transaction_owner is not None
+        return self.transaction_owner is owner
+    
+    def begin_transaction(self, owner: Any):
+        """Начало (или вложенный уровень) транзакции держателя owner"""
+        with self.lock:
+            if self.transaction_owner is not None and self.transaction_owner is not owner:
+                raise RuntimeError("Транзакция уже открыта другим окном")
+            self.transaction_owner = owner
+            self.transaction_depth += 1
+    
+    def touch_item(self, owner: Any, item_id: str):
+        """Снимок предмета перед изменением внутри транзакции owner"""
+        with self.lock:
+            if self.transaction_owner is owner and item_id not in self.undo:
+                item = self.data.get(item_id)
+                self.undo[item_id] = copy.deepcopy(item) if item is not None else None
+    
+    def _end_transaction(self):
+        self.transaction_owner = None
+        self.transaction_depth = 0
+        self.undo = {}
+        self.dirty = False
+    
+    def commit_transaction(self, owner: Any) -> bool:
+        """Завершение уровня транзакции; внешний уровень записывает файл один раз"""
+        with self.lock:
+            if self.transaction_owner is not owner:
+                print("Нет открытой транзакции")
+                return False
+            
+            self.transaction_depth -= 1
+            if self.transaction_depth > 0:
+                return True
+            
+            changed = len(self.undo)
+            needs_save = self.dirty or self.save_pending
+            self._end_transaction()
+            if not needs_save:
+                return True
+            
+            try:
+                self.save()
+                print(f"Транзакция сохранена: изменено предметов {changed}")
+                return True
+            except Exception as e:
+                # Изменения остаются в памяти - их можно сохранить повторно через save()
+                print(f"Ошибка сохранения транзакции: {e}")
+                return False
+    
+    def rollback_transaction(self, owner: Any):
+        """Отмена транзакции: восстановление предметов в памяти
+        
+        Файл записывается, только если во время транзакции другие держатели
+        сохраняли свои изменения.
+        """
+        with self.lock:
+            if self.transaction_owner is not owner:
+                return
+            
+            for item_id, snapshot in self.undo.items():
+                if snapshot is None:
+                    self.data.pop(item_id, None)
+                else:
+                    self.data[item_id] = snapshot
+                self.item_changed(item_id)
+            
+            print(f"Транзакция отменена: восстановлено предметов {len(self.undo)}")
+            self._end_transaction()
+            if self.save_pending:
+                self.save()
+    
+    def save(self, owner: Any = None) -> bool:
+        """Резервная копия и запись всех данных в файл; журнал после этого не нужен
+        
+        Пока транзакция открыта другим держателем, запись откладывается до ее
+        завершения (возвращается False).
+        """
+        with self.lock:
+            if self.transaction_owner is not None and self.transaction_owner is not owner:
+                self.save_pending = True
+                print("Сохранение отложено до завершения транзакции")
+                return False
+            
+            release_lazy_mappings(self.items_file)
+            backup_file = self.items_file.with_suffix('.json.backup')
+            atomic_write_json(self.items_file, self.data, backup_file)
+            
+            self.mark_saved()
+            self.journal.clear()
+            self.save_pending = False
+            return True
+    
+    def record_changes(self, item_id: str, changes: Dict[str, Any], owner: Any = None):
+        """Запись изменений предмета в журнал (с компактированием по порогу)"""
+        with self.lock:
+            self.journal.append(item_id, changes)
+            if self.journal.needs_compaction():
+                print("Журнал изменений превысил порог, сохранение в основной файл")
+                self.save(owner)
+    
+    def compact_journal(self) -> bool:
+        """Слияние журнала в основной файл, если в нем есть записи
+        
+        Если данные не загружены (ленивый режим или журнал прошлого сеанса),
+        файл загружается с применением журнала, записывается и снова выгружается.
+        """
+        with self.lock:
+            if not self.journal.has_entries():
+                return False
+            
+            loaded_here = not self.data
+            if loaded_here and not self.load():
+                return False
+            try:
+                if not self.save():
+                    return False
+            finally:
+                if loaded_here:
+                    self.data.clear()
+                    self.indexes.clear()
+            print(f"Журнал изменений слит в {self.items_file}")
+            return True
+    
+    def replay_stale_journal(self) -> Tuple[int, int]:
+        """Применение отложенного устаревшего журнала по ID предметов
+        
+        Изменения накладываются на текущие данные и дописываются в обычный
+        журнал. Записи для предметов, которых больше нет в файле, остаются в
+        отложенном журнале. Возвращает (применено, осталось).
+        """
+        with self.lock:
+            if not self.journal.has_stale():
+                return 0, 0
+            
+            loaded_here = not self.data
+            if loaded_here and not self.load():
+                return 0, len(self.journal.read_stale_entries())
+            
+            applied = 0
+            missing = []
+            for item_id, changes in self.journal.read_stale_entries():
+                item = self.data.get(item_id)
+                if not isinstance(item, dict):
+                    missing.append((item_id, changes))
+                    continue
+                apply_item_changes(item, changes)
+                self.journal.append(item_id, changes)
+                self.item_changed(item_id)
+                applied += 1
+            self.journal.write_stale_entries(missing)
+            
+            if loaded_here:
+                self.data.clear()
+                self.indexes.clear()
+            print(f"Применено {applied} изменений из {self.journal.stale_file.name}, осталось {len(missing)}")
+            return applied, len(missing)
+    
+    def mark_saved(self):
+        """Фиксация mtime/size после записи файла самим редактором"""
+        with self.lock:
+            current = self._stat()
+            if current is not None:
+                self.last_modified, self.file_size = current
+
+_stores: Dict[Path, ItemsStore] = {}
+_stores_lock = threading.Lock()
+
+def _store_key(items_file: Path) -> Path:
+    """Нормализованный ключ хранилища"""
+    try:
+        return Path(items_file).resolve()
+    except OSError:
+        return Path(items_file).absolute()
+
+def acquire_items_store(items_file: Path, load: bool = True) -> ItemsStore:
+    """Получение общего хранилища для файла с увеличением счетчика ссылок
+    
+    С load=False данные не загружаются (ленивый режим ItemsDatabase).
+    """
+    key = _store_key(items_file)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ItemsStore(Path(items_file))
+            _stores[key] = store
+        store.ref_count += 1
+
+    # Загрузка/перепроверка вне глобальной блокировки
+    if load:
+        store.load()
+    return store
+
+def release_items_store(store: ItemsStore):
+    """Освобождение ссылки; последнее освобождение сливает журнал и выгружает данные"""
+    if store is None:
+        return
+    key = _store_key(store.items_file)
+    with _stores_lock:
+        store.ref_count -= 1
+        if store.ref_count <= 0:
+            store.ref_count = 0
+            if _stores.get(key) is store:
+                del _stores[key]
+            # При завершении интерпретатора (освобождение из __del__) запись
+            # файла уже невозможна - журнал сливается раньше, в compact_open_stores
+            if not sys.is_finalizing():
+                try:
+                    store.compact_journal()
+                except Exception as e:
+                    print(f"Ошибка слияния журнала изменений: {e}")
+            store.data = {}
+            store.indexes = {}
+
+def compact_open_stores() -> int:
+    """Слияние журналов всех открытых хранилищ (при выходе из программы)
+    
+    Возвращает число хранилищ, журнал которых был слит.
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+    compacted = 0
+    for store in stores:
+        try:
+            if store.compact_journal():
+                compacted += 1
+        except Exception as e:
+            print(f"Ошибка слияния журнала изменений {store.items_file}: {e}")
+    return compacted
+
+# Окна, открытые при выходе, освобождают хранилище только в __del__ во
+# время завершения интерпретатора - журналы сливаются до этого
+atexit.register(compact_open_stores)
+
+def get_items_store_stats() -> Dict[str, Any]:
+    """Информация об открытых хранилищах (для отладки)"""
+    with _stores_lock:
+        return {
+            str(key): {
+                'items': len(store.data),
+                'ref_count': store.ref_count,
+                'load_count': store.load_count
+            }
+            for key, store in _stores.items()
+        }
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON Loader - Быстрая загрузка JSON файлов сервера
+
+load_json() разбирает файл с приостановленным сборщиком мусора: при
+создании сотен тысяч словарей и строк он многократно обходит еще не
+достроенную структуру и замедляет разбор в несколько раз.
+
+load_json_shared() дополнительно хранит разобранный файл в памяти процесса
+и отдает тот же объект, пока у файла не изменились mtime и размер. Подходит
+только для данных, которые вызывающий код не изменяет (кэш предметов).
+
+Файлы, заранее загружаемые в фоне (см. database_loader.py), регистрируются
+через register_preloaded(): первый вызов load_json() для такого файла
+забирает готовый результат (или дожидается его) вместо повторного разбора.
+"""
+
+import gc
+import threading
+import orjson as json
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+# Сборщик мусора приостанавливается на время разбора; при разборе в
+# нескольких потоках он включается обратно после завершения последнего
+_gc_lock = threading.Lock()
+_gc_pause_depth = 0
+_gc_was_enabled = False
+
+def _without_gc(func, *args):
+    """Вызов с приостановленным сборщиком мусора"""
+    global _gc_pause_depth, _gc_was_enabled
+    with _gc_lock:
+        if _gc_pause_depth == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_depth += 1
+    try:
+        return func(*args)
+    finally:
+        with _gc_lock:
+            _gc_pause_depth -= 1
+            if _gc_pause_depth == 0 and _gc_was_enabled:
+                gc.enable()
+
+def parse_json_bytes(raw: bytes) -> Any:
+    """Разбор уже прочитанного содержимого JSON файла"""
+    return _without_gc(json.loads, raw)
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    """(mtime_ns, size) файла"""
+    stat = Path(path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+# Путь -> Future с ((mtime_ns, size), данные) от фоновой загрузки
+_preloaded: Dict[Path, Future] = {}
+_preloaded_lock = threading.Lock()
+_MISSING = object()
+
+def register_preloaded(path: Path, future: Future):
+    """Регистрация фоновой загрузки файла (результат будет отдан load_json один раз)"""
+    with _preloaded_lock:
+        _preloaded[Path(path).resolve()] = future
+
+def _take_preloaded(path: Path) -> Any:
+    """Результат фоновой загрузки файла, если он есть и файл с тех пор не менялся"""
+    if not _preloaded:
+        return _MISSING
+    path = Path(path).resolve()
+    with _preloaded_lock:
+        future = _preloaded.pop(path, None)
+    if future is None:
+        return _MISSING
+    try:
+        signature, data = future.result()
+        if signature == file_signature(path):
+            return data
+    except Exception:
+        pass
+    return _MISSING
+
+def clear_preloaded():
+    """Отказ от невостребованных результатов фоновой загрузки"""
+    with _preloaded_lock:
+        _preloaded.clear()
+
+def load_json(path: Path) -> Any:
+    """Чтение и разбор JSON файла; каждый вызов возвращает новый объект"""
+    data = _take_preloaded(path)
+    if data is not _MISSING:
+        return data
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return parse_json_bytes(raw)
+
+# Путь -> ((mtime_ns, size), данные) для load_json_shared
+_shared: Dict[Path, Tuple[Tuple[int, int], Any]] = {}
+_shared_lock = threading.Lock()
+
+def load_json_shared(path: Path) -> Any:
+    """Разобранный JSON файл, общий для всего процесса (только для чтения)"""
+    path = Path(path).resolve()
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _shared_lock:
+        entry = _shared.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+    data = load_json(path)
+    with _shared_lock:
+        _shared[path] = (signature, data)
+    return data
+
+def clear_shared_json():
+    """Сброс общих разобранных файлов"""
+    with _shared_lock:
+        _shared.clear()
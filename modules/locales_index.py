@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Locales Index - Названия и описания предметов из локалей сервера
+
+В items.json нет локализованных строк: они лежат в
+database/locales/global/<язык>.json под ключами "<ID> Name",
+"<ID> ShortName" и "<ID> Description". Файл языка разбирается один раз на
+процесс, из него строятся три словаря по ID, остальные строки локали не
+хранятся. При изменении файла (mtime/размер) индекс перестраивается.
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from modules.json_loader import load_json, file_signature
+except ImportError:
+    from json_loader import load_json, file_signature
+
+# Язык по умолчанию, если он не задан в config.yaml (locales.language)
+DEFAULT_LANGUAGE = "en"
+
+# Суффикс ключа локали -> поле индекса
+LOCALE_FIELDS = {
+    ' Name': 'names',
+    ' ShortName': 'short_names',
+    ' Description': 'descriptions',
+}
+
+def get_locales_dir(server_path: Path) -> Path:
+    """Папка глобальных локалей сервера"""
+    return server_path / "database" / "locales" / "global"
+
+def get_available_languages(server_path: Path) -> List[str]:
+    """Языки, для которых на сервере есть файл локали"""
+    locales_dir = get_locales_dir(server_path)
+    if not locales_dir.is_dir():
+        return []
+    return sorted(path.stem for path in locales_dir.glob("*.json"))
+
+def get_configured_language() -> str:
+    """Язык названий предметов из config.yaml"""
+    try:
+        try:
+            from modules.config_manager import ConfigManager
+        except ImportError:
+            from config_manager import ConfigManager
+        return ConfigManager().get('locales.language', DEFAULT_LANGUAGE) or DEFAULT_LANGUAGE
+    except Exception:
+        return DEFAULT_LANGUAGE
+
+class LocalesIndex:
+    """Словари ID -> название / короткое название / описание для одного языка"""
+
+    def __init__(self, locale_file: Path, language: str):
+        self.locale_file = locale_file
+        self.language = language
+        self.signature: Optional[Tuple[int, int]] = None
+        self.names: Dict[str, str] = {}
+        self.short_names: Dict[str, str] = {}
+        self.descriptions: Dict[str, str] = {}
+        self.load()
+
+    def load(self):
+        """Разбор файла локали и построение словарей"""
+        signature = file_signature(self.locale_file)
+        locale = load_json(self.locale_file)
+        fields = {field: {} for field in LOCALE_FIELDS.values()}
+
+        for key, text in locale.items() if isinstance(locale, dict) else ():
+            # Ключ предмета: "<ID> <Поле>" (ID без пробелов)
+            space = key.find(' ')
+            if space <= 0 or not isinstance(text, str):
+                continue
+            field = LOCALE_FIELDS.get(key[space:])
+            if field is not None:
+                fields[field][key[:space]] = text
+
+        self.names = fields['names']
+        self.short_names = fields['short_names']
+        self.descriptions = fields['descriptions']
+        self.signature = signature
+        print(f"Загружены названия {len(self.names)} предметов из локали {self.language}")
+
+    def is_stale(self) -> bool:
+        """Изменился ли файл локали с момента загрузки"""
+        try:
+            return file_signature(self.locale_file) != self.signature
+        except OSError:
+            return False
+
+    def get_name(self, item_id: str) -> str:
+        """Локализованное название предмета или пустая строка"""
+        return self.names.get(item_id, '')
+
+    def get_short_name(self, item_id: str) -> str:
+        """Локализованное короткое название предмета или пустая строка"""
+        return self.short_names.get(item_id, '')
+
+    def get_description(self, item_id: str) -> str:
+        """Локализованное описание предмета или пустая строка"""
+        return self.descriptions.get(item_id, '')
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self.names
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+# Путь к файлу локали -> индекс (один на процесс)
+_indexes: Dict[Path, LocalesIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_locales_index(server_path: Path, language: Optional[str] = None) -> Optional[LocalesIndex]:
+    """Общий индекс локали сервера для языка (None - язык из config.yaml)
+
+    Возвращает None, если файла локали нет или его не удалось разобрать.
+    """
+    language = language or get_configured_language()
+    locale_file = get_locales_dir(server_path) / f"{language}.json"
+    try:
+        key = locale_file.resolve()
+    except OSError:
+        key = locale_file.absolute()
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and not index.is_stale():
+            return index
+        if not locale_file.exists():
+            return None
+        try:
+            index = LocalesIndex(locale_file, language)
+        except Exception as e:
+            print(f"Ошибка загрузки локали {locale_file}: {e}")
+            return None
+        _indexes[key] = index
+        return index
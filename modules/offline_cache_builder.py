@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline Cache Builder - Сборка справочника предметов из локальных файлов сервера
+
+Почти все, что сканер (scan_db.py) получает с онлайн базы по одному запросу
+на предмет, есть в файлах самого сервера:
+- шаблон (_name, _parent, _type, _props) - database/templates/items.json;
+- название, короткое название, описание - database/locales/global/<язык>.json;
+- цена - database/templates/handbook.json, затем prices.json.
+
+Сборщик за один проход формирует items_cache.json и items_readable.json в
+тех же форматах, что и сканер (записи помечены 'source': 'local'). Записи
+без локализованного названия получают last_updated = 0, поэтому онлайн
+сканер считает их устаревшими и дозапрашивает только их.
+"""
+
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+try:
+    from modules.items_store import acquire_items_store, release_items_store
+    from modules.atomic_writer import atomic_write_json
+    from modules.json_loader import load_json
+    from modules.locales_index import get_locales_index
+    from modules.scan_planner import template_hash
+except ImportError:
+    from items_store import acquire_items_store, release_items_store
+    from atomic_writer import atomic_write_json
+    from json_loader import load_json
+    from locales_index import get_locales_index
+    from scan_planner import template_hash
+
+def make_readable_entry(item_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Запись items_readable.json по записи полного кэша (те же правила, что у сканера)"""
+    locale = item.get('locale') or {}
+    props = item.get('props') or {}
+    handbook = item.get('handbook') or {}
+
+    # Приоритет: locale.Name > props.Name > name
+    if 'Name' in locale:
+        name = locale['Name']
+    elif 'Name' in props:
+        name = props['Name']
+    elif 'name' in item:
+        name = item['name']
+    else:
+        name = f"Unknown Item ({item_id[:8]}...)"
+
+    # Приоритет: locale.ShortName > props.ShortName
+    if 'ShortName' in locale:
+        short_name = locale['ShortName']
+    elif 'ShortName' in props:
+        short_name = props['ShortName']
+    else:
+        short_name = f"Unknown ({item_id[:8]}...)"
+
+    if 'Description' in locale:
+        description = locale['Description']
+    elif 'Description' in props:
+        description = props['Description']
+    else:
+        description = "No description available"
+
+    return {
+        'id': item_id,
+        'name': name,
+        'short_name': short_name,
+        'description': description,
+        'price': handbook.get('Price', 0),
+        'rarity': props.get('RarityPvE', "Unknown"),
+        'type': item.get('type', 'Unknown'),
+        'last_updated': item.get('last_updated', 0)
+    }
+
+class OfflineCacheBuilder:
+    """Сборка кэша предметов из items.json, локали, handbook.json и prices.json"""
+
+    def __init__(self, server_path: Path, language: Optional[str] = None):
+        self.server_path = server_path
+        self.language = language
+        self.templates_dir = server_path / "database" / "templates"
+        self.items_file = self.templates_dir / "items.json"
+        self.handbook_file = self.templates_dir / "handbook.json"
+        self.prices_file = self.templates_dir / "prices.json"
+        self.cache_dir = server_path / "cache"
+        self.items_cache_file = self.cache_dir / "items_cache.json"
+        self.readable_cache_file = self.cache_dir / "items_readable.json"
+
+    def _load_optional(self, path: Path) -> Any:
+        """Разбор необязательного файла (None, если его нет или он поврежден)"""
+        if not path.exists():
+            return None
+        try:
+            return load_json(path)
+        except Exception as e:
+            print(f"Ошибка чтения {path}: {e}")
+            return None
+
+    def load_handbook_prices(self) -> Dict[str, Dict[str, Any]]:
+        """ID -> запись handbook ({'Id', 'ParentId', 'Price'}); цены prices.json - запасные"""
+        handbook_items = {}
+        handbook = self._load_optional(self.handbook_file)
+        if isinstance(handbook, dict):
+            for entry in handbook.get('Items', []) or []:
+                if isinstance(entry, dict) and entry.get('Id'):
+                    handbook_items[entry['Id']] = entry
+
+        prices = self._load_optional(self.prices_file)
+        if isinstance(prices, dict):
+            for item_id, price in prices.items():
+                if item_id not in handbook_items and isinstance(price, (int, float)):
+                    handbook_items[item_id] = {'Id': item_id, 'Price': price}
+        return handbook_items
+
+    def load_existing_cache(self) -> Dict[str, Any]:
+        """Текущий полный кэш (записи онлайн сканера сохраняются, если локально нет названия)"""
+        cache = self._load_optional(self.items_cache_file)
+        return cache if isinstance(cache, dict) else {}
+
+    def build(self, progress_callback: Optional[Callable] = None,
+              status_callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """Сборка и сохранение items_cache.json и items_readable.json
+
+        Возвращает сводку: число предметов, с названиями и ценами, ID без
+        локализованного названия (их может дополнить онлайн сканер), время.
+        """
+        started = time.perf_counter()
+        if status_callback:
+            status_callback("Чтение локальных файлов сервера...")
+
+        store = acquire_items_store(self.items_file)
+        try:
+            items_data = store.data
+            if not items_data:
+                raise FileNotFoundError(f"Нет данных предметов в {self.items_file}")
+
+            locales = get_locales_index(self.server_path, self.language)
+            handbook_items = self.load_handbook_prices()
+            existing = self.load_existing_cache()
+
+            if status_callback:
+                status_callback("Сборка справочника предметов...")
+
+            now = int(time.time())
+            cache = {}
+            missing_ids = []
+            with_prices = 0
+            total = len(items_data)
+            for i, (item_id, template) in enumerate(items_data.items(), 1):
+                # Те же ID, что берет сканер из items.json
+                if not item_id or len(item_id) <= 10 or not isinstance(template, dict):
+                    continue
+
+                locale = {}
+                if locales is not None:
+                    for key, texts in (('Name', locales.names), ('ShortName', locales.short_names),
+                                       ('Description', locales.descriptions)):
+                        if item_id in texts:
+                            locale[key] = texts[item_id]
+
+                if 'Name' not in locale:
+                    previous = existing.get(item_id)
+                    if previous and (previous.get('locale') or {}).get('Name'):
+                        # Онлайн данные лучше неполной локальной записи
+                        cache[item_id] = previous
+                        continue
+                    missing_ids.append(item_id)
+
+                handbook = handbook_items.get(item_id, {})
+                if handbook.get('Price'):
+                    with_prices += 1
+
+                cache[item_id] = {
+                    'id': item_id,
+                    'name': template.get('_name', ''),
+                    'parent': template.get('_parent', ''),
+                    'type': template.get('_type', ''),
+                    'props': template.get('_props', {}),
+                    'locale': locale,
+                    'handbook': handbook,
+                    # Неполные записи - устаревшие для онлайн сканера
+                    'last_updated': now if 'Name' in locale else 0,
+                    'template_hash': template_hash(template),
+                    'source': 'local'
+                }
+
+                if progress_callback and (i % 1000 == 0 or i == total):
+                    progress_callback(i, total)
+        finally:
+            release_items_store(store)
+
+        if status_callback:
+            status_callback("Сохранение справочника...")
+
+        self.cache_dir.mkdir(exist_ok=True)
+        atomic_write_json(self.items_cache_file, cache)
+        readable = {item_id: make_readable_entry(item_id, item) for item_id, item in cache.items()}
+        atomic_write_json(self.readable_cache_file, readable)
+
+        elapsed = time.perf_counter() - started
+        print(f"Справочник собран из локальных файлов: {len(cache)} предметов за {elapsed:.2f} с, "
+              f"без названий: {len(missing_ids)}")
+        return {
+            'items': len(cache),
+            'with_names': len(cache) - len(missing_ids),
+            'with_prices': with_prices,
+            'missing_ids': missing_ids,
+            'language': locales.language if locales is not None else None,
+            'elapsed': elapsed
+        }
+
+def main():
+    """Главная функция для тестирования модуля"""
+    import sys
+    server_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent
+
+    report = OfflineCacheBuilder(server_path).build()
+    print(f"📊 Предметов: {report['items']}")
+    print(f"   С названиями ({report['language']}): {report['with_names']}")
+    print(f"   С ценами: {report['with_prices']}")
+    print(f"   Требуют онлайн сканирования: {len(report['missing_ids'])}")
+
+if __name__ == "__main__":
+    main()
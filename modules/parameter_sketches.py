@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parameter Sketches - Сводки распределения числовых параметров
+
+Числовые значения параметра (int/float, bool не считается числом)
+собираются анализатором в колонку и сворачиваются NumPy в сводку: число
+значений, минимум, максимум, среднее, стандартное отклонение, квантили,
+гистограмма и самые частые значения. Сырые значения после этого не
+хранятся. Для остальных значений анализатор хранит только top-k самых
+частых (см. ItemParametersAnalyzer).
+
+По сводке строятся подсказки с учетом диапазона (ближайшие к введенному
+числу частые значения, медиана и квартили) и предупреждения: значение вне
+наблюдавшегося диапазона или редкое - за пределами [p1, p99] и дальше
+OUTLIER_IQR межквартильных размахов от квартилей.
+
+NumPy необязателен: без него HAS_NUMPY = False, сводки не строятся, и
+анализатор считает числа в общих счетчиках значений, как строки.
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+# Квантили сводки
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+# Число столбцов гистограммы
+HISTOGRAM_BINS = 20
+# Сколько самых частых значений хранить
+TOP_K = 100
+# Во сколько межквартильных размахов от квартилей начинается выброс
+OUTLIER_IQR = 3.0
+
+def format_number(value: float) -> str:
+    """Число для пользователя: целые без дробной части, остальные - до 6 значащих цифр"""
+    value = float(value)
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return str(float(f"{value:.6g}"))
+
+class NumericSketch:
+    """Сводка распределения числового параметра"""
+
+    def __init__(self, count: int, minimum: float, maximum: float, mean: float, std: float,
+                 quantiles: Dict[float, float], histogram: Tuple[List[int], List[float]],
+                 top_values: List[Tuple[float, int]]):
+        self.count = count
+        self.minimum = minimum
+        self.maximum = maximum
+        self.mean = mean
+        self.std = std
+        self.quantiles = quantiles
+        # (число значений в столбцах, границы столбцов)
+        self.histogram = histogram
+        # (значение, число предметов) по убыванию частоты
+        self.top_values = top_values
+
+    @classmethod
+    def from_values(cls, values) -> Optional['NumericSketch']:
+        """Сводка по массиву значений (None - пустой массив, нет конечных чисел или нет NumPy)"""
+        if not HAS_NUMPY:
+            return None
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not values.size:
+            return None
+
+        quantile_values = np.quantile(values, QUANTILES)
+        counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+        unique, unique_counts = np.unique(values, return_counts=True)
+        # По убыванию частоты, при равенстве - по возрастанию значения
+        order = np.argsort(-unique_counts, kind='stable')[:TOP_K]
+
+        return cls(
+            count=int(values.size),
+            minimum=float(values.min()),
+            maximum=float(values.max()),
+            mean=float(values.mean()),
+            std=float(values.std()),
+            quantiles={q: float(v) for q, v in zip(QUANTILES, quantile_values)},
+            histogram=(counts.tolist(), edges.tolist()),
+            top_values=[(float(unique[i]), int(unique_counts[i])) for i in order]
+        )
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles[q]
+
+    def rank(self, value: float) -> float:
+        """Доля значений базы не больше value (по гистограмме, приблизительно)"""
+        counts, edges = self.histogram
+        if value < edges[0]:
+            return 0.0
+        if value >= edges[-1]:
+            return 1.0
+        below = 0
+        for index, count in enumerate(counts):
+            left, right = edges[index], edges[index + 1]
+            if value < right:
+                return (below + count * (value - left) / (right - left)) / self.count
+            below += count
+        return 1.0
+
+    def top(self, limit: int) -> List[str]:
+        """Самые частые значения"""
+        return [format_number(value) for value, count in self.top_values[:limit]]
+
+    def repeated_values(self) -> List[float]:
+        """Частые значения, встречающиеся больше одного раза (у непрерывных параметров их мало)"""
+        return [value for value, count in self.top_values if count > 1]
+
+    def suggest(self, partial_value: str = "", limit: int = 10) -> List[str]:
+        """Подсказки: для введенного числа - ближайшие частые значения, иначе медиана, квартили, границы и частые"""
+        try:
+            number = float(partial_value)
+        except ValueError:
+            number = None
+
+        landmarks = [self.quantile(0.5), self.quantile(0.25), self.quantile(0.75), self.minimum, self.maximum]
+        if number is not None:
+            nearest = sorted(self.repeated_values() + landmarks, key=lambda value: abs(value - number))
+            candidates = [format_number(value) for value in nearest]
+        else:
+            candidates = [format_number(value) for value in landmarks + self.repeated_values()]
+            if partial_value:
+                partial_lower = partial_value.lower()
+                candidates = [value for value in candidates if partial_lower in value.lower()]
+        return list(dict.fromkeys(candidates))[:limit]
+
+    def check(self, value: float) -> Optional[str]:
+        """Предупреждение о значении вне диапазона базы или редком значении (None - значение обычное)"""
+        if value < self.minimum or value > self.maximum:
+            return (f"Значение вне диапазона базы [{format_number(self.minimum)}; "
+                    f"{format_number(self.maximum)}]")
+
+        q1, q3 = self.quantile(0.25), self.quantile(0.75)
+        spread = OUTLIER_IQR * (q3 - q1)
+        typical = f"обычно {format_number(q1)}…{format_number(q3)}"
+        if value < self.quantile(0.01) and value < q1 - spread:
+            return f"Редкое значение: меньше, чем у ≈{1 - self.rank(value):.1%} предметов ({typical})"
+        if value > self.quantile(0.99) and value > q3 + spread:
+            return f"Редкое значение: больше, чем у ≈{self.rank(value):.1%} предметов ({typical})"
+        return None
+
+    def describe(self) -> str:
+        """Сводка одной строкой"""
+        return (f"Диапазон: {format_number(self.minimum)}…{format_number(self.maximum)} | "
+                f"Медиана: {format_number(self.quantile(0.5))} | Среднее: {self.mean:.4g}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Сводка для JSON и отображения"""
+        return {
+            'count': self.count,
+            'min': self.minimum,
+            'max': self.maximum,
+            'mean': self.mean,
+            'std': self.std,
+            'quantiles': {f"p{round(q * 100)}": v for q, v in self.quantiles.items()},
+            'histogram': {'counts': self.histogram[0], 'edges': self.histogram[1]},
+            'top_values': [[value, count] for value, count in self.top_values]
+        }
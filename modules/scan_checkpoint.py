@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scan Checkpoint - Журнал контрольной точки онлайн сканирования
+
+Полученные сканером записи не переписывают весь items_cache.json, а
+дописываются строкой JSON в журнал рядом с ним (items_cache.checkpoint.jsonl).
+Журнал сливается в кэш каждые N предметов и в конце сканирования, после
+чего удаляется. Если сканирование прервалось (сбой, отмена, закрытие
+программы), при следующей загрузке кэша записи журнала накладываются на
+него, и сканирование продолжается с места остановки: такие предметы уже
+свежие и повторно не запрашиваются. Оборванные строки пропускаются.
+"""
+
+import os
+import orjson as json
+from pathlib import Path
+from typing import Dict, Any, Optional, BinaryIO
+
+class ScanCheckpoint:
+    """Append-only журнал записей сканера (одна запись кэша на строку)"""
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = cache_file
+        self.checkpoint_file = cache_file.with_suffix('.checkpoint.jsonl')
+        self._file: Optional[BinaryIO] = None
+        # Записей, добавленных после последнего слияния
+        self.pending = 0
+
+    def size(self) -> int:
+        """Размер журнала в байтах (0, если журнала нет)"""
+        try:
+            return self.checkpoint_file.stat().st_size
+        except OSError:
+            return 0
+
+    def has_entries(self) -> bool:
+        """Есть ли записи, не слитые в кэш"""
+        return self.size() > 0
+
+    def append(self, item_data: Dict[str, Any]):
+        """Дописывание записи предмета (файл остается открытым до слияния)"""
+        if self._file is None:
+            self._file = open(self.checkpoint_file, 'a+b')
+            # После оборванной записи начинаем с новой строки
+            self._file.seek(0, os.SEEK_END)
+            if self._file.tell():
+                self._file.seek(-1, os.SEEK_END)
+                if self._file.read(1) != b'\n':
+                    self._file.write(b'\n')
+        self._file.write(json.dumps(item_data) + b'\n')
+        self._file.flush()
+        self.pending += 1
+
+    def replay(self, cache: Dict[str, Any]) -> int:
+        """Наложение журнала на загруженный кэш; возвращает число примененных записей
+
+        Запись применяется, если она не старше записи кэша (по last_updated).
+        """
+        if not self.has_entries():
+            return 0
+
+        try:
+            with open(self.checkpoint_file, 'rb') as f:
+                lines = f.read().split(b'\n')
+        except OSError as e:
+            print(f"Ошибка чтения контрольной точки сканирования: {e}")
+            return 0
+
+        applied = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                item_data = json.loads(line)
+            except json.JSONDecodeError:
+                # Оборванная запись (сбой во время записи)
+                continue
+            item_id = item_data.get('id') if isinstance(item_data, dict) else None
+            if not item_id:
+                continue
+            current = cache.get(item_id)
+            if current and current.get('last_updated', 0) > item_data.get('last_updated', 0):
+                continue
+            cache[item_id] = item_data
+            applied += 1
+        return applied
+
+    def close(self):
+        """Закрытие файла журнала"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        """Удаление журнала (после записи кэша)"""
+        self.close()
+        self.pending = 0
+        try:
+            self.checkpoint_file.unlink()
+        except FileNotFoundError:
+            pass
@@ -2,24 +2,84 @@
 # -*- coding: utf-8 -*-
 """
 Database Scanner - Модуль для сбора данных о предметах с онлайн базы SPT-Tarkov
+
+Пакетное сканирование выполняется асинхронно (httpx.AsyncClient): одновременно
+выполняется до max_connections запросов, а общая скорость ограничена
+request_delay из config.yaml (TokenBucket, см. scan_limits.py).
 """
 
+import asyncio
+import heapq
 import requests
 import orjson as json  # Используем orjson для ускорения JSON операций
 import time
 import os
-import random
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Tuple
 import logging
 import httpx  # Используем httpx для улучшения HTTP запросов
 
+try:
+    from modules.items_store import acquire_items_store, release_items_store
+    from modules.atomic_writer import atomic_write_json
+    from modules.config_manager import ConfigManager
+    from modules.scan_limits import TokenBucket, RetryPolicy, CircuitBreaker, parse_retry_after
+    from modules.scan_checkpoint import ScanCheckpoint
+    from modules.scan_planner import ScanPlanner, ScanPlan
+    from modules.scan_metrics import ScanMetrics
+except ImportError:
+    from items_store import acquire_items_store, release_items_store
+    from atomic_writer import atomic_write_json
+    from config_manager import ConfigManager
+    from scan_limits import TokenBucket, RetryPolicy, CircuitBreaker, parse_retry_after
+    from scan_checkpoint import ScanCheckpoint
+    from scan_planner import ScanPlanner, ScanPlan
+    from scan_metrics import ScanMetrics
+
+# Результат одной попытки запроса предмета
+FETCH_OK = "ok"          # данные получены
+FETCH_FAILED = "failed"  # повторять бессмысленно (404, неполные данные, ошибка разбора)
+FETCH_RETRY = "retry"    # временная ошибка (сеть, 429, 5xx) - стоит повторить позже
+
 class DatabaseScanner:
-    def __init__(self, server_path: Path):
+    def __init__(self, server_path: Path, api_base_url: Optional[str] = None):
         self.server_path = server_path
         self.cache_dir = server_path / "cache"
         self.items_cache_file = self.cache_dir / "items_cache.json"
-        self.api_base_url = "https://db.sp-tarkov.com/api/item"
+        
+        # Настройки сканера из config.yaml (api_base_url можно переопределить,
+        # например адресом локального тестового сервера)
+        config = ConfigManager()
+        scanner_config = self.scanner_config = config.get_scanner_config()
+        security_config = config.get_security_config()
+        self.api_base_url = api_base_url or scanner_config.get('api_base_url', "https://db.sp-tarkov.com/api/item")
+        self.request_delay = float(scanner_config.get('request_delay', 0.3))
+        self.request_burst = float(scanner_config.get('request_burst', 1))
+        self.request_timeout = float(scanner_config.get('request_timeout', 10.0))
+        self.max_connections = max(1, int(scanner_config.get('max_connections', 10)))
+        self.max_keepalive_connections = int(scanner_config.get('max_keepalive_connections', 5))
+        # Через сколько полученных предметов журнал контрольной точки сливается в кэш
+        self.checkpoint_interval = max(1, int(scanner_config.get('checkpoint_interval', 500)))
+        
+        # Повторы запросов: экспоненциальная задержка с разбросом и учетом Retry-After
+        self.retry_policy = RetryPolicy.from_config(scanner_config)
+        # Размыкатель последнего пакета и ID, которые не удалось получить
+        self.circuit_breaker: Optional[CircuitBreaker] = None
+        self.failed_items: Dict[str, str] = {}
+        # Метрики текущего (последнего) пакета и файл его отчета
+        self.metrics: Optional[ScanMetrics] = None
+        self.last_report_file: Optional[Path] = None
+        
+        # Планировщик: время жизни записей кэша (cache.cache_lifetime_days)
+        self.planner = ScanPlanner(config.get_cache_config().get('cache_lifetime_days'))
+        # ID -> хеш локального шаблона, записывается в кэш вместе с данными предмета
+        self.template_hashes: Dict[str, str] = {}
+        self.verify_ssl = bool(security_config.get('verify_ssl', True))
+        self.headers = {
+            'User-Agent': security_config.get('user_agent', 'SPT-Server-Editor/1.0'),
+            'Accept': 'application/json',
+            'Accept-Language': 'en-US,en;q=0.9'
+        }
         
         # Переменные для управления сканированием
         self.is_paused = False
@@ -33,28 +93,27 @@ class DatabaseScanner:
         # Настройка логирования
         self.setup_logging()
         
-        # Загрузка существующего кэша
+        # Загрузка существующего кэша (с записями прерванного сканирования)
+        self.checkpoint = ScanCheckpoint(self.items_cache_file)
         self.items_cache = self.load_cache()
         
         # Настройка сессии для запросов (requests для совместимости)
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'SPT-Server-Editor/1.0',
-            'Accept': 'application/json',
-            'Accept-Language': 'en-US,en;q=0.9'
-        })
+        self.session.headers.update(self.headers)
         
         # Настройка httpx клиента для улучшенных HTTP запросов
         self.httpx_client = httpx.Client(
-            headers={
-                'User-Agent': 'SPT-Server-Editor/1.0',
-                'Accept': 'application/json',
-                'Accept-Language': 'en-US,en;q=0.9'
-            },
-            timeout=10.0,
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+            headers=self.headers,
+            timeout=self.request_timeout,
+            verify=self.verify_ssl,
+            limits=self._get_limits()
         )
     
+    def _get_limits(self) -> 'httpx.Limits':
+        """Лимиты соединений httpx из config.yaml"""
+        return httpx.Limits(max_keepalive_connections=self.max_keepalive_connections,
+                            max_connections=self.max_connections)
+    
     def setup_logging(self):
         """Настройка логирования"""
         log_file = self.cache_dir / "scan_db.log"
@@ -69,89 +128,162 @@ class DatabaseScanner:
         self.logger = logging.getLogger(__name__)
     
     def load_cache(self) -> Dict[str, Any]:
-        """Загрузка кэша предметов"""
+        """Загрузка кэша предметов и наложение контрольной точки сканирования"""
+        cache = {}
         if self.items_cache_file.exists():
             try:
                 with open(self.items_cache_file, 'rb') as f:
                     cache = json.loads(f.read())
                 self.logger.info(f"Загружен кэш: {len(cache)} предметов")
-                return cache
             except Exception as e:
                 self.logger.error(f"Ошибка загрузки кэша: {e}")
-                return {}
-        return {}
+                cache = {}
+        
+        restored = self.checkpoint.replay(cache)
+        if restored:
+            self.logger.info(f"Восстановлено из контрольной точки: {restored} предметов")
+        return cache
     
     def save_cache(self):
-        """Сохранение кэша"""
+        """Сохранение кэша (журнал контрольной точки после этого не нужен)"""
         try:
-            with open(self.items_cache_file, 'wb') as f:
-                f.write(json.dumps(self.items_cache, option=json.OPT_INDENT_2))
+            atomic_write_json(self.items_cache_file, self.items_cache)
+            self.checkpoint.clear()
             self.logger.info(f"Кэш сохранен: {len(self.items_cache)} предметов")
         except Exception as e:
             self.logger.error(f"Ошибка сохранения кэша: {e}")
     
-    def get_item_from_api(self, item_id: str, max_retries: int = 10) -> Optional[Dict[str, Any]]:
-        """Получение данных предмета с API с повторными попытками"""
-        url = f"{self.api_base_url}?id={item_id}&locale=en"
+    def store_item(self, item_id: str, item_data: Dict[str, Any]):
+        """Запись полученного предмета в кэш и журнал контрольной точки
+        
+        Кэш целиком сохраняется раз в checkpoint_interval предметов.
+        """
+        if item_id in self.template_hashes:
+            item_data['template_hash'] = self.template_hashes[item_id]
+        self.items_cache[item_id] = item_data
+        try:
+            self.checkpoint.append(item_data)
+        except OSError as e:
+            self.logger.error(f"Ошибка записи контрольной точки: {e}")
+            self.save_cache()
+            return
+        if self.checkpoint.pending >= self.checkpoint_interval:
+            self.save_cache()
+    
+    def flush_checkpoint(self):
+        """Слияние журнала контрольной точки в кэш, если в нем есть записи"""
+        if self.checkpoint.pending or self.checkpoint.has_entries():
+            self.save_cache()
+    
+    def get_item_url(self, item_id: str) -> str:
+        """URL запроса предмета к API"""
+        return f"{self.api_base_url}?id={item_id}&locale=en"
+    
+    def parse_item_response(self, item_id: str, content: bytes) -> Optional[Dict[str, Any]]:
+        """Запись кэша из ответа API (None - неполные данные)"""
+        # Используем orjson для ускорения парсинга JSON
+        data = json.loads(content)
         
-        for attempt in range(max_retries):
+        if 'item' in data and 'locale' in data:
+            # Объединяем данные предмета с локализацией
+            item_data = {
+                'id': item_id,
+                'name': data['item'].get('_name', ''),
+                'parent': data['item'].get('_parent', ''),
+                'type': data['item'].get('_type', ''),
+                'props': data['item'].get('_props', {}),
+                'locale': data['locale'],
+                'handbook': data.get('handbook', {}),
+                'last_updated': int(time.time())
+            }
+            
+            self.logger.info(f"Получены данные предмета: {item_id}")
+            return item_data
+        
+        self.logger.warning(f"Неполные данные для предмета: {item_id}")
+        return None
+    
+    def _handle_response(self, item_id: str, response: Any) -> Tuple[str, Optional[Dict[str, Any]], Optional[float]]:
+        """Разбор ответа API: (результат FETCH_*, данные предмета, Retry-After в секундах)"""
+        if response.status_code >= 400:
+            if self.retry_policy.is_retryable_status(response.status_code):
+                self.logger.warning(f"Ответ {response.status_code} для предмета {item_id}")
+                return FETCH_RETRY, None, parse_retry_after(response.headers.get('Retry-After'))
+            self.logger.warning(f"Ответ {response.status_code} для предмета {item_id}, повтор не нужен")
+            return FETCH_FAILED, None, None
+        
+        try:
+            item_data = self.parse_item_response(item_id, response.content)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Ошибка парсинга JSON для предмета {item_id}: {e}")
+            return FETCH_FAILED, None, None
+        return (FETCH_OK if item_data else FETCH_FAILED), item_data, None
+    
+    def get_item_from_api(self, item_id: str, max_retries: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Получение данных предмета с API с повторными попытками (по retry_policy)"""
+        url = self.get_item_url(item_id)
+        attempts = max_retries or self.retry_policy.max_attempts
+        
+        for attempt in range(1, attempts + 1):
             try:
-                self.logger.debug(f"Запрос к API (попытка {attempt + 1}/{max_retries}): {url}")
+                self.logger.debug(f"Запрос к API (попытка {attempt}/{attempts}): {url}")
                 
                 # Используем httpx для улучшенной производительности
                 response = self.httpx_client.get(url)
-                response.raise_for_status()
-                
-                # Используем orjson для ускорения парсинга JSON
-                data = json.loads(response.content)
+                outcome, item_data, retry_after = self._handle_response(item_id, response)
                 
-                if 'item' in data and 'locale' in data:
-                    # Объединяем данные предмета с локализацией
-                    item_data = {
-                        'id': item_id,
-                        'name': data['item'].get('_name', ''),
-                        'parent': data['item'].get('_parent', ''),
-                        'type': data['item'].get('_type', ''),
-                        'props': data['item'].get('_props', {}),
-                        'locale': data['locale'],
-                        'handbook': data.get('handbook', {}),
-                        'last_updated': int(time.time())
-                    }
-                    
-                    self.logger.info(f"Получены данные предмета: {item_id}")
-                    return item_data
-                else:
-                    self.logger.warning(f"Неполные данные для предмета: {item_id}")
-                    return None
-                    
-            except (httpx.RequestError, httpx.HTTPStatusError) as e:
-                self.logger.warning(f"Ошибка запроса для предмета {item_id} (попытка {attempt + 1}/{max_retries}): {e}")
-                
-                if attempt < max_retries - 1:
-                    # Ждем 3 секунды перед следующей попыткой
-                    self.logger.info(f"Повторная попытка через 3 секунды...")
-                    time.sleep(3)
-                else:
-                    self.logger.error(f"Не удалось получить данные для {item_id} после {max_retries} попыток")
-                    return None
-                    
-            except json.JSONDecodeError as e:
-                self.logger.error(f"Ошибка парсинга JSON для предмета {item_id}: {e}")
-                return None
+            except httpx.RequestError as e:
+                self.logger.warning(f"Ошибка запроса для предмета {item_id} (попытка {attempt}/{attempts}): {e}")
+                outcome, item_data, retry_after = FETCH_RETRY, None, None
                 
             except Exception as e:
                 self.logger.error(f"Неожиданная ошибка для предмета {item_id}: {e}")
                 return None
+            
+            if outcome != FETCH_RETRY:
+                return item_data
+            if attempt >= attempts:
+                self.logger.error(f"Не удалось получить данные для {item_id} после {attempts} попыток")
+                return None
+            
+            delay = self.retry_policy.get_delay(attempt, retry_after)
+            self.logger.info(f"Повторная попытка через {delay:.1f} с...")
+            time.sleep(delay)
         
         return None
     
+    async def fetch_item_once_async(self, client: 'httpx.AsyncClient', bucket: TokenBucket,
+                                    item_id: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[float]]:
+        """Одна асинхронная попытка запроса предмета (тратит токен ограничителя)"""
+        await bucket.acquire()
+        url = self.get_item_url(item_id)
+        self.logger.debug(f"Запрос к API: {url}")
+        started = time.perf_counter()
+        try:
+            response = await client.get(url)
+        except httpx.RequestError as e:
+            if self.metrics:
+                self.metrics.record_request(time.perf_counter() - started, 0, error=True)
+            self.logger.warning(f"Ошибка запроса для предмета {item_id}: {e}")
+            return FETCH_RETRY, None, None
+        if self.metrics:
+            self.metrics.record_request(time.perf_counter() - started, len(response.content),
+                                        error=response.status_code >= 400)
+        return self._handle_response(item_id, response)
+    
+    def get_fresh_cached_item(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """Запись кэша, если она моложе cache_lifetime_days"""
+        cached_item = self.items_cache.get(item_id)
+        if cached_item and not self.planner.is_stale(cached_item):
+            return cached_item
+        return None
+    
     def scan_item(self, item_id: str, force_update: bool = False) -> Optional[Dict[str, Any]]:
         """Сканирование одного предмета"""
         # Проверяем кэш
-        if not force_update and item_id in self.items_cache:
-            cached_item = self.items_cache[item_id]
-            # Проверяем возраст кэша (24 часа)
-            if time.time() - cached_item.get('last_updated', 0) < 86400:
+        if not force_update:
+            cached_item = self.get_fresh_cached_item(item_id)
+            if cached_item:
                 self.logger.debug(f"Используем кэшированные данные для {item_id}")
                 return cached_item
         
@@ -160,63 +292,210 @@ class DatabaseScanner:
         item_data = self.get_item_from_api(item_id)
         if item_data:
             self.logger.debug(f"Получены данные для {item_id}: {item_data.get('name', 'Unknown')}")
-            self.items_cache[item_id] = item_data
-            self.save_cache()
+            self.store_item(item_id, item_data)
             return item_data
         else:
             self.logger.warning(f"Не удалось получить данные для {item_id}")
         
         return None
     
-    def scan_items_batch(self, item_ids: List[str], delay_range: tuple = (0.3, 0.8)) -> Dict[str, Any]:
-        """Сканирование нескольких предметов с случайной задержкой и поддержкой паузы/отмены"""
+    def _make_bucket(self, delay_range: Optional[Any] = None) -> TokenBucket:
+        """Ограничитель скорости: request_delay из config.yaml или нижняя граница delay_range"""
+        delay = self.request_delay
+        if isinstance(delay_range, (int, float)):
+            delay = float(delay_range)
+        elif delay_range:
+            delay = float(delay_range[0])
+        return TokenBucket.from_delay(delay, self.request_burst)
+    
+    def scan_items_batch(self, item_ids: List[str], delay_range: Optional[Any] = None,
+                         force_update: bool = False) -> Dict[str, Any]:
+        """Сканирование нескольких предметов с поддержкой паузы/отмены
+        
+        Одновременно выполняется до max_connections запросов, общая скорость
+        ограничена request_delay (delay_range оставлен для совместимости:
+        его нижняя граница задает интервал между запросами). Свежие записи
+        кэша не запрашиваются, если не задан force_update.
+        """
         results = {}
         total = len(item_ids)
+        self.failed_items = {}
+        self.metrics = ScanMetrics(total)
         
-        self.logger.info(f"Начинаем сканирование {total} предметов")
+        self.logger.info(f"Начинаем сканирование {total} предметов "
+                         f"({self.max_connections} соединений)")
         
-        for i, item_id in enumerate(item_ids, 1):
-            # Проверяем на отмену
-            if self.is_cancelled:
-                self.logger.info("Сканирование отменено пользователем")
-                break
-            
-            # Обработка паузы
-            while self.is_paused and not self.is_cancelled:
-                time.sleep(0.1)
-            
-            if self.is_cancelled:
-                break
-            
-            # Обновляем прогресс
-            if self.progress_callback:
-                self.progress_callback(i, total)
-            
-            if self.status_callback:
-                self.status_callback(f"Сканирование {i}/{total}: {item_id}")
-            
-            self.logger.info(f"Сканирование {i}/{total}: {item_id}")
-            
-            item_data = self.scan_item(item_id)
-            if item_data:
-                results[item_id] = item_data
-                # Сохраняем в кэш
-                self.items_cache[item_id] = item_data
-            else:
-                self.logger.warning(f"Не удалось получить данные для {item_id}")
-            
-            # Случайная задержка между запросами
-            if i < total and not self.is_cancelled:
-                delay = random.uniform(delay_range[0], delay_range[1])
-                time.sleep(delay)
+        if total:
+            try:
+                asyncio.run(self._scan_items_async(item_ids, results, self._make_bucket(delay_range),
+                                               force_update))
+            finally:
+                # И при отмене: полученное не должно теряться
+                self.flush_checkpoint()
+            self.metrics.finish(self.is_cancelled,
+                                self.circuit_breaker.trips if self.circuit_breaker else 0)
+            self.save_scan_report()
         
         if self.is_cancelled:
             self.logger.info(f"Сканирование отменено: {len(results)}/{total} предметов")
         else:
             self.logger.info(f"Сканирование завершено: {len(results)}/{total} предметов")
+        if self.failed_items:
+            self.logger.warning(f"Не удалось получить: {len(self.failed_items)} предметов")
         
         return results
     
+    async def _scan_items_async(self, item_ids: List[str], results: Dict[str, Any], bucket: TokenBucket,
+                                force_update: bool = False):
+        """Пул задач: основной проход по ID, затем отложенные повторы неудачных
+        
+        Временная ошибка не задерживает задачу: ID откладывается в очередь
+        повторов (с задержкой по retry_policy), которая обрабатывается после
+        основного прохода. При всплеске ошибок размыкатель приостанавливает
+        запросы всех задач до успешного пробного запроса.
+        """
+        total = len(item_ids)
+        queue = iter(item_ids)
+        # Отложенные повторы: (время готовности, порядковый номер, ID)
+        retries: List[Tuple[float, int, str]] = []
+        attempts: Dict[str, int] = {}
+        state = {'done': 0, 'active': 0, 'seq': 0}
+        breaker = self.circuit_breaker = CircuitBreaker.from_config(self.scanner_config)
+        
+        def next_item() -> Tuple[Optional[str], Optional[float]]:
+            """Следующий ID или (None, сколько подождать); (None, None) - работа закончена"""
+            item_id = next(queue, None)
+            if item_id is not None:
+                return item_id, 0.0
+            if retries:
+                wait = retries[0][0] - time.monotonic()
+                if wait <= 0:
+                    return heapq.heappop(retries)[2], 0.0
+                return None, min(wait, 0.5)
+            if state['active']:
+                # Другие задачи еще могут отложить повтор
+                return None, 0.1
+            return None, None
+        
+        def finish(item_id: str, item_data: Optional[Dict[str, Any]], fetched: bool = True):
+            self.metrics.record_done(bool(item_data), fetched)
+            state['done'] += 1
+            done = state['done']
+            if item_data:
+                results[item_id] = item_data
+            else:
+                self.logger.warning(f"Не удалось получить данные для {item_id}")
+            
+            # Обновляем прогресс
+            if self.progress_callback:
+                self.progress_callback(done, total)
+            if self.status_callback:
+                self.status_callback(f"Сканирование {done}/{total}: {item_id}")
+            self.logger.info(f"Сканирование {done}/{total}: {item_id}")
+        
+        async def wait_for_breaker() -> bool:
+            """Ожидание, пока размыкатель пропустит запрос; False - отмена"""
+            while not breaker.allow_request():
+                if self.is_cancelled:
+                    return False
+                wait = breaker.time_until_probe()
+                if self.status_callback:
+                    self.status_callback(f"Онлайн база не отвечает, пауза: {wait:.0f} с")
+                await asyncio.sleep(min(1.0, max(0.1, wait)))
+            return True
+        
+        async def process(client: 'httpx.AsyncClient', item_id: str):
+            item_data = None if force_update else self.get_fresh_cached_item(item_id)
+            if item_data is not None:
+                self.metrics.record_cache_hit()
+                finish(item_id, item_data, fetched=False)
+                return
+            if not await wait_for_breaker():
+                return
+            
+            try:
+                outcome, item_data, retry_after = await self.fetch_item_once_async(client, bucket, item_id)
+            except Exception as e:
+                self.logger.error(f"Неожиданная ошибка для предмета {item_id}: {e}")
+                outcome, item_data, retry_after = FETCH_FAILED, None, None
+            
+            if outcome == FETCH_RETRY:
+                breaker.record_failure()
+                attempt = attempts[item_id] = attempts.get(item_id, 0) + 1
+                if self.retry_policy.can_retry(attempt) and not self.is_cancelled:
+                    delay = self.retry_policy.get_delay(attempt, retry_after)
+                    state['seq'] += 1
+                    heapq.heappush(retries, (time.monotonic() + delay, state['seq'], item_id))
+                    self.metrics.record_retry()
+                    self.logger.info(f"Повтор {item_id} отложен на {delay:.1f} с (попытка {attempt})")
+                    return
+                self.failed_items[item_id] = f"нет ответа после {attempt} попыток"
+            else:
+                breaker.record_success()
+                if item_data:
+                    self.store_item(item_id, item_data)
+                else:
+                    self.failed_items[item_id] = "нет данных"
+            finish(item_id, item_data)
+        
+        async def worker(client: 'httpx.AsyncClient'):
+            while True:
+                # Обработка паузы
+                while self.is_paused and not self.is_cancelled:
+                    await asyncio.sleep(0.1)
+                if self.is_cancelled:
+                    return
+                
+                item_id, wait = next_item()
+                if item_id is None:
+                    if wait is None:
+                        return
+                    await asyncio.sleep(wait)
+                    continue
+                
+                state['active'] += 1
+                try:
+                    await process(client, item_id)
+                finally:
+                    state['active'] -= 1
+        
+        async with httpx.AsyncClient(headers=self.headers, timeout=self.request_timeout,
+                                     verify=self.verify_ssl, limits=self._get_limits()) as client:
+            workers = [asyncio.create_task(worker(client))
+                       for _ in range(min(self.max_connections, total))]
+            pending = set(workers)
+            while pending:
+                _, pending = await asyncio.wait(pending, timeout=0.1)
+                # Отмена прерывает и запросы, которые уже выполняются
+                if self.is_cancelled:
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    break
+            for task in workers:
+                if task.done() and not task.cancelled() and task.exception():
+                    self.logger.error(f"Ошибка задачи сканирования: {task.exception()}")
+    
+    def save_scan_report(self):
+        """Сохранение метрик последнего пакета в cache/scan_reports/"""
+        if self.metrics is None:
+            return
+        settings = {
+            'api_base_url': self.api_base_url,
+            'request_delay': self.request_delay,
+            'request_burst': self.request_burst,
+            'max_connections': self.max_connections,
+            'max_retries': self.retry_policy.max_attempts,
+        }
+        try:
+            self.last_report_file = self.metrics.save_report(self.cache_dir / "scan_reports", settings)
+            snapshot = self.metrics.snapshot()
+            self.logger.info(f"Отчет сканирования: {self.last_report_file} "
+                             f"({snapshot['items_per_second']:.1f} предм/с, "
+                             f"p95 {snapshot['latency_ms']['p95']:.0f} мс)")
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения отчета сканирования: {e}")
+    
     def get_item_display_name(self, item_id: str) -> str:
         """Получение отображаемого названия предмета"""
         if item_id in self.items_cache:
@@ -279,13 +558,15 @@ class DatabaseScanner:
         try:
             items_file = self.server_path / "database" / "templates" / "items.json"
             if items_file.exists():
-                with open(items_file, 'rb') as f:
-                    data = json.loads(f.read())
-                
-                # items.json содержит объект с ключами-ID предметов
-                for item_id in data.keys():
-                    if item_id and len(item_id) > 10:  # Проверяем что это валидный ID
-                        item_ids.add(item_id)
+                # Берем данные из общего хранилища, чтобы не разбирать файл повторно
+                store = acquire_items_store(items_file)
+                try:
+                    # items.json содержит объект с ключами-ID предметов
+                    for item_id in list(store.data.keys()):
+                        if item_id and len(item_id) > 10:  # Проверяем что это валидный ID
+                            item_ids.add(item_id)
+                finally:
+                    release_items_store(store)
                 
                 self.logger.info(f"Найдено {len(item_ids)} уникальных ID предметов в items.json")
                 return list(item_ids)
@@ -404,29 +685,51 @@ class DatabaseScanner:
         # Сохраняем обновленный кэш
         self.save_cache()
     
-    def scan_all_items(self, delay_range: tuple = (0.3, 0.8)) -> Dict[str, Any]:
-        """Сканирование всех предметов из items.json и рецептов"""
+    def plan_scan(self) -> ScanPlan:
+        """План сканирования: ID из items.json и рецептов, которых нет в кэше,
+        которые устарели или локальный шаблон которых изменился"""
+        items_file = self.server_path / "database" / "templates" / "items.json"
+        recipe_ids = self.extract_item_ids_from_recipes()
+        
+        if items_file.exists():
+            store = acquire_items_store(items_file)
+            try:
+                plan = self.planner.plan(store.data or {}, self.items_cache, recipe_ids)
+            finally:
+                release_items_store(store)
+        else:
+            self.logger.warning("Файл items.json не найден")
+            plan = self.planner.plan({}, self.items_cache, recipe_ids)
+        
+        self.logger.info(self.describe_plan(plan))
+        return plan
+    
+    def describe_plan(self, plan: ScanPlan) -> str:
+        """Сводка плана с оценкой числа запросов и времени при текущих ограничениях"""
+        return plan.describe(self.request_delay, self.max_connections)
+    
+    def scan_plan(self, plan: ScanPlan, delay_range: Optional[Any] = None) -> Dict[str, Any]:
+        """Сканирование ID из плана (все они запрашиваются заново)"""
+        self.template_hashes.update(plan.hashes)
+        return self.scan_items_batch(plan.item_ids, delay_range, force_update=True)
+    
+    def scan_all_items(self, delay_range: Optional[Any] = None) -> Dict[str, Any]:
+        """Сканирование предметов из items.json и рецептов по плану (только нужные)"""
         # Сбрасываем флаги управления
         self.is_paused = False
         self.is_cancelled = False
         
-        # Получаем ID из items.json
-        items_ids = self.extract_item_ids_from_items_file()
-        
-        # Получаем ID из рецептов
-        recipe_ids = self.extract_item_ids_from_recipes()
-        
-        # Объединяем все ID
-        all_item_ids = list(set(items_ids + recipe_ids))
-        
-        if not all_item_ids:
+        plan = self.plan_scan()
+        if not plan.total:
             self.logger.warning("Не найдено ID предметов для сканирования")
             return {}
         
-        self.logger.info(f"Всего найдено {len(all_item_ids)} уникальных ID предметов")
+        self.logger.info(f"Всего найдено {plan.total} уникальных ID предметов")
+        if self.status_callback:
+            self.status_callback(self.describe_plan(plan))
         
-        # Сканируем все предметы
-        self.scan_items_batch(all_item_ids, delay_range)
+        # Сканируем только нужные предметы
+        self.scan_plan(plan, delay_range)
         
         # Удаляем дубли только если сканирование не было отменено
         if not self.is_cancelled:
@@ -450,15 +753,13 @@ class DatabaseScanner:
         """Получение статистики кэша"""
         total_items = len(self.items_cache)
         
-        # Подсчет по типам
+        # Подсчет по типам и редкости за один проход
         types_count = {}
+        rarity_count = {}
         for item in self.items_cache.values():
             item_type = item.get('type', 'Unknown')
             types_count[item_type] = types_count.get(item_type, 0) + 1
-        
-        # Подсчет по редкости
-        rarity_count = {}
-        for item in self.items_cache.values():
+            
             if 'props' in item and 'RarityPvE' in item['props']:
                 rarity = item['props']['RarityPvE']
                 rarity_count[rarity] = rarity_count.get(rarity, 0) + 1
@@ -473,6 +774,7 @@ class DatabaseScanner:
     def clear_cache(self):
         """Очистка кэша"""
         self.items_cache = {}
+        self.checkpoint.clear()
         if self.items_cache_file.exists():
             self.items_cache_file.unlink()
         self.logger.info("Кэш очищен")
@@ -530,6 +832,8 @@ class DatabaseScanner:
     
     def close(self):
         """Закрытие ресурсов"""
+        if hasattr(self, 'checkpoint'):
+            self.checkpoint.close()
         if hasattr(self, 'httpx_client'):
             self.httpx_client.close()
         if hasattr(self, 'session'):
@@ -567,10 +871,11 @@ def main():
         for rarity, count in stats['rarity'].items():
             print(f"     {rarity}: {count}")
     
-    print("\n🚀 Начинаем сканирование всех предметов...")
+    print(f"\n🗓️ {scanner.describe_plan(scanner.plan_scan())}")
+    print("\n🚀 Начинаем сканирование...")
     
-    # Сканируем все предметы из items.json и рецептов
-    results = scanner.scan_all_items(delay_range=(0.3, 0.8))
+    # Сканируем нужные предметы из items.json и рецептов
+    results = scanner.scan_all_items()
     
     print(f"\n✅ Сканирование завершено!")
     print(f"   Обработано: {len(results)} предметов")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scan Limits - Ограничения онлайн сканирования базы SPT-Tarkov
+
+TokenBucket задает общий бюджет запросов в секунду для всех одновременных
+запросов сканера: токены пополняются со скоростью rate, запрос тратит один
+токен, запас не превышает capacity (допустимая пачка запросов подряд).
+
+RetryPolicy определяет, какие ошибки стоит повторять и через сколько:
+экспоненциальная задержка со случайным разбросом, не меньше Retry-After.
+
+CircuitBreaker останавливает запросы всего пакета, если доля ошибок среди
+последних запросов слишком велика, и после паузы пропускает один пробный
+запрос: при успехе запросы возобновляются, при ошибке пауза удваивается.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+class TokenBucket:
+    """Асинхронный ограничитель скорости запросов (общий для всех задач цикла)"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        # rate <= 0 - без ограничения
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Ожидание токена для одного запроса"""
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Под замком токены выдаются строго по очереди ожидания
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    @classmethod
+    def from_delay(cls, delay: float, capacity: float = 1.0) -> 'TokenBucket':
+        """Ограничитель по минимальной задержке между запросами (секунды)"""
+        return cls(1.0 / delay if delay and delay > 0 else 0.0, capacity)
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Секунды из заголовка Retry-After (число секунд или HTTP-дата)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, moment.timestamp() - now)
+
+class RetryPolicy:
+    """Повторы запросов: какие ошибки повторять и с какой задержкой"""
+
+    # Коды ответа, при которых запрос имеет смысл повторить
+    RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 60.0, jitter: float = 0.5):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = max(0.0, float(base_delay))
+        self.max_delay = max(self.base_delay, float(max_delay))
+        # Доля задержки, которая выбирается случайно (0 - без разброса)
+        self.jitter = min(1.0, max(0.0, float(jitter)))
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        """Стоит ли повторять запрос с таким кодом ответа"""
+        return status_code in self.RETRYABLE_STATUS
+
+    def can_retry(self, attempt: int) -> bool:
+        """Остались ли попытки после attempt-й (нумерация с 1)"""
+        return attempt < self.max_attempts
+
+    def get_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Задержка перед попыткой attempt + 1: base * 2^(attempt-1) с разбросом, не меньше Retry-After"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempt - 1)))
+        delay -= delay * self.jitter * random.random()
+        if retry_after is not None:
+            # Сервер сам сказал, когда приходить; ограничиваем только разумным максимумом
+            delay = max(delay, min(retry_after, self.max_delay * 5))
+        return delay
+
+    @classmethod
+    def from_config(cls, scanner_config: dict) -> 'RetryPolicy':
+        """Политика из секции scanner config.yaml"""
+        return cls(scanner_config.get('max_retries', 5),
+                   scanner_config.get('retry_base_delay', 1.0),
+                   scanner_config.get('retry_max_delay', 60.0))
+
+class CircuitBreaker:
+    """Размыкатель: пауза всех запросов при всплеске ошибок, затем пробный запрос"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, error_rate: float = 0.5, window: int = 20,
+                 cooldown: float = 30.0, max_cooldown: float = 300.0):
+        # Доля ошибок среди последних window запросов, при которой цепь размыкается
+        self.error_rate = error_rate
+        self.window = max(1, int(window))
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.results: deque = deque(maxlen=self.window)
+        # Сколько раз цепь размыкалась (для отчета)
+        self.trips = 0
+
+    def allow_request(self, now: Optional[float] = None) -> bool:
+        """Можно ли отправить запрос сейчас (в полуоткрытом состоянии - только один пробный)"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic() if now is None else now
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.probe_in_flight:
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def time_until_probe(self, now: Optional[float] = None) -> float:
+        """Сколько секунд осталось до пробного запроса"""
+        if self.state != self.OPEN:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.cooldown - (now - self.opened_at))
+
+    def record_success(self):
+        """Запрос выполнен (сервер ответил, даже если предмета нет)"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self.cooldown = self.base_cooldown
+            self.probe_in_flight = False
+            self.results.clear()
+        self.results.append(True)
+
+    def record_failure(self, now: Optional[float] = None):
+        """Запрос завершился ошибкой, которую стоит повторять"""
+        now = time.monotonic() if now is None else now
+        if self.state == self.HALF_OPEN:
+            # Пробный запрос не прошел - пауза длиннее
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            self._open(now)
+            return
+        if self.state == self.OPEN:
+            # Ответы запросов, отправленных до размыкания
+            return
+        self.results.append(False)
+        if len(self.results) >= self.window:
+            failures = self.results.count(False)
+            if failures / len(self.results) >= self.error_rate:
+                self._open(now)
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.probe_in_flight = False
+        self.results.clear()
+        self.trips += 1
+
+    @classmethod
+    def from_config(cls, scanner_config: dict) -> 'CircuitBreaker':
+        """Размыкатель из секции scanner config.yaml"""
+        return cls(scanner_config.get('breaker_error_rate', 0.5),
+                   scanner_config.get('breaker_window', 20),
+                   scanner_config.get('breaker_cooldown', 30.0))
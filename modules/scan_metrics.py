@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scan Metrics - Метрики онлайн сканирования
+
+Сканер записывает в ScanMetrics каждый запрос (длительность, объем ответа,
+результат), попадания в кэш и отложенные повторы. Окно сканирования читает
+снимок метрик с фиксированной частотой обновления интерфейса, а в конце
+сканирования снимок сохраняется в cache/scan_reports/ для сравнения запусков.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+try:
+    from modules.atomic_writer import atomic_write_json
+except ImportError:
+    from atomic_writer import atomic_write_json
+
+# Сколько последних отчетов хранить в папке отчетов
+MAX_REPORTS = 20
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def format_bytes(size: float) -> str:
+    """Объем для пользователя: 512 B, 1.5 KB, 12.3 MB"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+class ScanMetrics:
+    """Счетчики и длительности запросов одного пакетного сканирования"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+        self.done = 0
+        self.requests = 0
+        self.errors = 0
+        self.fetched = 0
+        self.failed = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.bytes_downloaded = 0
+        self.breaker_trips = 0
+        self.cancelled = False
+        self.latencies: List[float] = []
+        # Снимок читается из потока интерфейса
+        self.lock = threading.Lock()
+
+    def record_request(self, latency: float, size: int, error: bool = False):
+        """Выполненный запрос: длительность (секунды), объем ответа, ошибка ли"""
+        with self.lock:
+            self.requests += 1
+            self.bytes_downloaded += size
+            self.latencies.append(latency)
+            if error:
+                self.errors += 1
+
+    def record_cache_hit(self):
+        """Предмет взят из кэша без запроса"""
+        with self.lock:
+            self.cache_hits += 1
+
+    def record_retry(self):
+        """Предмет отложен на повтор"""
+        with self.lock:
+            self.retries += 1
+
+    def record_done(self, success: bool, fetched: bool):
+        """Предмет обработан окончательно"""
+        with self.lock:
+            self.done += 1
+            if fetched:
+                self.fetched += 1
+            if not success:
+                self.failed += 1
+
+    def finish(self, cancelled: bool = False, breaker_trips: int = 0):
+        """Завершение сканирования"""
+        with self.lock:
+            self._finished = time.perf_counter()
+            self.cancelled = cancelled
+            self.breaker_trips = breaker_trips
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие метрики: скорость, перцентили задержки, повторы, объем, доля кэша, ETA"""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            elapsed = (self._finished or time.perf_counter()) - self._started
+            done = self.done
+            cache_hits = self.cache_hits
+            snapshot = {
+                'total': self.total,
+                'done': done,
+                'fetched': self.fetched,
+                'failed': self.failed,
+                'requests': self.requests,
+                'errors': self.errors,
+                'retries': self.retries,
+                'cache_hits': cache_hits,
+                'bytes_downloaded': self.bytes_downloaded,
+                'breaker_trips': self.breaker_trips,
+                'cancelled': self.cancelled,
+                'finished': self._finished is not None,
+            }
+
+        items_per_second = done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - done
+        snapshot.update({
+            'elapsed': elapsed,
+            'items_per_second': items_per_second,
+            'requests_per_second': snapshot['requests'] / elapsed if elapsed > 0 else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 0.50) * 1000,
+                'p95': percentile(latencies, 0.95) * 1000,
+                'p99': percentile(latencies, 0.99) * 1000,
+                'max': (latencies[-1] * 1000) if latencies else 0.0,
+            },
+            'cache_hit_ratio': cache_hits / done if done else 0.0,
+            'eta': remaining / items_per_second if items_per_second > 0 and remaining > 0 else 0.0,
+        })
+        return snapshot
+
+    def describe(self, snapshot: Optional[Dict[str, Any]] = None) -> str:
+        """Две строки метрик для окна сканирования"""
+        snapshot = snapshot or self.snapshot()
+        latency = snapshot['latency_ms']
+        eta = snapshot['eta']
+        eta_text = f"~{eta / 60:.0f} мин" if eta >= 90 else f"~{eta:.0f} с"
+        return (f"Скорость: {snapshot['items_per_second']:.1f} предм/с | Осталось: {eta_text} | "
+                f"Из кэша: {snapshot['cache_hit_ratio']:.0%}\n"
+                f"Задержка p50/p95/p99: {latency['p50']:.0f}/{latency['p95']:.0f}/{latency['p99']:.0f} мс | "
+                f"Повторы: {snapshot['retries']} | Загружено: {format_bytes(snapshot['bytes_downloaded'])}")
+
+    def save_report(self, reports_dir: Path, settings: Optional[Dict[str, Any]] = None) -> Path:
+        """Сохранение отчета в reports_dir/scan_<дата>_<время>.json (старые отчеты удаляются)"""
+        reports_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.started_at).strftime('%Y%m%d_%H%M%S')
+        report_file = reports_dir / f"scan_{stamp}.json"
+        suffix = 2
+        while report_file.exists():
+            report_file = reports_dir / f"scan_{stamp}_{suffix}.json"
+            suffix += 1
+        report = {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'settings': settings or {},
+            'metrics': self.snapshot()
+        }
+        atomic_write_json(report_file, report)
+
+        for old_report in sorted(reports_dir.glob("scan_*.json"))[:-MAX_REPORTS]:
+            try:
+                old_report.unlink()
+            except OSError:
+                pass
+        return report_file
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scan Planner - План инкрементального онлайн сканирования
+
+Текущие ID сервера (items.json и рецепты крафта) сравниваются с кэшем
+сканера, и в план попадают только:
+- предметы, которых нет в кэше;
+- записи старше cache.cache_lifetime_days из config.yaml;
+- предметы, локальный шаблон которых изменился с момента сканирования
+  (хеш шаблона сохраняется в записи кэша как template_hash).
+Для плана оценивается число запросов и время с учетом ограничений сканера.
+"""
+
+import hashlib
+import time
+import orjson as json
+from typing import Dict, List, Any, Optional, Iterable
+
+# Время жизни записи кэша по умолчанию (дни)
+DEFAULT_CACHE_LIFETIME_DAYS = 7
+# Средняя длительность одного запроса к онлайн базе для оценки (секунды)
+ESTIMATED_REQUEST_TIME = 0.5
+
+def template_hash(template: Any) -> str:
+    """Короткий хеш шаблона предмета (не зависит от порядка ключей)"""
+    raw = json.dumps(template, option=json.OPT_SORT_KEYS)
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+def format_duration(seconds: float) -> str:
+    """Длительность для пользователя: 45 с, 3 мин 20 с, 1 ч 5 мин"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} с"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} мин {seconds} с" if seconds else f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} ч {minutes} мин" if minutes else f"{hours} ч"
+
+class ScanPlan:
+    """Результат планирования: какие ID запрашивать и почему"""
+
+    def __init__(self):
+        self.missing: List[str] = []
+        self.stale: List[str] = []
+        self.changed: List[str] = []
+        self.up_to_date = 0
+        # ID -> хеш текущего локального шаблона (для записи в кэш после сканирования)
+        self.hashes: Dict[str, str] = {}
+
+    @property
+    def item_ids(self) -> List[str]:
+        """ID для сканирования: сначала отсутствующие, затем измененные и устаревшие"""
+        return self.missing + self.changed + self.stale
+
+    @property
+    def total(self) -> int:
+        """Всего ID на сервере"""
+        return len(self.item_ids) + self.up_to_date
+
+    def __len__(self) -> int:
+        return len(self.missing) + len(self.changed) + len(self.stale)
+
+    def estimate_seconds(self, request_delay: float, max_connections: int,
+                         request_time: float = ESTIMATED_REQUEST_TIME) -> float:
+        """Оценка времени: упирается либо в бюджет запросов, либо в число соединений"""
+        requests = len(self)
+        by_rate = requests * request_delay if request_delay > 0 else 0.0
+        by_connections = requests * request_time / max(1, max_connections)
+        return max(by_rate, by_connections)
+
+    def describe(self, request_delay: float, max_connections: int) -> str:
+        """Сводка плана для окна сканирования"""
+        if not len(self):
+            return f"Все {self.total} предметов актуальны, запросы не нужны"
+        estimate = format_duration(self.estimate_seconds(request_delay, max_connections))
+        return (f"План: {len(self)} из {self.total} запросов (~{estimate}) | "
+                f"нет в кэше: {len(self.missing)}, изменились: {len(self.changed)}, "
+                f"устарели: {len(self.stale)}")
+
+class ScanPlanner:
+    """Сравнение ID сервера с кэшем сканера"""
+
+    def __init__(self, cache_lifetime_days: Optional[float] = None):
+        if cache_lifetime_days is None:
+            cache_lifetime_days = DEFAULT_CACHE_LIFETIME_DAYS
+        self.cache_lifetime = float(cache_lifetime_days) * 86400
+
+    def is_stale(self, cached_item: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Запись старше времени жизни кэша"""
+        now = time.time() if now is None else now
+        return now - cached_item.get('last_updated', 0) >= self.cache_lifetime
+
+    def plan(self, items_data: Dict[str, Any], items_cache: Dict[str, Any],
+             extra_ids: Iterable[str] = ()) -> ScanPlan:
+        """План по шаблонам items.json и дополнительным ID (например, из рецептов)"""
+        plan = ScanPlan()
+        now = time.time()
+        seen = set()
+
+        def classify(item_id: str, current_hash: Optional[str]):
+            cached_item = items_cache.get(item_id)
+            if not cached_item:
+                plan.missing.append(item_id)
+            elif (current_hash and cached_item.get('template_hash')
+                  and cached_item['template_hash'] != current_hash):
+                # Без сохраненного хеша (старые записи) изменение не определить
+                plan.changed.append(item_id)
+            elif self.is_stale(cached_item, now):
+                plan.stale.append(item_id)
+            else:
+                plan.up_to_date += 1
+
+        for item_id, template in items_data.items():
+            # Те же ID, что берет сканер из items.json
+            if not item_id or len(item_id) <= 10:
+                continue
+            seen.add(item_id)
+            current_hash = template_hash(template) if isinstance(template, dict) else None
+            if current_hash:
+                plan.hashes[item_id] = current_hash
+            classify(item_id, current_hash)
+
+        for item_id in extra_ids:
+            if item_id and item_id not in seen:
+                seen.add(item_id)
+                classify(item_id, None)
+
+        return plan
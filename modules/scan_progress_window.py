@@ -10,6 +10,10 @@ import threading
 from pathlib import Path
 from typing import Callable, Optional
 from scan_db import DatabaseScanner
+from offline_cache_builder import OfflineCacheBuilder
+
+# Период обновления окна (мс): прогресс, статус и метрики рисуются не чаще
+UI_REFRESH_MS = 250
 
 class ScanProgressWindow:
     def __init__(self, parent, server_path: Path, on_complete: Optional[Callable] = None):
@@ -20,7 +24,7 @@ class ScanProgressWindow:
         # Создание модального окна
         self.window = tk.Toplevel(parent)
         self.window.title("Сканирование базы данных")
-        self.window.geometry("500x300")
+        self.window.geometry("520x400")
         self.window.resizable(False, False)
         
         # Делаем окно модальным
@@ -35,6 +39,11 @@ class ScanProgressWindow:
         self.scan_thread: Optional[threading.Thread] = None
         self.is_scanning = False
         
+        # Последние значения от потока сканирования; окно рисует их по таймеру
+        self._progress = (0.0, "0 / 0")
+        self._status = "Инициализация..."
+        self._rendered = (None, None)
+        
         # Создание интерфейса
         self.create_widgets()
         
@@ -63,8 +72,8 @@ class ScanProgressWindow:
         
         # Описание
         desc_label = ttk.Label(main_frame, 
-                              text="Сбор данных о предметах с онлайн базы SPT-Tarkov.\n"
-                                   "Это может занять несколько минут...",
+                              text="Сбор данных о предметах из файлов сервера,\n"
+                                   "недостающие запрашиваются с онлайн базы SPT-Tarkov...",
                               font=('Arial', 10))
         desc_label.pack(pady=(0, 20))
         
@@ -84,7 +93,13 @@ class ScanProgressWindow:
         self.counter_var = tk.StringVar(value="0 / 0")
         self.counter_label = ttk.Label(main_frame, textvariable=self.counter_var,
                                       font=('Arial', 10, 'bold'))
-        self.counter_label.pack(pady=(0, 20))
+        self.counter_label.pack(pady=(0, 10))
+        
+        # Метрики сканирования
+        self.metrics_var = tk.StringVar(value="")
+        self.metrics_label = ttk.Label(main_frame, textvariable=self.metrics_var,
+                                      font=('Arial', 9), justify=tk.CENTER)
+        self.metrics_label.pack(pady=(0, 10))
         
         # Кнопки управления
         button_frame = ttk.Frame(main_frame)
@@ -104,7 +119,7 @@ class ScanProgressWindow:
         
         self.cache_info_var = tk.StringVar(value="Загрузка информации...")
         self.cache_info_label = ttk.Label(info_frame, textvariable=self.cache_info_var,
-                                         font=('Arial', 9))
+                                         font=('Arial', 9), wraplength=460)
         self.cache_info_label.pack()
     
     def start_scanning(self):
@@ -112,10 +127,17 @@ class ScanProgressWindow:
         self.is_scanning = True
         self.scan_thread = threading.Thread(target=self._scan_worker, daemon=True)
         self.scan_thread.start()
+        self.window.after(UI_REFRESH_MS, self._refresh_ui)
     
     def _scan_worker(self):
         """Рабочий поток сканирования"""
         try:
+            # Сначала справочник собирается из локальных файлов сервера
+            try:
+                OfflineCacheBuilder(self.server_path).build(self.update_progress, self.update_status)
+            except Exception as e:
+                self.update_status(f"Локальная сборка недоступна: {e}")
+            
             # Создаем сканер
             self.scanner = DatabaseScanner(self.server_path)
             
@@ -123,52 +145,89 @@ class ScanProgressWindow:
             self.scanner.set_progress_callback(self.update_progress)
             self.scanner.set_status_callback(self.update_status)
             
-            # Обновляем информацию о кэше
-            self.update_cache_info()
+            # План: только отсутствующие в кэше, устаревшие и измененные предметы
+            self.update_status("Планирование сканирования...")
+            plan = self.scanner.plan_scan()
+            
+            # Обновляем информацию о кэше и оценку плана
+            self.update_cache_info(self.scanner.describe_plan(plan))
             
-            # Запускаем сканирование
-            self.window.after(0, lambda: self.status_var.set("Сканирование предметов..."))
+            if not len(plan):
+                # Онлайн сканирование не требуется
+                self.update_status("Справочник актуален!")
+                self._set_progress(100)
+                self.scanner.close()
+                return
+            
+            # Запускаем сканирование по плану
+            self.update_status("Сканирование предметов...")
             self.window.after(0, lambda: self.pause_button.config(state='normal'))
             
-            results = self.scanner.scan_all_items(delay_range=(0.3, 0.8))
+            results = self.scanner.scan_plan(plan)
             
             if self.scanner.is_cancelled:
-                self.window.after(0, lambda: self.status_var.set("Сканирование отменено"))
-                self.window.after(0, lambda: self.progress_var.set(0))
+                self.update_status("Сканирование отменено")
+                self._set_progress(0)
             else:
-                self.window.after(0, lambda: self.status_var.set("Экспорт в читаемый формат..."))
+                self.update_status("Экспорт в читаемый формат...")
                 # Экспортируем в читаемый формат
                 self.scanner.export_cache_to_readable()
-                self.window.after(0, lambda: self.status_var.set("Сканирование завершено!"))
-                self.window.after(0, lambda: self.progress_var.set(100))
+                failed = len(self.scanner.failed_items)
+                self.update_status("Сканирование завершено!" if not failed else
+                                   f"Сканирование завершено, не получено: {failed}")
+                self._set_progress(100)
             
             # Закрываем сканер
             self.scanner.close()
             
         except Exception as e:
-            self.window.after(0, lambda: self.status_var.set(f"Ошибка: {str(e)}"))
-            self.window.after(0, lambda: messagebox.showerror("Ошибка", f"Ошибка сканирования: {str(e)}"))
+            message = str(e)
+            self.update_status(f"Ошибка: {message}")
+            self.window.after(0, lambda: messagebox.showerror("Ошибка", f"Ошибка сканирования: {message}"))
         
         finally:
             self.is_scanning = False
             self.window.after(0, self._on_scan_complete)
     
     def update_progress(self, current: int, total: int):
-        """Обновление прогресса"""
+        """Обновление прогресса (из потока сканирования; отрисовка - по таймеру)"""
         if total > 0:
-            progress = (current / total) * 100
-            self.window.after(0, lambda: self.progress_var.set(progress))
-            self.window.after(0, lambda: self.counter_var.set(f"{current} / {total}"))
+            self._progress = ((current / total) * 100, f"{current} / {total}")
+    
+    def _set_progress(self, percent: float):
+        """Прогресс без изменения счетчика"""
+        self._progress = (percent, self._progress[1])
     
     def update_status(self, status: str):
-        """Обновление статуса"""
-        self.window.after(0, lambda: self.status_var.set(status))
+        """Обновление статуса (из потока сканирования; отрисовка - по таймеру)"""
+        self._status = status
+    
+    def _refresh_ui(self):
+        """Отрисовка последних прогресса, статуса и метрик (раз в UI_REFRESH_MS)"""
+        progress, status = self._progress, self._status
+        if (progress, status) != self._rendered:
+            self.progress_var.set(progress[0])
+            self.counter_var.set(progress[1])
+            self.status_var.set(status)
+            self._rendered = (progress, status)
+        
+        metrics = self.scanner.metrics if self.scanner else None
+        if metrics is not None:
+            text = metrics.describe()
+            if not self.is_scanning and self.scanner.last_report_file:
+                text += f"\nОтчет: {self.scanner.last_report_file.name}"
+            self.metrics_var.set(text)
+        
+        if self.is_scanning:
+            self.window.after(UI_REFRESH_MS, self._refresh_ui)
     
-    def update_cache_info(self):
-        """Обновление информации о кэше"""
+    def update_cache_info(self, plan_text: Optional[str] = None):
+        """Обновление информации о кэше (и плане сканирования)"""
         if self.scanner:
             stats = self.scanner.get_cache_stats()
             info_text = f"Предметов в кэше: {stats['total_items']} | Размер: {stats['cache_file_size']} байт"
+            if plan_text:
+                info_text += f"\n{plan_text}"
             self.window.after(0, lambda: self.cache_info_var.set(info_text))
     
     def toggle_pause(self):
@@ -177,11 +236,11 @@ class ScanProgressWindow:
             if self.scanner.is_paused:
                 self.scanner.resume_scanning()
                 self.pause_button.config(text="⏸️ Пауза")
-                self.status_var.set("Сканирование продолжено...")
+                self.update_status("Сканирование продолжено...")
             else:
                 self.scanner.pause_scanning()
                 self.pause_button.config(text="▶️ Продолжить")
-                self.status_var.set("Сканирование приостановлено...")
+                self.update_status("Сканирование приостановлено...")
     
     def cancel_scanning(self):
         """Отмена сканирования"""
@@ -193,10 +252,11 @@ class ScanProgressWindow:
                 self.scanner.cancel_scanning()
                 self.pause_button.config(state='disabled')
                 self.cancel_button.config(state='disabled')
-                self.status_var.set("Отмена сканирования...")
+                self.update_status("Отмена сканирования...")
     
     def _on_scan_complete(self):
         """Обработка завершения сканирования"""
+        self._refresh_ui()
         self.pause_button.config(state='disabled')
         self.cancel_button.config(text="✅ Закрыть", command=self.close_window)
         
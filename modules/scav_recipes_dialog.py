@@ -6,7 +6,6 @@ Scav Recipes Dialog - Диалог для редактирования реце
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import orjson as json
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import random
@@ -16,6 +15,8 @@ import string
 try:
     from items_cache import ItemsCache
     from context_menus import setup_context_menus_for_module
+    from atomic_writer import atomic_write_json
+    from json_loader import load_json
 except ImportError:
     # Если модули не найдены, добавляем путь к модулям
     import sys
@@ -25,6 +26,8 @@ except ImportError:
     
     from items_cache import ItemsCache
     from context_menus import setup_context_menus_for_module
+    from atomic_writer import atomic_write_json
+    from json_loader import load_json
 
 class ScavRecipesDialog:
     """Диалог для редактирования рецептов ящика диких"""
@@ -274,8 +277,7 @@ class ScavRecipesDialog:
         """Загрузка данных из файла"""
         try:
             if self.production_file.exists():
-                with open(self.production_file, 'rb') as f:
-                    self.production_data = json.loads(f.read())
+                self.production_data = load_json(self.production_file)
                 self.scav_recipes = self.production_data.get('scavRecipes', [])
             else:
                 self.scav_recipes = []
@@ -849,9 +851,9 @@ class ScavRecipesDialog:
             # Обновляем данные
             self.production_data['scavRecipes'] = self.scav_recipes
             
-            # Сохраняем в файл
-            with open(self.production_file, 'wb') as f:
-                f.write(json.dumps(self.production_data, option=json.OPT_INDENT_2))
+            # Атомарно сохраняем в файл; прежняя версия остается резервной копией
+            backup_file = self.production_file.with_suffix('.json.backup')
+            atomic_write_json(self.production_file, self.production_data, backup_file)
             
             return True
             
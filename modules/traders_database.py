@@ -4,11 +4,17 @@
 Traders Database - Модуль для работы с базой данных торговцев
 """
 
-import orjson as json
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Union
 import time
 
+try:
+    from modules.atomic_writer import atomic_write_json
+    from modules.json_loader import load_json
+except ImportError:
+    from atomic_writer import atomic_write_json
+    from json_loader import load_json
+
 class TradersDatabase:
     """Класс для работы с базой данных торговцев"""
     
@@ -30,8 +36,7 @@ class TradersDatabase:
                 print(f"Файл {self.trader_config_file} не найден")
                 return False
             
-            with open(self.trader_config_file, 'rb') as f:
-                self.trader_config = json.loads(f.read())
+            self.trader_config = load_json(self.trader_config_file)
             
             print(f"Загружена конфигурация торговцев из {self.trader_config_file}")
             return True
@@ -74,32 +79,27 @@ class TradersDatabase:
             # Загружаем base.json
             base_file = trader_dir / "base.json"
             if base_file.exists():
-                with open(base_file, 'rb') as f:
-                    trader_data['base'] = json.loads(f.read())
+                trader_data['base'] = load_json(base_file)
             
             # Загружаем assort.json
             assort_file = trader_dir / "assort.json"
             if assort_file.exists():
-                with open(assort_file, 'rb') as f:
-                    trader_data['assort'] = json.loads(f.read())
+                trader_data['assort'] = load_json(assort_file)
             
             # Загружаем questassort.json
             questassort_file = trader_dir / "questassort.json"
             if questassort_file.exists():
-                with open(questassort_file, 'rb') as f:
-                    trader_data['questassort'] = json.loads(f.read())
+                trader_data['questassort'] = load_json(questassort_file)
             
             # Загружаем dialogue.json
             dialogue_file = trader_dir / "dialogue.json"
             if dialogue_file.exists():
-                with open(dialogue_file, 'rb') as f:
-                    trader_data['dialogue'] = json.loads(f.read())
+                trader_data['dialogue'] = load_json(dialogue_file)
             
             # Загружаем services.json
             services_file = trader_dir / "services.json"
             if services_file.exists():
-                with open(services_file, 'rb') as f:
-                    trader_data['services'] = json.loads(f.read())
+                trader_data['services'] = load_json(services_file)
             
             return trader_data
             
@@ -270,17 +270,12 @@ class TradersDatabase:
             if trader_id not in self.traders_data:
                 return False
             
-            # Создаем резервную копию
             trader_dir = self.traders_dir / trader_id
             base_file = trader_dir / "base.json"
             backup_file = trader_dir / "base.json.backup"
             
-            if base_file.exists():
-                backup_file.write_bytes(base_file.read_bytes())
-            
-            # Сохраняем обновленные данные
-            with open(base_file, 'wb') as f:
-                f.write(json.dumps(base_data, option=json.OPT_INDENT_2))
+            # Атомарно сохраняем обновленные данные; прежняя версия остается резервной копией
+            atomic_write_json(base_file, base_data, backup_file)
             
             # Обновляем кэш
             self.traders_data[trader_id]['base'] = base_data
@@ -295,14 +290,9 @@ class TradersDatabase:
     def save_trader_config(self) -> bool:
         """Сохранение конфигурации торговцев"""
         try:
-            # Создаем резервную копию
+            # Атомарно сохраняем обновленные данные; прежняя версия остается резервной копией
             backup_file = self.trader_config_file.with_suffix('.json.backup')
-            if self.trader_config_file.exists():
-                backup_file.write_bytes(self.trader_config_file.read_bytes())
-            
-            # Сохраняем обновленные данные
-            with open(self.trader_config_file, 'wb') as f:
-                f.write(json.dumps(self.trader_config, option=json.OPT_INDENT_2))
+            atomic_write_json(self.trader_config_file, self.trader_config, backup_file)
             
             print(f"Конфигурация торговцев сохранена")
             return True
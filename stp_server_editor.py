@@ -22,6 +22,7 @@ import tkinter as tk                    # Основная библиотека
 from tkinter import ttk, messagebox, filedialog  # Дополнительные компоненты tkinter
 import os                              # Для работы с операционной системой
 import sys                             # Для работы с системными параметрами
+import threading                       # Для фонового запуска пула процессов анализа
 import orjson as json                  # Быстрая библиотека для работы с JSON (быстрее стандартной)
 from pathlib import Path               # Для работы с путями файловой системы
 from datetime import datetime          # Для работы с датой и временем
@@ -173,6 +174,14 @@ class SPTEditor:
         # Настройка стилей интерфейса
         self.setup_styles()
         
+        # Фоновая загрузка файлов базы, пока строится интерфейс (после
+        # завершения остается только отчет о времени загрузки)
+        self.database_loader = None
+        self.database_preload_report = None
+        self.preload_release_delay = 0
+        self.start_database_preload()
+        self.start_analysis_pool()
+        
         # Проверяем наличие кэша предметов
         self.check_items_cache()
         
@@ -185,6 +194,9 @@ class SPTEditor:
         
         # Загружаем все модули приложения
         self.load_modules()
+        
+        # При закрытии главного окна журналы изменений сливаются в items.json
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
     def setup_styles(self):
         """
@@ -205,6 +217,81 @@ class SPTEditor:
         style.configure('Module.TButton', padding=(10, 5))  # Стиль для кнопок модулей (больше отступы)
         style.configure('Action.TButton', padding=(5, 2))   # Стиль для кнопок действий (меньше отступы)
     
+    def start_database_preload(self):
+        """Запуск параллельной загрузки файлов базы (настройки performance в config.yaml)"""
+        try:
+            from modules.config_manager import ConfigManager
+            from modules.database_loader import DatabaseLoader, PRELOAD_RELEASE_DELAY_MS
+            
+            config = ConfigManager()
+            performance = config.get_performance_config()
+            if not performance.get('preload_database', True):
+                return
+            
+            self.database_loader = DatabaseLoader(self.server_path, performance.get('loader_workers'),
+                                                  [config.get('locales.language', 'en')],
+                                                  include_items=not performance.get('lazy_items', True))
+            self.preload_release_delay = PRELOAD_RELEASE_DELAY_MS
+            self.database_loader.start()
+            self.root.after(200, self.check_database_preload)
+        except Exception as e:
+            warning(f"Фоновая загрузка базы недоступна: {e}", LogCategory.DATABASE)
+            self.database_loader = None
+    
+    def start_analysis_pool(self):
+        """Фоновый запуск пула процессов анализа (только при performance.analysis_workers > 1)"""
+        try:
+            from modules.parallel_analysis import get_analysis_workers, warm_up_pool
+            if get_analysis_workers() > 1:
+                threading.Thread(target=warm_up_pool, name="analysis-pool", daemon=True).start()
+        except Exception as e:
+            warning(f"Пул процессов анализа недоступен: {e}", LogCategory.PERFORMANCE)
+    
+    def check_database_preload(self):
+        """Запись времени загрузки по файлам после завершения фоновой загрузки
+        
+        После завершения остается только отчет о времени: загрузчик
+        освобождается, а невостребованные модулями результаты сбрасываются
+        через preload_release_delay мс.
+        """
+        if self.database_loader is None:
+            return
+        if not self.database_loader.is_done():
+            self.root.after(200, self.check_database_preload)
+            return
+        
+        report = self.database_loader.get_report()
+        self.database_preload_report = report
+        self.database_loader = None
+        self.root.after(self.preload_release_delay, self.release_database_preload)
+        
+        info(f"Фоновая загрузка базы: {report['loaded']} файлов, "
+             f"{report['total_bytes'] / (1024 * 1024):.1f} MB за {report['elapsed']:.2f} с", LogCategory.PERFORMANCE)
+        for name, timing in report['timings'].items():
+            debug(f"{name}: чтение {timing['read']:.3f} с, разбор {timing['parse']:.3f} с", LogCategory.PERFORMANCE)
+        for message in report['errors']:
+            warning(f"Ошибка фоновой загрузки: {message}", LogCategory.DATABASE)
+    
+    def release_database_preload(self):
+        """Освобождение результатов фоновой загрузки, которые не забрал ни один модуль"""
+        try:
+            from modules.json_loader import clear_preloaded
+            clear_preloaded()
+            debug("Невостребованные файлы фоновой загрузки освобождены", LogCategory.PERFORMANCE)
+        except Exception as e:
+            warning(f"Ошибка освобождения фоновой загрузки: {e}", LogCategory.DATABASE)
+    
+    def on_closing(self):
+        """Закрытие главного окна: слияние журналов изменений предметов и выход"""
+        try:
+            from modules.items_store import compact_open_stores
+            compacted = compact_open_stores()
+            if compacted:
+                info(f"Журналы изменений слиты в основной файл: {compacted}", LogCategory.DATABASE)
+        except Exception as e:
+            error(f"Ошибка слияния журналов изменений: {e}", LogCategory.ERROR, exception=e)
+        self.root.destroy()
+    
     def check_items_cache(self):
         """
         Проверка справочника предметов и предложение обновления